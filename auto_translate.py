@@ -1,72 +1,197 @@
 import os
-import re
+import copy
 import glob
 import json
 import shutil
 import subprocess
 import sys
+import threading
+import tempfile
+import time
+import zipfile
+from collections import Counter
 from pathlib import Path
-from tqdm import tqdm
-import ctranslate2 as ct2
-import sentencepiece as spm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from text_filter import SkipClassifier
+from lang_detect import detect_language, has_kana
+from pipeline_metrics import PipelineMetrics
+from translation_backends import create_backend
+from output_guard import RETRY_OPTIONS, find_anomaly, retry_max_length
+from translation_memory import TranslationMemory
+from translation_packs import TranslationPacks
+from segment_store import DEFAULT_MEMORY_LIMIT, SegmentStore
+from file_fixes import FIXES, fix_contents, fix_files
+from file_store import ArchiveStore, DirectoryStore, archive_path_for, remove_files
+from json_walker import iter_strings
+from game_inventory import GENERIC_ENGINES, InventoryCache
+from renpy_archive import (TL_LANGUAGE, RpaArchive, collect_translatables, is_translation_file, join_translatable_line,
+                           load_rpyc, render_translation_file, renpy_language, split_translatable_line)
+from unity_assets import UNITY_TEXT_SUFFIX, apply_texts, extract_texts, is_serialized_file_name
+
+class TranslationCancelled(Exception):
+    """Được raise khi người dùng yêu cầu dừng quá trình xử lý (xem AutoTranslator.request_stop)."""
+
 
 class AutoTranslator:
-    def __init__(self, models_path="models_nllb_3_3B_ct2_fp16", output_base_path="output", status_callback=None, progress_callback=None):
+    def __init__(self, models_path="models_nllb_3_3B_ct2_fp16", output_base_path="output", status_callback=None, progress_callback=None, metrics_callback=None, backend="nllb", small_models_path=None):
         self.models_path = Path(models_path)
         self.output_base_path = Path(output_base_path)
         self.status_callback = status_callback if status_callback else print
         self.progress_callback = progress_callback if progress_callback else (lambda c, t, s: None)
-        self.translator = None
-        self.sp_model = None
+        # backend: tên backend ('nllb', 'echo', 'pseudo') hoặc một đối tượng TranslationBackend
+        self.backend = create_backend(backend, self.models_path, small_models_path) if isinstance(backend, str) else backend
         self.supported_languages = {}
         self.max_tokens = 512
         self.num_beams = 1
+        # Tham số giải mã theo từng chuỗi (xem _decoding_policy); max_tokens/num_beams là giới hạn trên
+        self.adaptive_decoding = True
+        self.length_ratio_cap = 3.0
+        self.length_slack = 16
+        self.beam_min_tokens = 24
+        # Chuỗi ngắn (tên vật phẩm, nhãn menu...) tối đa số token này được chuyển cho model nhỏ nếu có
+        self.short_segment_tokens = 12
         self.dictionary = {}
+        self.skip_classifier = SkipClassifier()
+        self.same_language_count = 0
+        # Các chuỗi có bản dịch bất thường (lặp, quá dài...) cần người dùng xem lại
+        self.review_items = []
+        # Bộ nhớ dịch dùng chung giữa các game (output/translation_memory.sqlite), mở khi dịch game đầu tiên
+        self.use_translation_memory = True
+        self.tm_fuzzy_threshold = 0.95
+        self.translation_memory = None
+        # Gói bản dịch dựng sẵn cho chuỗi mặc định của engine (thư mục packs/), tải trong initialize
+        self.use_translation_packs = True
+        self.translation_packs = TranslationPacks()
+        self.engine_type = None
+        # Tên thư mục làm việc của game (extracted/translated/final); None = tên thư mục game
+        self.work_name = None
+        # Giới hạn RAM cho văn bản trong kho chuỗi của một game (xem SegmentStore), phần vượt được ghi ra file tạm
+        self.segment_memory_limit = DEFAULT_MEMORY_LIMIT
+        # Danh mục file + engine của từng game, lưu trong output/game_inventory để các bước và các lần chạy sau dùng lại
+        self.inventory_cache = InventoryCache(self.output_base_path / "game_inventory")
+        # Lưu file đã giải nén/đã dịch trong một archive SQLite cho mỗi bước thay vì cây thư mục (xem file_store.py),
+        # và xuất bản dịch cuối cùng thành một file patch .zip thay vì bản sao đầy đủ của game
+        self.archive_storage = False
+        self.token_cache = {}
+        self.token_cache_limit = 500000
+        self.tokenizer_threads = os.cpu_count() or 1
+        # Fix lỗi trước/sau dịch chạy song song trên nhiều tiến trình khi có từ parallel_fix_min_files file trở lên
+        self.fix_workers = os.cpu_count() or 1
+        self.parallel_fix_min_files = 16
+        self.load_thread = None
+        self.load_error = None
+        # Điều khiển dừng/tạm dừng hợp tác: các stage kiểm tra giữa các file và các batch
+        self.stop_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        # Đo thời gian theo stage và bộ đếm; metrics_callback nhận từng sự kiện dạng dict
+        self.metrics = PipelineMetrics(event_callback=metrics_callback)
 
     def log(self, message, level="info"):
         self.status_callback(message, level)
 
+    def fork(self, progress_callback=None, work_name=None):
+        """
+        Bản sao nông dùng chung model, cache, bộ nhớ dịch và cờ dừng/tạm dừng, nhưng có metrics,
+        progress_callback và tên thư mục làm việc riêng: dùng cho các bước chạy ở thread nền
+        (xem job_queue.py) để không lẫn số liệu/tiến độ với game đang dịch.
+        """
+        forked = copy.copy(self)
+        forked.progress_callback = progress_callback if progress_callback else (lambda c, t, s: None)
+        forked.metrics = PipelineMetrics()
+        forked.review_items = []
+        forked.work_name = work_name
+        return forked
+
+    def game_work_name(self, game_path):
+        return self.work_name or Path(game_path).name
+
+    def request_stop(self):
+        self.stop_event.set()
+        self.resume_event.set()
+        self.log("Đã nhận yêu cầu dừng. Sẽ dừng sau batch/file hiện tại.", level="warning")
+
+    def pause(self):
+        if self.resume_event.is_set():
+            self.resume_event.clear()
+            self.log("Đã nhận yêu cầu tạm dừng. Sẽ tạm dừng sau batch/file hiện tại.")
+
+    def resume(self):
+        if not self.resume_event.is_set():
+            self.resume_event.set()
+            self.log("Tiếp tục xử lý.")
+
+    def is_paused(self):
+        return not self.resume_event.is_set()
+
+    def reset_control(self):
+        """Xóa cờ dừng/tạm dừng trước khi bắt đầu một lượt xử lý mới."""
+        self.stop_event.clear()
+        self.resume_event.set()
+
+    def _stop_requested(self):
+        """Chờ nếu đang tạm dừng, trả về True nếu đã có yêu cầu dừng."""
+        if not self.resume_event.is_set():
+            self.log("Đã tạm dừng.")
+            self.resume_event.wait()
+        return self.stop_event.is_set()
+
+    def _checkpoint(self):
+        if self._stop_requested():
+            raise TranslationCancelled("Đã dừng theo yêu cầu của người dùng.")
+
     def initialize(self):
-        self.log(f"Đang tải model từ: {self.models_path}")
         try:
-            has_cuda = False
-            try:
-                if hasattr(ct2, 'cuda') and ct2.cuda.is_cuda_available():
-                    has_cuda = True
-            except Exception as e:
-                self.log(f"Cảnh báo: Không thể kiểm tra CUDA qua ctranslate2.cuda.is_cuda_available(): {e}. Sẽ sử dụng CPU.", level="warning")
-                has_cuda = False
-            
-            device = "cuda" if has_cuda else "cpu"
-            self.log(f"Sử dụng thiết bị: {device}")
-            
-            self.translator = ct2.Translator(str(self.models_path), device=device)
-            
-            sp_model_candidates = [
-                self.models_path / "sentencepiece.bpe.model",
-                self.models_path / "nllb_3_3B_tokenizer.model",
-                self.models_path / "tokenizer.model",
-                self.models_path / "spm.model"
-            ]
-
-            sp_model_path = None
-            for candidate in sp_model_candidates:
-                if candidate.exists():
-                    sp_model_path = candidate
-                    self.log(f"Đã tìm thấy SentencePiece model tại: {sp_model_path}")
-                    break
-            
-            if not sp_model_path:
-                raise FileNotFoundError(f"SentencePiece model không tìm thấy trong thư mục: {self.models_path}. Đã thử các tên: {[c.name for c in sp_model_candidates]}")
-
-            self.sp_model = spm.SentencePieceProcessor(model_file=str(sp_model_path))
+            self.backend.load(self.log)
+            self.token_cache.clear()
             self._load_supported_languages()
-            self.log("Đã tải model dịch và SentencePiece model thành công.")
+            self.translation_packs.load(self.log)
+            self.log(f"Đã tải backend dịch '{self.backend.name}' thành công.")
+            if "small" in self.backend.tiers:
+                self.log(f"Chuỗi ngắn (<= {self.short_segment_tokens} token, một dòng) sẽ được dịch bằng model nhỏ.")
         except Exception as e:
             self.log(f"Lỗi khi tải model: {e}", level="error")
             raise
 
+    def is_loaded(self):
+        return self.backend.is_loaded()
+
+    @property
+    def translator(self):
+        """ctranslate2.Translator của backend NLLB (None với các backend khác), giữ để tương thích."""
+        return getattr(self.backend, "translator", None)
+
+    @property
+    def sp_model(self):
+        return getattr(self.backend, "sp_model", None)
+
+    def preload_async(self):
+        """
+        Bắt đầu tải model trong thread nền (vd: ngay khi ứng dụng khởi động).
+        Gọi wait_until_loaded() để chờ và nhận lỗi (nếu có).
+        """
+        if self.load_thread and self.load_thread.is_alive():
+            return self.load_thread
+        self.load_error = None
+
+        def _run():
+            try:
+                self.initialize()
+            except Exception as e:
+                self.load_error = e
+
+        self.load_thread = threading.Thread(target=_run, daemon=True)
+        self.load_thread.start()
+        return self.load_thread
+
+    def wait_until_loaded(self, timeout=None):
+        if self.load_thread:
+            self.load_thread.join(timeout)
+        if self.load_error:
+            raise self.load_error
+        return self.is_loaded()
+
     def _load_supported_languages(self):
         try:
             self.supported_languages = {
@@ -107,58 +232,77 @@ class AutoTranslator:
             self.dictionary = {}
 
     def clean_previous_data(self, game_path):
-        game_name = Path(game_path).name
+        game_name = self.game_work_name(game_path)
         extracted_dir = self.output_base_path / "extracted_game_files" / game_name
         translated_dir = self.output_base_path / "translated_game_files" / game_name
         
-        if extracted_dir.exists():
-            self.log(f"Đang xóa thư mục đã giải nén cũ: {extracted_dir}")
-            try:
-                shutil.rmtree(extracted_dir)
-            except OSError as e:
-                self.log(f"Lỗi khi xóa thư mục {extracted_dir}: {e}", level="error")
-        if translated_dir.exists():
-            self.log(f"Đang xóa thư mục đã dịch cũ: {translated_dir}")
+        for files_path, label in ((extracted_dir, "đã giải nén"), (translated_dir, "đã dịch")):
+            # Cả thư mục lẫn archive (.sqlite) của bước đó, dù lần chạy trước dùng cách lưu nào
             try:
-                shutil.rmtree(translated_dir)
+                for removed in remove_files(files_path):
+                    self.log(f"Đã xóa dữ liệu {label} cũ: {removed}")
             except OSError as e:
-                self.log(f"Lỗi khi xóa thư mục {translated_dir}: {e}", level="error")
+                self.log(f"Lỗi khi xóa dữ liệu {label} cũ {files_path}: {e}", level="error")
         self.log("Đã làm sạch dữ liệu cũ (nếu có).")
 
+    def _open_store(self, files_path, create=False):
+        """
+        Kho file của một bước trung gian (xem file_store.py). Bước ghi (create=True) dùng archive <thư mục>.sqlite
+        khi bật archive_storage, ngược lại dùng thư mục. Bước đọc ưu tiên cách lưu đang chọn, nhưng vẫn đọc được
+        dữ liệu do lần chạy trước lưu theo cách kia (vd: giải nén dạng archive rồi tắt tùy chọn trước khi dịch).
+        """
+        files_path = Path(files_path)
+        archive_path = archive_path_for(files_path)
+        if create:
+            if self.archive_storage:
+                return ArchiveStore(archive_path)
+            files_path.mkdir(parents=True, exist_ok=True)
+            return DirectoryStore(files_path)
+        if archive_path.exists() and (self.archive_storage or not files_path.is_dir()):
+            return ArchiveStore(archive_path)
+        return DirectoryStore(files_path)
+
+    def game_inventory(self, game_path):
+        """Danh mục file của game (xem game_inventory.py), chỉ quét lại đĩa khi thư mục game đã thay đổi."""
+        with self.metrics.stage("inventory"):
+            inventory, source = self.inventory_cache.get(game_path, log=self.log)
+        if source == "scan":
+            self.log(f"Đã quét thư mục game: {len(inventory.files)} file, {len(inventory.dirs)} thư mục, "
+                     f"{inventory.total_size / (1024 * 1024):.1f} MB.")
+        return inventory
+
     def detect_game_engine(self, game_path):
-        game_path = Path(game_path)
-        
-        if (game_path / "package.json").exists() and (game_path / "js" / "rmmv.js").exists():
-            self.log("Đã phát hiện game Engine: RPG Maker MV/MZ")
-            return "RPGMakerMV"
-        
-        if (game_path / "renpy").exists() and any((game_path / "game").glob("*.rpyc")):
-            self.log("Đã phát hiện game Engine: Ren'Py")
-            return "RenPy"
-        
-        if (game_path / "UnityPlayer.dll").exists() or (game_path / "UnityPlayer.so").exists():
-            self.log("Có thể là game Unity.", level="warning")
-            return "Unity"
+        inventory = self.game_inventory(game_path)
+        engine_type = inventory.engine
 
-        self.log("Không thể phát hiện Engine game cụ thể. Sẽ xử lý các file văn bản chung.", level="warning")
-        return "Generic"
+        if engine_type == "Generic":
+            self.log("Không thể phát hiện Engine game cụ thể. Sẽ xử lý các file văn bản chung.", level="warning")
+        elif engine_type == "Unity":
+            self.log(f"Có thể là game Unity (dựa trên {inventory.evidence}).", level="warning")
+        else:
+            self.log(f"Đã phát hiện game Engine: {inventory.label} (dựa trên {inventory.evidence})")
+        return engine_type
 
     def extract_game_files(self, game_path, engine_type):
         self.log(f"Bắt đầu giải nén file game từ: {game_path} (Engine: {engine_type})")
-        output_dir = self.output_base_path / "extracted_game_files" / Path(game_path).name
-        output_dir.mkdir(parents=True, exist_ok=True)
-        
+        output_dir = self.output_base_path / "extracted_game_files" / self.game_work_name(game_path)
+        with self._open_store(output_dir, create=True) as store:
+            return self._extract_to_store(game_path, engine_type, store)
+
+    def _extract_to_store(self, game_path, engine_type, store):
         extracted_count = 0
         total_files = 0
 
+        inventory = self.game_inventory(game_path)
+
         if engine_type == "RPGMakerMV":
-            data_path = Path(game_path) / "data"
-            if data_path.exists():
-                json_files = list(data_path.glob("*.json"))
+            if inventory.has_dir("data"):
+                json_files = [inventory.path(rel) for rel in inventory.files_in("data", (".json",))]
                 total_files = len(json_files)
                 for i, file_path in enumerate(json_files):
+                    self._checkpoint()
                     try:
-                        shutil.copy(file_path, output_dir / file_path.name)
+                        store.import_file(file_path.name, file_path)
                         extracted_count += 1
                         self.progress_callback(i + 1, total_files, f"Giải nén JSON: {file_path.name}")
                     except Exception as e:
@@ -169,243 +313,593 @@ class AutoTranslator:
                 return False
             
         elif engine_type == "RenPy":
-            self.log("Ren'Py yêu cầu công cụ ngoài để giải nén script (.rpyc).", level="warning")
-            self.log("Hãy sử dụng một công cụ decompile Ren'Py như 'unrpyc' trước khi dịch.", level="warning")
-            rpy_files = list((Path(game_path) / "game").glob("*.rpy"))
+            rpy_files = [inventory.path(rel) for rel in inventory.files_in("game", (".rpy",))]
             if rpy_files:
                 for i, file_path in enumerate(rpy_files):
+                     self._checkpoint()
                      try:
-                        shutil.copy(file_path, output_dir / file_path.name)
+                        store.import_file(file_path.name, file_path)
                         extracted_count += 1
                         self.progress_callback(i + 1, len(rpy_files), f"Giải nén RPY: {file_path.name}")
                      except Exception as e:
                         self.log(f"Lỗi khi copy file {file_path}: {e}", level="error")
+            # Script chỉ có bản biên dịch (.rpyc rời hoặc trong archive .rpa): tạo file translate từ AST
+            extracted_count += self._extract_renpy_compiled_scripts(inventory, store, {file_path.stem for file_path in rpy_files})
             if extracted_count == 0:
-                self.log("Không tìm thấy file .rpy đã được decompile. Đảm bảo bạn đã decompile Ren'Py game.", level="error")
+                self.log("Không tìm thấy script Ren'Py nào (.rpy, .rpyc hoặc .rpa) có thể đọc được.", level="error")
                 return False
 
-        elif engine_type == "Generic" or engine_type == "Unity":
+        elif engine_type in GENERIC_ENGINES:
+            if engine_type == "WolfRPG":
+                self.log("Script Wolf RPG trong các file .wolf cần được giải nén bằng công cụ ngoài (vd: WolfDec) trước khi dịch.", level="warning")
+            elif engine_type == "Kirikiri":
+                self.log("Script Kirikiri trong các file .xp3 cần được giải nén bằng công cụ ngoài (vd: KrkrExtract) trước khi dịch.", level="warning")
+            # Unity: văn bản nằm trong các file asset (TextAsset, MonoBehaviour), không chỉ trong file rời
+            asset_count = self._extract_unity_assets(inventory, store) if engine_type == "Unity" else 0
             self.log("Đang tìm kiếm các file văn bản phổ biến (JSON, TXT, XML)...")
-            text_files = []
-            for ext in ["*.json", "*.txt", "*.xml"]:
-                text_files.extend(list(Path(game_path).rglob(ext)))
-            
+            text_files = inventory.files_in("", (".json", ".txt", ".xml"), recursive=True)
+
             total_files = len(text_files)
-            if total_files == 0:
+            if total_files == 0 and asset_count == 0:
                 self.log("Không tìm thấy bất kỳ file văn bản nào để giải nén.", level="warning")
                 return False
 
-            for i, file_path in enumerate(text_files):
-                relative_path = file_path.relative_to(game_path)
-                target_path = output_dir / relative_path
-                target_path.parent.mkdir(parents=True, exist_ok=True)
+            for i, rel in enumerate(text_files):
+                self._checkpoint()
                 try:
-                    shutil.copy(file_path, target_path)
+                    store.import_file(rel, inventory.path(rel))
                     extracted_count += 1
-                    self.progress_callback(i + 1, total_files, f"Giải nén chung: {relative_path}")
+                    self.progress_callback(i + 1, total_files, f"Giải nén chung: {rel}")
                 except Exception as e:
-                    self.log(f"Lỗi khi copy file {file_path}: {e}", level="error")
+                    self.log(f"Lỗi khi copy file {inventory.path(rel)}: {e}", level="error")
             self.log(f"Đã giải nén {extracted_count}/{total_files} file văn bản chung.")
+            extracted_count += asset_count
 
         else:
             self.log(f"Engine {engine_type} không được hỗ trợ giải nén tự động.", level="warning")
             return False
             
         if extracted_count > 0:
-            self.log(f"Giải nén hoàn tất. Các file được lưu tại: {output_dir}")
+            self.log(f"Giải nén hoàn tất. Các file được lưu tại: {store.location}")
             return True
         else:
             self.log("Không có file nào được giải nén.", level="warning")
             return False
 
-    def fix_pre_translation_issues(self, extracted_files_path, engine_type):
-        self.log(f"Bắt đầu fix lỗi trước dịch cho: {extracted_files_path} (Engine: {engine_type})")
-        
-        fixed_count = 0
-        total_files_to_fix = 0
-
-        if engine_type == "RPGMakerMV":
-            json_files = list(Path(extracted_files_path).glob("*.json"))
-            total_files_to_fix = len(json_files)
-            for i, file_path in enumerate(json_files):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    def process_rpg_json_item(item):
-                        if isinstance(item, dict):
-                            for key, value in item.items():
-                                if key in ["name", "note", "description"] and isinstance(value, (int, float)):
-                                    item[key] = str(value)
-                                elif isinstance(value, str):
-                                    item[key] = value.replace('\u0000', '')
-                                process_rpg_json_item(value)
-                        elif isinstance(item, list):
-                            for element in item:
-                                process_rpg_json_item(element)
-
-                    process_rpg_json_item(data)
-                    
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    fixed_count += 1
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix pre-RPGMaker: {file_path.name}")
-                except Exception as e:
-                    self.log(f"Lỗi khi fix pre-translation file {file_path}: {e}", level="error")
-        
-        elif engine_type == "RenPy":
-            rpy_files = list(Path(extracted_files_path).glob("*.rpy"))
-            total_files_to_fix = len(rpy_files)
-            for i, file_path in enumerate(rpy_files):
+    def _extract_renpy_compiled_scripts(self, inventory, store, skip_scripts):
+        """
+        Đọc các script .rpyc (file rời trong game/ hoặc nằm trong archive .rpa, đọc trực tiếp từ archive) và tạo
+        file translate tl/<script>.rpy trong kho store gồm lời thoại và lựa chọn menu. Script có trong skip_scripts
+        (đã có file .rpy được giải nén) bị bỏ qua. Trả về số file đã tạo.
+        """
+        # Tên script (tương đối với game/, không có đuôi) -> (archive hoặc None, tên trong archive hoặc đường dẫn file rời).
+        # File rời được ưu tiên hơn file cùng tên trong archive, giống thứ tự nạp của Ren'Py.
+        sources = {}
+        archives = []
+        for rel in inventory.files_in("game", (".rpa",), recursive=True):
+            try:
+                archive = RpaArchive(inventory.path(rel))
+            except Exception as e:
+                self.log(f"Không thể đọc archive Ren'Py {rel}: {e}", level="warning")
+                continue
+            archives.append(archive)
+            for name in archive.names((".rpyc",)):
+                sources.setdefault(name[:-len(".rpyc")], (archive, name))
+            self.log(f"Archive {rel}: {len(archive.index)} file, {len(archive.names(('.rpyc',)))} script.")
+        for rel in inventory.files_in("game", (".rpyc",), recursive=True):
+            sources[rel[len("game/"):-len(".rpyc")]] = (None, inventory.path(rel))
+
+        scripts = [(script, source) for script, source in sources.items() if script not in skip_scripts]
+        created = 0
+        dialogue_count = 0
+        seen_strings = set()
+        try:
+            for i, (script, (archive, name)) in enumerate(scripts):
+                self._checkpoint()
                 try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
-                    new_lines = []
-                    for line in lines:
-                        line = re.sub(r"\{.*?\}", lambda m: m.group(0), line)
-                        new_lines.append(line)
-                    
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(new_lines)
-                    fixed_count += 1
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix pre-RenPy: {file_path.name}")
+                    data = archive.read(name) if archive is not None else Path(name).read_bytes()
+                    dialogue, strings = collect_translatables(load_rpyc(data))
+                except TranslationCancelled:
+                    raise
                 except Exception as e:
-                    self.log(f"Lỗi khi fix pre-translation file {file_path}: {e}", level="error")
+                    self.log(f"Không thể đọc script Ren'Py {script}.rpyc: {e}", level="warning")
+                    continue
+                strings = [text for text in strings if text not in seen_strings]
+                seen_strings.update(strings)
+                if dialogue or strings:
+                    store.write_text(f"tl/{script}.rpy", render_translation_file(f"game/{script}.rpyc", dialogue, strings))
+                    created += 1
+                    dialogue_count += len(dialogue)
+                self.progress_callback(i + 1, len(scripts), f"Giải nén RPYC: {script}")
+        finally:
+            for archive in archives:
+                archive.close()
+
+        if scripts:
+            self.log(f"Đã tạo {created} file translate Ren'Py từ {len(scripts)} script .rpyc "
+                     f"({dialogue_count} câu thoại, {len(seen_strings)} chuỗi menu).")
+        return created
+
+    def _extract_unity_assets(self, inventory, store):
+        """
+        Trích văn bản (TextAsset, MonoBehaviour có type tree) từ các SerializedFile trong thư mục *_Data của game Unity
+        ra file <đường dẫn asset>.unity_text.json trong kho store (xem unity_assets.py). Trả về số file đã tạo.
+        """
+        asset_files = sorted(rel for rel in inventory.files
+                             if rel.split("/", 1)[0].endswith("_Data") and "/" in rel and is_serialized_file_name(rel.rsplit("/", 1)[-1]))
+        created = 0
+        object_count = 0
+        skipped = Counter()
+        for i, rel in enumerate(asset_files):
+            self._checkpoint()
+            try:
+                texts = extract_texts(inventory.path(rel), log=self.log, skipped=skipped)
+            except Exception as e:
+                self.log(f"Không thể đọc asset Unity {rel}: {e}", level="warning")
+                continue
+            if texts:
+                store.write_text(rel + UNITY_TEXT_SUFFIX, json.dumps(texts, ensure_ascii=False, indent=2))
+                created += 1
+                object_count += len(texts)
+            self.progress_callback(i + 1, len(asset_files), f"Giải nén asset Unity: {rel}")
+        if asset_files:
+            self.log(f"Đã trích văn bản của {object_count} object (TextAsset/MonoBehaviour) từ {created}/{len(asset_files)} file asset Unity.")
+        if skipped:
+            self.log(f"Giữ nguyên {sum(skipped.values())} TextAsset chứa dữ liệu có cấu trúc không dịch theo dòng được "
+                     f"({', '.join(f'{kind}={count}' for kind, count in skipped.most_common())}).")
+        return created
 
-        elif engine_type == "Generic" or engine_type == "Unity":
-            text_files = []
-            for ext in ["*.json", "*.txt", "*.xml"]:
-                text_files.extend(list(Path(extracted_files_path).rglob(ext)))
-            
-            total_files_to_fix = len(text_files)
-            for i, file_path in enumerate(text_files):
-                try:
-                    if file_path.suffix == ".json":
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        def process_json_strings(obj):
-                            if isinstance(obj, dict):
-                                for k, v in obj.items():
-                                    if isinstance(v, str):
-                                        obj[k] = v.replace('\u0000', '')
-                                        obj[k] = obj[k].replace('\\n', '\n')
-                                    else:
-                                        process_json_strings(v)
-                            elif isinstance(obj, list):
-                                for item in obj:
-                                    process_json_strings(item)
-                        process_json_strings(data)
-                        
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        fixed_count += 1
-
-                    elif file_path.suffix == ".txt":
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        content = re.sub(r'\s+', ' ', content).strip()
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                        fixed_count += 1
-                    
-                    elif file_path.suffix == ".xml":
-                        import xml.etree.ElementTree as ET
-                        tree = ET.parse(file_path)
-                        root = tree.getroot()
-                        
-                        def process_xml_element(element):
-                            if element.text:
-                                element.text = element.text.replace('\u0000', '')
-                            for child in element:
-                                process_xml_element(child)
-                        
-                        process_xml_element(root)
-                        tree.write(file_path, encoding='utf-8', xml_declaration=True)
-                        fixed_count += 1
-                    
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix pre-Generic: {file_path.name}")
+    def fix_pre_translation_issues(self, extracted_files_path, engine_type):
+        self.log(f"Bắt đầu fix lỗi trước dịch cho: {extracted_files_path} (Engine: {engine_type})")
 
-                except Exception as e:
-                    self.log(f"Lỗi khi fix pre-translation file {file_path}: {e}", level="error")
+        with self._open_store(extracted_files_path) as store:
+            file_names = self._files_to_fix(store, engine_type)
+            fixed_count = self._run_file_fixes(store, file_names, engine_type, "pre")
 
         if fixed_count > 0:
-            self.log(f"Đã fix {fixed_count}/{total_files_to_fix} lỗi trước dịch.")
+            self.log(f"Đã fix {fixed_count}/{len(file_names)} lỗi trước dịch.")
         else:
             self.log("Không có lỗi nào được fix trước dịch hoặc không tìm thấy file để xử lý.")
         return True
 
+    def _files_to_fix(self, store, engine_type):
+        if engine_type == "RPGMakerMV":
+            return [rel for rel in store.list_files((".json",)) if "/" not in rel]
+        if engine_type == "RenPy":
+            return store.list_files((".rpy",))
+        if engine_type in GENERIC_ENGINES:
+            return store.list_files((".json", ".txt", ".xml"))
+        return []
+
+    def _run_file_fixes(self, store, file_names, engine_type, phase):
+        """
+        Chạy bước fix phase ("pre"/"post", xem file_fixes.py) cho từng file của kho store, trên nhiều tiến trình
+        khi số file đủ lớn; file được gửi cho tiến trình con theo nhóm để giảm chi phí trao đổi giữa các tiến trình.
+        Kho thư mục: tiến trình con đọc/ghi file trên đĩa. Kho archive: nội dung file được gửi đi và kết quả được
+        ghi lại vào archive, chỉ vài nhóm được gửi cùng lúc để giới hạn dữ liệu nằm trong RAM.
+        progress_callback vẫn nhận (số file đã xong, tổng số file, mô tả) như khi chạy tuần tự. Trả về số file đã fix.
+        """
+        label = {"RPGMakerMV": "RPGMaker", "RenPy": "RenPy"}.get(engine_type, "Generic")
+        fix_file, fix_content = FIXES[phase]
+        total = len(file_names)
+        done = 0
+        fixed_count = 0
+
+        if store.is_archive:
+            def _task(names):
+                return fix_contents, fix_content, [(name, store.read_bytes(name)) for name in names], engine_type
+        else:
+            path_names = {store.path(name): name for name in file_names}
+
+            def _task(names):
+                return fix_files, fix_file, [store.path(name) for name in names], engine_type
+
+        def _record(key, result, error):
+            nonlocal done, fixed_count
+            name = key if store.is_archive else path_names[key]
+            del remaining[name]
+            done += 1
+            if error is not None:
+                self.log(f"Lỗi khi fix {phase}-translation file {store.location / name}: {error}", level="error")
+            elif store.is_archive and result is not None:
+                store.write_bytes(name, result)
+                fixed_count += 1
+            elif result is True:
+                fixed_count += 1
+            self.progress_callback(done, total, f"Fix {phase}-{label}: {Path(name).name}")
+
+        remaining = dict.fromkeys(file_names)
+        workers = min(self.fix_workers, total)
+        if workers > 1 and total >= self.parallel_fix_min_files:
+            chunk_size = max(1, min(64, total // (workers * 4)))
+            chunks = [file_names[k:k + chunk_size] for k in range(0, total, chunk_size)]
+            executor = ProcessPoolExecutor(max_workers=workers)
+            pending = set()
+            try:
+                while chunks or pending:
+                    while chunks and len(pending) < workers * 2:
+                        pending.add(executor.submit(*_task(chunks.pop(0))))
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        self._checkpoint()
+                        for key, result, error in future.result():
+                            _record(key, result, error)
+            except (BrokenProcessPool, OSError) as e:
+                # Không tạo được tiến trình con (môi trường hạn chế...): xử lý nốt các file còn lại tuần tự
+                self.log(f"Không thể fix song song ({e}). Xử lý tuần tự {len(remaining)} file còn lại.", level="warning")
+            finally:
+                # shutdown(cancel_futures=True) cần Python 3.9+: tự hủy các chunk chưa chạy để vẫn hỗ trợ 3.8
+                for future in pending:
+                    future.cancel()
+                executor.shutdown(wait=True)
+
+        for name in list(remaining):
+            self._checkpoint()
+            func, fix_func, items, _ = _task([name])
+            for key, result, error in func(fix_func, items, engine_type):
+                _record(key, result, error)
+        return fixed_count
+
+    def _route_tier(self, text, token_ids):
+        """Chọn tầng model: chuỗi ngắn một dòng (UI, database) -> "small", thoại dài -> "large"."""
+        if "small" in self.backend.tiers and len(token_ids) <= self.short_segment_tokens and "\n" not in text:
+            return "small"
+        return "large"
+
+    def _decoding_policy(self, token_ids):
+        """
+        Trả về (max_length, num_beams) cho một chuỗi nguồn. Độ dài được làm tròn lên lũy thừa của 2
+        để các chuỗi dài gần nhau dùng chung chính sách (và chung batch): max_length tỉ lệ với độ dài
+        nguồn, beam search chỉ dùng cho thoại dài, chuỗi ngắn giải mã greedy.
+        """
+        if not self.adaptive_decoding:
+            return self.max_tokens, self.num_beams
+        bucket = 8
+        while bucket < len(token_ids):
+            bucket *= 2
+        max_length = min(self.max_tokens, int(bucket * self.length_ratio_cap) + self.length_slack)
+        num_beams = self.num_beams if len(token_ids) > self.beam_min_tokens else 1
+        return max_length, num_beams
+
     def translate_text(self, text, source_lang_code, target_lang_code):
-        if not self.translator or not self.sp_model:
+        if not self.is_loaded():
             raise RuntimeError("Model dịch chưa được tải. Vui lòng gọi initialize().")
         
         for original, translated in self.dictionary.items():
             text = text.replace(original, translated)
 
         if source_lang_code == "auto":
-            tokens = self.sp_model.encode(text, out_type=str)
-        else:
-            tokens = self.sp_model.encode(f"__{source_lang_code}__ {text}", out_type=str)
-
-        target_prefix_tokens = [f"__{target_lang_code}__"]
-        
+            detected_lang = detect_language(text, han_lang="jpn_Jpan" if has_kana([text]) else "zho_Hans")
+            # Chỉ giữ nguyên khi nhận diện chắc chắn là ngôn ngữ đích; không chắc thì vẫn dịch (nguồn mặc định tiếng Anh)
+            if detected_lang == target_lang_code:
+                return text
+            source_lang_code = detected_lang or "eng_Latn"
         try:
-            results = self.translator.translate_batch(
-                [tokens],
-                target_prefix=[target_prefix_tokens],
-                max_length=self.max_tokens,
-                num_beams=self.num_beams
+            token_ids = self._encode_cached([text])
+            max_length, num_beams = self._decoding_policy(token_ids[0])
+            hypotheses = self.backend.translate_batch(
+                token_ids,
+                source_lang_code,
+                target_lang_code,
+                max_length=max_length,
+                num_beams=num_beams,
+                tier=self._route_tier(text, token_ids[0])
             )
-            
-            translated_tokens = results[0].hypotheses[0]
-            
-            if translated_tokens and translated_tokens[0] == target_prefix_tokens[0]:
-                translated_tokens = translated_tokens[1:]
-
-            translated_text = self.sp_model.decode(translated_tokens)
-            return translated_text
+            return self.backend.decode_batch(hypotheses)[0]
         except Exception as e:
             self.log(f"Lỗi khi dịch văn bản: {e}", level="error")
             return f"[LỖI DỊCH]: {text}"
 
+    def _translate_texts(self, texts, source_lang_nllb, target_langs_nllb, batch_size, auto_detect, relative_path):
+        """
+        Dịch danh sách chuỗi sang từng ngôn ngữ trong target_langs_nllb, trả về một danh sách kết quả
+        cho mỗi ngôn ngữ đích (cùng thứ tự với texts). Thay từ điển, nhận diện ngôn ngữ và mã hóa chỉ
+        làm một lần; chỉ bước giải mã của model chạy riêng cho từng ngôn ngữ đích.
+        Khi auto_detect bật, mỗi chuỗi được gán mã ngôn ngữ nguồn riêng, các batch được gom theo
+        ngôn ngữ nguồn và chuỗi đã ở ngôn ngữ đích được giữ nguyên, không qua model.
+        Nếu backend có model nhỏ, các batch còn được gom theo tầng model (xem _route_tier); mỗi batch
+        dùng chung một chính sách giải mã (xem _decoding_policy).
+        """
+        from tqdm import tqdm
+
+        processed_texts = []
+        for text_item in texts:
+            final_text = text_item
+            for original, translated in self.dictionary.items():
+                final_text = final_text.replace(original, translated)
+            processed_texts.append(final_text)
+
+        if auto_detect:
+            han_lang = "jpn_Jpan" if has_kana(processed_texts) else "zho_Hans"
+            detected_langs = [detect_language(text, han_lang=han_lang) for text in processed_texts]
+            # Chuỗi không nhận diện chắc chắn vẫn được dịch, với ngôn ngữ nguồn mặc định là tiếng Anh
+            source_langs = [lang or "eng_Latn" for lang in detected_langs]
+        else:
+            detected_langs = source_langs = [source_lang_nllb] * len(processed_texts)
+
+        def needs_model(idx, target_lang):
+            # Chỉ bỏ qua model khi chuỗi được nhận diện chắc chắn là đã ở ngôn ngữ đích
+            return not auto_detect or detected_langs[idx] != target_lang
+
+        # Tra gói bản dịch dựng sẵn và bộ nhớ dịch trước khi mã hóa: các chuỗi này không cần qua model
+        memory_hits = [{} for _ in target_langs_nllb]
+        if self.use_translation_packs or self.translation_memory is not None:
+            with self.metrics.stage("tm_lookup"):
+                for target_index, target_lang_nllb in enumerate(target_langs_nllb):
+                    for idx, text in enumerate(processed_texts):
+                        if needs_model(idx, target_lang_nllb):
+                            match = self._lookup_known_translation(text, source_langs[idx], target_lang_nllb)
+                            if match and match[1] == "fuzzy":
+                                # Câu gần giống chưa chắc cùng nghĩa (thêm/bớt "not"...): vẫn dịch bằng model,
+                                # bản dịch của câu đã lưu chỉ được ghi vào báo cáo xem lại để đối chiếu
+                                self._add_fuzzy_review_item(texts[idx], target_lang_nllb, match, relative_path)
+                                self.metrics.add("segments_tm_fuzzy")
+                            elif match:
+                                memory_hits[target_index][idx] = match[0]
+                                self.metrics.add("segments_pack" if match[1] == "pack" else f"segments_tm_{match[1]}")
+
+        # Mã hóa một lần toàn bộ chuỗi cần dịch của file (có cache theo chuỗi), dùng chung cho mọi ngôn ngữ đích
+        texts_to_encode = [text for idx, text in enumerate(processed_texts)
+                           if any(needs_model(idx, target_lang) and idx not in memory_hits[target_index]
+                                  for target_index, target_lang in enumerate(target_langs_nllb))]
+        with self.metrics.stage("tokenize"):
+            token_ids = dict(zip(texts_to_encode, self._encode_cached(texts_to_encode)))
+
+        all_results = []
+        for target_index, target_lang_nllb in enumerate(target_langs_nllb):
+            results = list(processed_texts)
+            routed = {}
+            for idx, lang in enumerate(source_langs):
+                if not needs_model(idx, target_lang_nllb):
+                    self.same_language_count += 1
+                    continue
+                if idx in memory_hits[target_index]:
+                    results[idx] = memory_hits[target_index][idx]
+                    continue
+                text = processed_texts[idx]
+                ids = token_ids[text]
+                routed.setdefault((lang, self._route_tier(text, ids), self._decoding_policy(ids)), []).append(idx)
+
+            decoded_indices = []
+            hypotheses = []
+            for (lang, tier, (max_length, num_beams)), indices in routed.items():
+                for k in tqdm(range(0, len(indices), batch_size), desc=f"Dịch {relative_path.name} ({lang} -> {target_lang_nllb}, {tier}, {max_length}/{num_beams})"):
+                    self._checkpoint()
+                    batch_indices = indices[k:k + batch_size]
+                    try:
+                        source_batch = [token_ids[processed_texts[idx]] for idx in batch_indices]
+
+                        with self.metrics.stage("model"):
+                            batch_hypotheses = self.backend.translate_batch(
+                                source_batch,
+                                lang,
+                                target_lang_nllb,
+                                max_length=max_length,
+                                num_beams=num_beams,
+                                tier=tier
+                            )
+
+                        self.metrics.record_batch(batch_size, [len(ids) for ids in source_batch], [len(ids) for ids in batch_hypotheses])
+                        self.metrics.add(f"segments_{tier}_model", len(batch_indices))
+                        if num_beams > 1:
+                            self.metrics.add("segments_beam_search", len(batch_indices))
+
+                        batch_hypotheses = self._guard_batch([processed_texts[idx] for idx in batch_indices], source_batch, batch_hypotheses,
+                                                             lang, target_lang_nllb, max_length, num_beams, tier, relative_path)
+                        for idx, ids in zip(batch_indices, batch_hypotheses):
+                            if ids is not None:
+                                decoded_indices.append(idx)
+                                hypotheses.append(ids)
+                    except Exception as translate_err:
+                        # Giữ nguyên các chuỗi gốc nếu dịch thất bại
+                        self.log(f"Lỗi khi gọi translate_batch cho một batch trong file {relative_path}: {translate_err}", level="error")
+
+            # Giải mã hàng loạt một lần cho toàn bộ kết quả của file
+            if hypotheses:
+                with self.metrics.stage("detokenize"):
+                    decoded_texts = self.backend.decode_batch(hypotheses, num_threads=self.tokenizer_threads)
+                for idx, text in zip(decoded_indices, decoded_texts):
+                    results[idx] = text
+                self.metrics.add("segments_translated", len(decoded_texts))
+                if self.translation_memory is not None:
+                    with self.metrics.stage("tm_store"):
+                        self.translation_memory.add_many(
+                            (source_langs[idx], target_lang_nllb, processed_texts[idx], text)
+                            for idx, text in zip(decoded_indices, decoded_texts))
+            all_results.append(results)
+        return all_results
+
+    def _translate_pending(self, store, file_id, source_lang_nllb, target_langs_nllb, batch_size, auto_detect, relative_path):
+        """
+        Dịch các chuỗi (không trùng lặp) của một file trong kho còn thiếu bản dịch rồi lưu bản dịch vào kho.
+        Chuỗi đã dịch ở các file trước của cùng game được dùng lại, không qua model.
+        """
+        pending = store.pending_texts(file_id)
+        self.metrics.add("segments_deduplicated", store.file_segment_count(file_id) - len(pending))
+        if not pending:
+            return
+        translated_per_lang = self._translate_texts([store.text(text_id) for text_id in pending], source_lang_nllb, target_langs_nllb,
+                                                    batch_size, auto_detect, relative_path)
+        for target_index, translated_texts in enumerate(translated_per_lang):
+            for text_id, translated_text in zip(pending, translated_texts):
+                store.set_translation(text_id, translated_text, target_index)
+
+    def _lookup_known_translation(self, text, source_lang, target_lang):
+        """
+        Bản dịch có sẵn cho một chuỗi: gói dựng sẵn của engine trước, rồi bộ nhớ dịch.
+        Trả về (bản dịch, loại, độ tương đồng, chuỗi nguồn đã lưu) hoặc None; loại "fuzzy" chỉ là gợi ý, không dùng lại.
+        """
+        if self.use_translation_packs:
+            translated = self.translation_packs.lookup(text, self.engine_type, source_lang, target_lang)
+            if translated is not None:
+                return translated, "pack", 1.0, text
+        if self.translation_memory is not None:
+            return self.translation_memory.lookup(text, source_lang, target_lang)
+        return None
+
+    def _add_fuzzy_review_item(self, source_text, target_lang, match, relative_path):
+        translated, _, similarity, tm_source = match
+        self.review_items.append({
+            "file": str(relative_path),
+            "target_lang": target_lang,
+            "source": source_text,
+            "reason": "tm_fuzzy",
+            "tm_source": tm_source,
+            "tm_output": translated,
+            "similarity": similarity,
+            "action": "model_translated",
+        })
+
+    def _guard_batch(self, source_texts, source_batch, hypotheses, lang, target_lang, max_length, num_beams, tier, relative_path):
+        """
+        Phát hiện bản dịch bất thường (lặp n-gram, dài bất thường so với nguồn, rỗng) và dịch lại
+        riêng các chuỗi đó với repetition_penalty/no_repeat_ngram_size cùng giới hạn độ dài chặt hơn.
+        Chuỗi vẫn bất thường sau khi dịch lại được giữ nguyên bản gốc (trả về None ở vị trí đó).
+        Mọi trường hợp đều được ghi vào self.review_items.
+        """
+        reasons = {i: find_anomaly(source_batch[i], hypotheses[i], max_length) for i in range(len(hypotheses))}
+        suspects = [i for i, reason in reasons.items() if reason]
+        if not suspects:
+            return hypotheses
+
+        guarded = list(hypotheses)
+        caps = {i: retry_max_length(source_batch[i], max_length) for i in suspects}
+        # Mỗi nhóm cùng giới hạn độ dài dịch lại một batch, để chuỗi được dịch đúng với giới hạn dùng khi kiểm tra lại
+        retried_by_index = {}
+        for cap in sorted(set(caps.values())):
+            group = [i for i in suspects if caps[i] == cap]
+            try:
+                with self.metrics.stage("retry"):
+                    group_ids = self.backend.translate_batch([source_batch[i] for i in group], lang, target_lang,
+                                                             max_length=cap, num_beams=num_beams, tier=tier, **RETRY_OPTIONS)
+            except Exception as e:
+                self.log(f"Lỗi khi dịch lại {len(group)} chuỗi bất thường trong file {relative_path}: {e}", level="warning")
+                group_ids = [[] for _ in group]
+            retried_by_index.update(zip(group, group_ids))
+        retried = [retried_by_index[i] for i in suspects]
+        first_texts = self.backend.decode_batch([hypotheses[i] for i in suspects])
+        retry_texts = self.backend.decode_batch(retried)
+        for i, new_ids, first_text, retry_text in zip(suspects, retried, first_texts, retry_texts):
+            retry_reason = find_anomaly(source_batch[i], new_ids, caps[i])
+            guarded[i] = None if retry_reason else new_ids
+            self.review_items.append({
+                "file": str(relative_path),
+                "target_lang": target_lang,
+                "source": source_texts[i],
+                "reason": reasons[i],
+                "output": first_text,
+                "retry_output": retry_text,
+                "retry_reason": retry_reason,
+                "action": "kept_source" if retry_reason else "retried",
+            })
+        self.metrics.add("segments_retried", len(suspects))
+        self.metrics.add("segments_rejected", sum(1 for ids in guarded if ids is None))
+        return guarded
+
+    def _load_review_report(self):
+        """Khi tiếp tục dịch, giữ lại các mục cần xem lại của những file đã dịch ở lần trước."""
+        review_file = self.output_base_path / "translation_review.json"
+        try:
+            with open(review_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            self.log(f"Không thể đọc báo cáo xem lại bản dịch: {e}", level="warning")
+            return []
+
+    def _write_review_report(self):
+        review_file = self.output_base_path / "translation_review.json"
+        try:
+            if not self.review_items:
+                if review_file.exists():
+                    review_file.unlink()
+                return
+            with open(review_file, 'w', encoding='utf-8') as f:
+                json.dump(self.review_items, f, ensure_ascii=False, indent=4)
+            kept = sum(1 for item in self.review_items if item["action"] == "kept_source")
+            fuzzy = sum(1 for item in self.review_items if item["reason"] == "tm_fuzzy")
+            anomalies = len(self.review_items) - fuzzy
+            if anomalies:
+                self.log(f"Phát hiện {anomalies} bản dịch bất thường (lặp/quá dài): đã dịch lại {anomalies - kept}, "
+                         f"giữ nguyên bản gốc {kept}. Xem lại tại: {review_file}", level="warning")
+            if fuzzy:
+                self.log(f"{fuzzy} chuỗi gần giống một câu trong bộ nhớ dịch đã được dịch bằng model; "
+                         f"bản dịch cũ được ghi kèm để đối chiếu tại: {review_file}")
+        except Exception as e:
+            self.log(f"Lỗi khi lưu báo cáo xem lại bản dịch: {e}", level="error")
+
+    def _encode_cached(self, texts):
+        """
+        Trả về danh sách token id cho từng chuỗi. Các chuỗi chưa có trong cache được mã hóa
+        trong một lần gọi encode_batch của backend (SentencePiece đa luồng với NLLB).
+        """
+        missing = list(dict.fromkeys(text for text in texts if text not in self.token_cache))
+        self.metrics.add("cache_misses", len(missing))
+        self.metrics.add("cache_hits", len(texts) - len(missing))
+        if missing:
+            if len(self.token_cache) + len(missing) > self.token_cache_limit:
+                self.token_cache.clear()
+            encoded = self.backend.encode_batch(missing, num_threads=self.tokenizer_threads)
+            self.token_cache.update(zip(missing, encoded))
+        return [self.token_cache[text] for text in texts]
+
     def translate_game(self, extracted_files_path, params, is_continue=False):
-        if not self.translator or not self.sp_model:
+        if self.load_thread and self.load_thread.is_alive():
+            self.log("Đang chờ model tải xong ở nền...")
+            self.load_thread.join()
+        if not self.is_loaded():
             self.log("Model dịch chưa được tải.", level="error")
             return False
 
         game_name = Path(extracted_files_path).name
-        translated_output_dir = self.output_base_path / "translated_game_files" / game_name
-        translated_output_dir.mkdir(parents=True, exist_ok=True)
 
         source_lang_code = params['source_lang']
-        target_lang_code = params['target_lang']
+        # target_langs: dịch sang nhiều ngôn ngữ trong một lượt (chung bước parse, lọc, mã hóa)
+        target_lang_codes = params.get('target_langs') or [params['target_lang']]
         batch_size = params['batch_size']
         use_dictionary = params['use_dictionary']
         auto_detect = params['auto_detect']
+        self.engine_type = params.get('engine_type')
+        self.skip_classifier = SkipClassifier(self.engine_type)
+        self.same_language_count = 0
+        self.review_items = self._load_review_report() if is_continue else []
+        self.metrics.reset()
         self.max_tokens = params.get('max_tokens', 512)
         self.num_beams = params.get('num_beams', 1)
+        self.adaptive_decoding = params.get('adaptive_decoding', True)
+        self.use_translation_memory = params.get('use_translation_memory', self.use_translation_memory)
+        self.use_translation_packs = params.get('use_translation_packs', True)
+        self._open_translation_memory()
 
         source_lang_nllb = self.supported_languages.get(source_lang_code, "eng_Latn") if source_lang_code != "auto" else "auto"
-        target_lang_nllb = self.supported_languages.get(target_lang_code, "vie_Latn")
+        target_langs_nllb = [self.supported_languages.get(code, "vie_Latn") for code in target_lang_codes]
+        translated_output_dirs = self.get_translated_output_dirs(game_name, target_langs_nllb)
 
         if use_dictionary:
             self.load_dictionary("custom_dictionary.json")
 
-        self.log(f"Bắt đầu dịch game từ '{extracted_files_path}' sang {target_lang_code} ({target_lang_nllb})...")
-        self.log(f"Tham số: Batch Size={batch_size}, Max Tokens={self.max_tokens}, Num Beams={self.num_beams}")
+        # Đọc từ kho đã giải nén, ghi vào một kho kết quả cho mỗi ngôn ngữ đích (thư mục hoặc archive, xem _open_store)
+        input_store = self._open_store(extracted_files_path)
+        output_stores = [self._open_store(output_dir, create=True) for output_dir in translated_output_dirs]
+        output_locations = [str(output_store.location) for output_store in output_stores]
+
+        targets_text = ", ".join(f"{code} ({lang})" for code, lang in zip(target_lang_codes, target_langs_nllb))
+        self.log(f"Bắt đầu dịch game từ '{input_store.location}' sang {targets_text}...")
+        self.log(f"Tham số: Batch Size={batch_size}, Max Tokens={self.max_tokens}, Num Beams={self.num_beams}"
+                 + (f" (tự điều chỉnh theo độ dài chuỗi, beam search chỉ cho chuỗi > {self.beam_min_tokens} token)" if self.adaptive_decoding else ""))
 
         total_files = 0
         translated_count = 0
         skipped_count = 0
 
-        files_to_translate = []
-        for ext in ["*.json", "*.txt", "*.xml", "*.rpy"]:
-            files_to_translate.extend(list(Path(extracted_files_path).rglob(ext)))
+        with self.metrics.stage("scan"):
+            files_to_translate = input_store.list_files((".json", ".txt", ".xml", ".rpy"))
         
         total_files = len(files_to_translate)
         if total_files == 0:
             self.log("Không tìm thấy file văn bản nào để dịch trong thư mục đã giải nén.", level="warning")
+            self._close_stores(input_store, *output_stores)
             return False
 
         translation_status_file = self.output_base_path / "translation_status.json"
@@ -425,246 +919,164 @@ class AutoTranslator:
                 except OSError as e:
                     self.log(f"Lỗi khi xóa file trạng thái dịch cũ: {e}", level="error")
 
-        translated_texts = []
-        original_file_paths = []
+        # Kho chuỗi của cả game: chuỗi lặp lại giữa các file chỉ được dịch một lần
+        store = SegmentStore(target_count=len(target_langs_nllb), memory_limit=self.segment_memory_limit)
 
-        for i, file_path in enumerate(files_to_translate):
-            relative_path = file_path.relative_to(extracted_files_path)
-            output_file_path = translated_output_dir / relative_path
-            output_file_path.parent.mkdir(parents=True, exist_ok=True)
+        cancelled = False
+        for i, rel in enumerate(files_to_translate):
+            if self._stop_requested():
+                cancelled = True
+                break
+            relative_path = Path(rel)
+            file_path = Path(extracted_files_path) / relative_path
 
             if str(relative_path) in translated_file_map:
                 self.log(f"Bỏ qua file đã dịch: {relative_path}", level="info")
                 skipped_count += 1
                 self.progress_callback(translated_count + skipped_count, total_files, f"Bỏ qua: {relative_path.name}")
-                if not output_file_path.exists():
-                    try:
-                        shutil.copy(file_path, output_file_path)
-                    except Exception as e:
-                        self.log(f"Lỗi khi copy file đã bỏ qua {file_path} sang {output_file_path}: {e}", level="error")
+                try:
+                    self._copy_to_outputs(input_store, rel, output_stores, missing_only=True)
+                except Exception as e:
+                    self.log(f"Lỗi khi copy file đã bỏ qua {file_path} sang thư mục kết quả: {e}", level="error")
                 continue
 
             self.log(f"Đang xử lý file: {relative_path}", level="info")
             try:
-                if file_path.suffix == ".json":
+                if relative_path.suffix == ".json":
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
+                        with self.metrics.stage("parse"):
+                            data = json.loads(input_store.read_text(rel))
                     except json.JSONDecodeError as e:
                         self.log(f"Lỗi định dạng JSON trong file {file_path}: {e}. Bỏ qua dịch file này.", level="error")
-                        shutil.copy(file_path, output_file_path) # Copy nguyên bản nếu lỗi
+                        self._copy_to_outputs(input_store, rel, output_stores) # Copy nguyên bản nếu lỗi
                         translated_file_map[str(relative_path)] = True
                         continue
                     except UnicodeDecodeError as e:
                         self.log(f"Lỗi mã hóa trong file {file_path}: {e}. Đảm bảo file được mã hóa UTF-8.", level="error")
-                        shutil.copy(file_path, output_file_path)
+                        self._copy_to_outputs(input_store, rel, output_stores)
                         translated_file_map[str(relative_path)] = True
                         continue
                     
-                    texts_in_file = []
-                    
-                    def find_json_strings(obj):
-                        if isinstance(obj, dict):
-                            for k, v in obj.items():
-                                if isinstance(v, str) and len(v) > 0 and not v.isspace():
-                                    texts_in_file.append(v)
-                                find_json_strings(v)
-                        elif isinstance(obj, list):
-                            for item in obj:
-                                if isinstance(item, str) and len(item) > 0 and not item.isspace():
-                                    texts_in_file.append(item)
-                                find_json_strings(item)
-                    
-                    find_json_strings(data)
+                    file_id = store.add_file()
+                    # Vị trí (container, key) của từng chuỗi cần dịch, cùng thứ tự với các đoạn của file trong kho
+                    string_slots = []
+
+                    with self.metrics.stage("filter"):
+                        self.skip_classifier.begin_document(data)
+                        for container, key, value in iter_strings(data):
+                            if self.skip_classifier.is_translatable_field(container, key, value):
+                                store.add(file_id, value)
+                                string_slots.append((container, key))
                     
-                    if not texts_in_file:
+                    if not string_slots:
                         self.log(f"Không tìm thấy văn bản để dịch trong file JSON: {relative_path}", level="warning")
-                        shutil.copy(file_path, output_file_path)
+                        self._copy_to_outputs(input_store, rel, output_stores)
                         translated_file_map[str(relative_path)] = True
                         continue
 
-                    translated_chunks = []
-                    for k in tqdm(range(0, len(texts_in_file), batch_size), desc=f"Dịch {relative_path.name}"):
-                        batch = texts_in_file[k:k + batch_size]
-                        
-                        processed_batch = []
-                        for text_item in batch:
-                            final_text = text_item
-                            for original, translated in self.dictionary.items():
-                                final_text = final_text.replace(original, translated)
-                            processed_batch.append(final_text)
+                    self._translate_pending(store, file_id, source_lang_nllb, target_langs_nllb, batch_size, auto_detect, relative_path)
 
-                        try:
-                            if auto_detect:
-                                tokens_batch = self.sp_model.encode(processed_batch, out_type=str)
-                            else:
-                                tokens_batch = self.sp_model.encode([f"__{source_lang_nllb}__ {t}" for t in processed_batch], out_type=str)
-                            
-                            target_prefix_tokens_batch = [[f"__{target_lang_nllb}__"]] * len(tokens_batch)
-
-                            results = self.translator.translate_batch(
-                                tokens_batch,
-                                target_prefix=target_prefix_tokens_batch,
-                                max_length=self.max_tokens,
-                                num_beams=self.num_beams
-                            )
-                            
-                            batch_translated_texts = []
-                            for res in results:
-                                translated_tokens = res.hypotheses[0]
-                                if translated_tokens and translated_tokens[0] == target_prefix_tokens_batch[0][0]:
-                                    translated_tokens = translated_tokens[1:]
-                                batch_translated_texts.append(self.sp_model.decode(translated_tokens))
-                            
-                            translated_chunks.extend(batch_translated_texts)
-                        except Exception as translate_err:
-                            self.log(f"Lỗi khi gọi translate_batch cho một batch trong file {relative_path}: {translate_err}", level="error")
-                            # Đảm bảo vẫn thêm các chuỗi gốc nếu dịch thất bại
-                            translated_chunks.extend(processed_batch) 
-
-                    translated_data = data
-                    
-                    # Iterator để cập nhật các chuỗi dịch vào cấu trúc JSON
-                    translated_texts_iter = iter(translated_chunks)
-
-                    def update_json_with_translated_strings(obj):
-                        if isinstance(obj, dict):
-                            for k, v in obj.items():
-                                if isinstance(v, str) and len(v) > 0 and not v.isspace():
-                                    try:
-                                        obj[k] = next(translated_texts_iter)
-                                    except StopIteration:
-                                        self.log("Cảnh báo: Số lượng chuỗi dịch không khớp với số chuỗi gốc trong JSON. Một số chuỗi có thể không được dịch.", level="warning")
-                                        break # Dừng lại nếu hết chuỗi dịch
-                                else:
-                                    update_json_with_translated_strings(v)
-                        elif isinstance(obj, list):
-                            for i, item in enumerate(obj):
-                                if isinstance(item, str) and len(item) > 0 and not item.isspace():
-                                    try:
-                                        obj[i] = next(translated_texts_iter)
-                                    except StopIteration:
-                                        self.log("Cảnh báo: Số lượng chuỗi dịch không khớp với số chuỗi gốc trong JSON. Một số chuỗi có thể không được dịch.", level="warning")
-                                        break # Dừng lại nếu hết chuỗi dịch
-                                else:
-                                    update_json_with_translated_strings(item)
-                    
-                    update_json_with_translated_strings(translated_data)
+                    write_ok = True
+                    for lang_index, output_store in enumerate(output_stores):
+                        # Ghi đè trực tiếp các vị trí đã lấy chuỗi; mỗi ngôn ngữ đích ghi đè lại đúng các vị trí đó nên không cần sao chép dữ liệu
+                        with self.metrics.stage("writeback"):
+                            for (container, key), (_, text_id) in zip(string_slots, store.file_segments(file_id)):
+                                container[key] = store.translation(text_id, lang_index)
 
-                    try:
-                        with open(output_file_path, 'w', encoding='utf-8') as f:
-                            json.dump(translated_data, f, ensure_ascii=False, indent=2)
+                        try:
+                            with self.metrics.stage("write"):
+                                output_store.write_text(rel, json.dumps(data, ensure_ascii=False, indent=2))
+                        except OSError as e:
+                            self.log(f"Lỗi ghi file {rel} vào {output_store.location}: {e}. Kiểm tra quyền ghi.", level="error")
+                            self._copy_to_outputs(input_store, rel, [output_store]) # Copy nguyên bản nếu lỗi ghi
+                            write_ok = False
+                    if write_ok:
                         translated_count += 1
-                        translated_file_map[str(relative_path)] = True
-                    except OSError as e:
-                        self.log(f"Lỗi ghi file {output_file_path}: {e}. Kiểm tra quyền ghi.", level="error")
-                        shutil.copy(file_path, output_file_path) # Copy nguyên bản nếu lỗi ghi
-                        translated_file_map[str(relative_path)] = False # Đánh dấu là chưa dịch thành công
+                    translated_file_map[str(relative_path)] = write_ok # False: chưa dịch thành công
                         
-                elif file_path.suffix == ".txt" or file_path.suffix == ".rpy" or file_path.suffix == ".xml":
+                elif relative_path.suffix == ".txt" or relative_path.suffix == ".rpy" or relative_path.suffix == ".xml":
                     try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            lines = f.readlines()
+                        with self.metrics.stage("parse"):
+                            lines = input_store.read_lines(rel)
                     except UnicodeDecodeError as e:
                         self.log(f"Lỗi mã hóa trong file {file_path}: {e}. Đảm bảo file được mã hóa UTF-8.", level="error")
-                        shutil.copy(file_path, output_file_path)
+                        self._copy_to_outputs(input_store, rel, output_stores)
                         translated_file_map[str(relative_path)] = True
                         continue
                     
-                    lines_to_translate = []
-                    original_line_map = {} # Lưu trữ ánh xạ từ nội dung đã xử lý về vị trí dòng gốc
+                    file_id = store.add_file()
+                    # File translate Ren'Py tạo khi giải nén .rpyc: chỉ dịch phần chuỗi trong dấu nháy của lời thoại
+                    renpy_tl = relative_path.suffix == ".rpy" and is_translation_file(lines)
                     
-                    for idx, line in enumerate(lines):
-                        line_stripped = line.strip()
-                        # Loại bỏ các dòng trống, comment, và các ký tự đặc biệt không phải văn bản
-                        if line_stripped and not line_stripped.startswith(('#', '//', '<!', '<?', '{', '}')) and line_stripped not in ['[', ']']:
-                            # Thêm line_stripped vào dict nếu chưa có, hoặc cập nhật list các index
-                            if line_stripped not in original_line_map:
-                                original_line_map[line_stripped] = []
-                            original_line_map[line_stripped].append(idx)
-                            lines_to_translate.append(line_stripped)
+                    with self.metrics.stage("filter"):
+                        for idx, line in enumerate(lines):
+                            if renpy_tl:
+                                parts = split_translatable_line(line)
+                                if parts and parts[1].strip() and self.skip_classifier.is_translatable(parts[1]):
+                                    store.add(file_id, parts[1], address=idx)
+                                continue
+                            line_stripped = line.strip()
+                            # Loại bỏ các dòng trống, comment, và các ký tự đặc biệt không phải văn bản
+                            if line_stripped and not line_stripped.startswith(('#', '//', '<!', '<?', '{', '}')) and line_stripped not in ['[', ']'] and self.skip_classifier.is_translatable(line_stripped):
+                                store.add(file_id, line_stripped, address=idx) # Địa chỉ của đoạn là số dòng gốc
                         
-                    if not lines_to_translate:
+                    if not store.file_segment_count(file_id):
                         self.log(f"Không tìm thấy văn bản để dịch trong file văn bản: {relative_path}", level="warning")
-                        shutil.copy(file_path, output_file_path)
+                        if renpy_tl:
+                            self._write_renpy_translation(lines, rel, output_stores, target_langs_nllb)
+                        else:
+                            self._copy_to_outputs(input_store, rel, output_stores)
                         translated_file_map[str(relative_path)] = True
                         continue
 
-                    translated_chunks = []
-                    for k in tqdm(range(0, len(lines_to_translate), batch_size), desc=f"Dịch {relative_path.name}"):
-                        batch = lines_to_translate[k:k + batch_size]
-                        
-                        processed_batch = []
-                        for text_item in batch:
-                            final_text = text_item
-                            for original, translated in self.dictionary.items():
-                                final_text = final_text.replace(original, translated)
-                            processed_batch.append(final_text)
+                    self._translate_pending(store, file_id, source_lang_nllb, target_langs_nllb, batch_size, auto_detect, relative_path)
+
+                    write_ok = True
+                    for lang_index, output_store in enumerate(output_stores):
+                        final_translated_content = list(lines) # Bắt đầu với bản sao của các dòng gốc
+                        # Cập nhật các dòng đã dịch vào vị trí chính xác
+                        with self.metrics.stage("writeback"):
+                            for line_idx, text_id in store.file_segments(file_id):
+                                if renpy_tl:
+                                    before, _, after = split_translatable_line(lines[line_idx])
+                                    final_translated_content[line_idx] = join_translatable_line(before, store.translation(text_id, lang_index), after)
+                                else:
+                                    final_translated_content[line_idx] = store.translation(text_id, lang_index) + '\n' # Giữ nguyên xuống dòng
 
                         try:
-                            if auto_detect:
-                                tokens_batch = self.sp_model.encode(processed_batch, out_type=str)
+                            if renpy_tl:
+                                self._write_renpy_translation(final_translated_content, rel, [output_store], [target_langs_nllb[lang_index]])
                             else:
-                                tokens_batch = self.sp_model.encode([f"__{source_lang_nllb}__ {t}" for t in processed_batch], out_type=str)
-                            
-                            target_prefix_tokens_batch = [[f"__{target_lang_nllb}__"]] * len(tokens_batch)
-
-                            results = self.translator.translate_batch(
-                                tokens_batch,
-                                target_prefix=target_prefix_tokens_batch,
-                                max_length=self.max_tokens,
-                                num_beams=self.num_beams
-                            )
-                            
-                            batch_translated_texts = []
-                            for res in results:
-                                translated_tokens = res.hypotheses[0]
-                                if translated_tokens and translated_tokens[0] == target_prefix_tokens_batch[0][0]:
-                                    translated_tokens = translated_tokens[1:]
-                                batch_translated_texts.append(self.sp_model.decode(translated_tokens))
-                            
-                            translated_chunks.extend(batch_translated_texts)
-                        except Exception as translate_err:
-                            self.log(f"Lỗi khi gọi translate_batch cho một batch trong file {relative_path}: {translate_err}", level="error")
-                            # Đảm bảo vẫn thêm các chuỗi gốc nếu dịch thất bại
-                            translated_chunks.extend(processed_batch) 
-
-                    final_translated_content = list(lines) # Bắt đầu với bản sao của các dòng gốc
-                    translated_iter = iter(translated_chunks)
-                    
-                    # Cập nhật các dòng đã dịch vào vị trí chính xác
-                    for original_text in lines_to_translate: # Lặp qua danh sách đã lọc để duy trì thứ tự
-                        original_indices = original_line_map.get(original_text, [])
-                        if original_indices:
-                            try:
-                                translated_text = next(translated_iter)
-                                for idx in original_indices:
-                                    final_translated_content[idx] = translated_text + '\n' # Giữ nguyên xuống dòng
-                            except StopIteration:
-                                self.log("Cảnh báo: Số lượng chuỗi dịch không khớp với số chuỗi gốc. Một số dòng có thể không được dịch.", level="warning")
-                                break # Dừng lại nếu hết chuỗi dịch
-
-                    try:
-                        with open(output_file_path, 'w', encoding='utf-8') as f:
-                            f.writelines(final_translated_content)
+                                with self.metrics.stage("write"):
+                                    output_store.write_lines(rel, final_translated_content)
+                        except OSError as e:
+                            self.log(f"Lỗi ghi file {rel} vào {output_store.location}: {e}. Kiểm tra quyền ghi.", level="error")
+                            self._copy_to_outputs(input_store, rel, [output_store]) # Copy nguyên bản nếu lỗi ghi
+                            write_ok = False
+                    if write_ok:
                         translated_count += 1
-                        translated_file_map[str(relative_path)] = True
-                    except OSError as e:
-                        self.log(f"Lỗi ghi file {output_file_path}: {e}. Kiểm tra quyền ghi.", level="error")
-                        shutil.copy(file_path, output_file_path) # Copy nguyên bản nếu lỗi ghi
-                        translated_file_map[str(relative_path)] = False # Đánh dấu là chưa dịch thành công
+                    translated_file_map[str(relative_path)] = write_ok # False: chưa dịch thành công
 
                 self.progress_callback(translated_count + skipped_count, total_files, f"Dịch: {relative_path.name}")
 
+            except TranslationCancelled:
+                # File đang dịch dở không được đánh dấu, sẽ được dịch lại khi tiếp tục
+                cancelled = True
+                break
             except Exception as e:
                 self.log(f"Lỗi không xác định khi xử lý file {relative_path}: {e}", level="error")
-                if not output_file_path.exists():
-                    try:
-                        shutil.copy(file_path, output_file_path)
-                    except Exception as copy_err:
-                        self.log(f"Không thể copy file gốc {file_path} sau lỗi: {copy_err}", level="error")
+                try:
+                    self._copy_to_outputs(input_store, rel, output_stores, missing_only=True)
+                except Exception as copy_err:
+                    self.log(f"Không thể copy file gốc {file_path} sau lỗi: {copy_err}", level="error")
                 translated_file_map[str(relative_path)] = False # Đánh dấu là không thành công
 
+        if len(store):
+            self.log(f"Kho chuỗi: {len(store)} đoạn, {store.text_count} chuỗi khác nhau (gồm bản dịch), "
+                     f"{store.memory_usage() / (1024 * 1024):.1f} MB RAM" + (f", {store.spilled_bytes / (1024 * 1024):.1f} MB trên đĩa" if store.spilled_bytes else ""))
+        store.close()
+        self._close_stores(input_store, *output_stores)
+
         try:
             with open(translation_status_file, 'w', encoding='utf-8') as f:
                 json.dump(translated_file_map, f, indent=4)
@@ -672,194 +1084,252 @@ class AutoTranslator:
         except Exception as e:
             self.log(f"Lỗi khi lưu trạng thái dịch: {e}", level="error")
 
+        self.metrics.add("files_translated", translated_count)
+        self.metrics.add("files_skipped", skipped_count)
+        self.metrics.add("segments_passthrough", sum(self.skip_classifier.stats.values()))
+        self.metrics.add("segments_same_language", self.same_language_count)
+        self._write_metrics_summary()
+        self._write_review_report()
+
+        if cancelled:
+            self.log(f"Đã dừng dịch theo yêu cầu sau {translated_count} file. Dùng 'Tiếp tục dịch' để dịch tiếp phần còn lại.", level="warning")
+            raise TranslationCancelled("Đã dừng dịch theo yêu cầu của người dùng.")
+
+        if self.skip_classifier.stats:
+            self.log(f"Đã giữ nguyên {sum(self.skip_classifier.stats.values())} chuỗi không cần dịch: {self.skip_classifier.summary()}")
+        if self.same_language_count:
+            self.log(f"Đã giữ nguyên {self.same_language_count} chuỗi đã ở sẵn ngôn ngữ đích.")
+        pack_count = self.metrics.counters.get("segments_pack", 0)
+        if pack_count:
+            self.log(f"Đã dịch {pack_count} chuỗi mặc định của engine bằng gói bản dịch dựng sẵn.")
+        if self.translation_memory is not None and self.translation_memory.stats:
+            self.log(f"Bộ nhớ dịch: {self.translation_memory.summary()} (exact/template là số chuỗi dùng lại không qua model, fuzzy chỉ là gợi ý).")
         self.log(f"Hoàn tất quá trình dịch. Đã dịch {translated_count} file, bỏ qua {skipped_count} file.")
+        if len(output_locations) > 1:
+            self.log(f"Kết quả theo từng ngôn ngữ nằm tại: {', '.join(output_locations)}")
         return translated_count > 0
 
-    def fix_post_translation_issues(self, translated_files_path, engine_type):
-        self.log(f"Bắt đầu fix lỗi sau dịch cho: {translated_files_path} (Engine: {engine_type})")
-        
-        fixed_count = 0
-        total_files_to_fix = 0
-
-        if engine_type == "RPGMakerMV":
-            json_files = list(Path(translated_files_path).glob("*.json"))
-            total_files_to_fix = len(json_files)
-            for i, file_path in enumerate(json_files):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    def process_rpg_json_item_post(item):
-                        if isinstance(item, dict):
-                            for key, value in item.items():
-                                if isinstance(value, str):
-                                    value = value.replace('\\\\n', '\\n')
-                                    item[key] = value
-                                process_rpg_json_item_post(value)
-                        elif isinstance(item, list):
-                            for element in item:
-                                process_rpg_json_item_post(element)
-                    
-                    process_rpg_json_item_post(data)
-                    
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    fixed_count += 1
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix post-RPGMaker: {file_path.name}")
-                except Exception as e:
-                    self.log(f"Lỗi khi fix post-translation file {file_path}: {e}", level="error")
+    def _open_translation_memory(self):
+        """Mở (một lần) bộ nhớ dịch dùng chung; lỗi khi mở chỉ tắt tính năng, không dừng quá trình dịch."""
+        if self.use_translation_memory and not self.backend.real_translations:
+            # Backend giả lập (echo, pseudo): không ghi kết quả giả vào bộ nhớ dịch, cũng không đọc bản dịch thật từ đó
+            self.log(f"Backend '{self.backend.name}' không tạo bản dịch thật, bỏ qua bộ nhớ dịch dùng chung.")
+        if not self.use_translation_memory or not self.backend.real_translations:
+            if self.translation_memory is not None:
+                self.translation_memory.close()
+            self.translation_memory = None
+            return
+        if self.translation_memory is None:
+            tm_file = self.output_base_path / "translation_memory.sqlite"
+            try:
+                self.translation_memory = TranslationMemory(tm_file, fuzzy_threshold=self.tm_fuzzy_threshold)
+                self.log(f"Đã mở bộ nhớ dịch: {tm_file} ({len(self.translation_memory)} mục)")
+            except Exception as e:
+                self.translation_memory = None
+                self.log(f"Không thể mở bộ nhớ dịch {tm_file}: {e}. Tiếp tục dịch không dùng bộ nhớ dịch.", level="warning")
+                return
+        self.translation_memory.stats.clear()
+
+    def get_translated_output_dirs(self, game_name, target_langs_nllb):
+        """
+        Thư mục kết quả dịch cho từng ngôn ngữ đích. Một ngôn ngữ: translated_game_files/<game>
+        (như trước); nhiều ngôn ngữ: translated_game_files/<game>/<mã NLLB>.
+        """
+        base_dir = self.output_base_path / "translated_game_files" / game_name
+        if len(target_langs_nllb) == 1:
+            return [base_dir]
+        return [base_dir / lang for lang in target_langs_nllb]
+
+    def _write_renpy_translation(self, lines, rel, output_stores, target_langs_nllb):
+        """Ghi file translate Ren'Py cho từng ngôn ngữ đích, thay tên ngôn ngữ tạm bằng tên ngôn ngữ của Ren'Py."""
+        for output_store, target_lang in zip(output_stores, target_langs_nllb):
+            language = renpy_language(target_lang)
+            with self.metrics.stage("write"):
+                output_store.write_lines(rel, [line.replace(TL_LANGUAGE, language) for line in lines])
+
+    def _copy_to_outputs(self, input_store, rel, output_stores, missing_only=False):
+        """Copy nguyên bản file rel sang các kho kết quả (missing_only: chỉ những kho chưa có file này)."""
+        data = None
+        for output_store in output_stores:
+            if missing_only and output_store.exists(rel):
+                continue
+            if data is None:
+                data = input_store.read_bytes(rel)
+            output_store.write_bytes(rel, data)
 
-        elif engine_type == "RenPy":
-            rpy_files = list(Path(translated_files_path).glob("*.rpy"))
-            total_files_to_fix = len(rpy_files)
-            for i, file_path in enumerate(rpy_files):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                    
-                    new_lines = []
-                    for line in lines:
-                        line = re.sub(r'\{ (.*?)\}', r'{\1}', line)
-                        line = re.sub(r'\[ (.*?) \]', r'[\1]', line)
-                        new_lines.append(line)
-                    
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(new_lines)
-                    fixed_count += 1
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix post-RenPy: {file_path.name}")
-                except Exception as e:
-                    self.log(f"Lỗi khi fix post-translation file {file_path}: {e}", level="error")
+    def _close_stores(self, *stores):
+        for store in stores:
+            try:
+                store.close()
+            except Exception as e:
+                self.log(f"Lỗi khi đóng {store.location}: {e}", level="error")
 
-        elif engine_type == "Generic" or engine_type == "Unity":
-            text_files = []
-            for ext in ["*.json", "*.txt", "*.xml"]:
-                text_files.extend(list(Path(translated_files_path).rglob(ext)))
-            
-            total_files_to_fix = len(text_files)
-            for i, file_path in enumerate(text_files):
-                try:
-                    if file_path.suffix == ".json":
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            data = json.load(f)
-                        
-                        def process_json_strings_post(obj):
-                            if isinstance(obj, dict):
-                                for k, v in obj.items():
-                                    if isinstance(v, str):
-                                        obj[k] = v.replace('\\n', '\n')
-                                        obj[k] = obj[k].replace('\\"', '"')
-                                    else:
-                                        process_json_strings_post(v)
-                            elif isinstance(obj, list):
-                                for item in obj:
-                                    process_json_strings_post(item)
-                        process_json_strings_post(data)
-                        
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, ensure_ascii=False, indent=2)
-                        fixed_count += 1
-
-                    elif file_path.suffix == ".txt":
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            content = f.read()
-                        content = re.sub(r'\s{2,}', ' ', content)
-                        content = content.replace(' .', '.').replace(' ,', ',')
-                        with open(file_path, 'w', encoding='utf-8') as f:
-                            f.write(content)
-                        fixed_count += 1
-                    
-                    elif file_path.suffix == ".xml":
-                        import xml.etree.ElementTree as ET
-                        tree = ET.parse(file_path)
-                        root = tree.getroot()
-                        
-                        def process_xml_element_post(element):
-                            if element.text:
-                                element.text = element.text.replace('\u0000', '').strip()
-                                element.text = element.text.replace('&amp;', '&') 
-                            for child in element:
-                                process_xml_element_post(child)
-                        
-                        process_xml_element_post(root)
-                        tree.write(file_path, encoding='utf-8', xml_declaration=True)
-                        fixed_count += 1
+    def _write_metrics_summary(self):
+        metrics_file = self.output_base_path / "translation_metrics.json"
+        try:
+            summary = self.metrics.write_summary(metrics_file)
+            stages = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in summary["stage_seconds"].items())
+            self.log(f"Hiệu năng: {summary['segments_per_second'] or 0} đoạn/s, {summary['target_tokens_per_second'] or 0} token đích/s, "
+                     f"batch đầy {summary['batch_fill_ratio'] or 0:.0%}, cache hit {summary['cache_hit_rate'] or 0:.0%}. Thời gian: {stages}")
+            self.log(f"Đã lưu số liệu hiệu năng vào: {metrics_file}")
+        except Exception as e:
+            self.log(f"Lỗi khi lưu số liệu hiệu năng: {e}", level="error")
 
-                    self.progress_callback(i + 1, total_files_to_fix, f"Fix post-Generic: {file_path.name}")
+    def fix_post_translation_issues(self, translated_files_path, engine_type):
+        self.log(f"Bắt đầu fix lỗi sau dịch cho: {translated_files_path} (Engine: {engine_type})")
 
-                except Exception as e:
-                    self.log(f"Lỗi khi fix post-translation file {file_path}: {e}", level="error")
+        with self._open_store(translated_files_path) as store:
+            file_names = self._files_to_fix(store, engine_type)
+            fixed_count = self._run_file_fixes(store, file_names, engine_type, "post")
 
         if fixed_count > 0:
-            self.log(f"Đã fix {fixed_count}/{total_files_to_fix} lỗi sau dịch.")
+            self.log(f"Đã fix {fixed_count}/{len(file_names)} lỗi sau dịch.")
         else:
             self.log("Không có lỗi nào được fix sau dịch hoặc không tìm thấy file để xử lý.")
         return True
 
-    def repack_game(self, translated_files_path, original_game_path, engine_type):
+    def repack_game(self, translated_files_path, original_game_path, engine_type, target_lang=None):
         self.log(f"Bắt đầu đóng gói game từ '{translated_files_path}' vào '{original_game_path}' (Engine: {engine_type})")
         
-        repacked_count = 0
-        total_files = 0
-
         original_game_path = Path(original_game_path)
         
-        target_game_path = self.output_base_path / "final_translated_game" / original_game_path.name
-        target_game_path.mkdir(parents=True, exist_ok=True)
+        target_game_path = self.output_base_path / "final_translated_game" / self.game_work_name(original_game_path)
+        if target_lang:
+            # Dịch nhiều ngôn ngữ: mỗi ngôn ngữ một bản game riêng
+            target_game_path = target_game_path / target_lang
+
+        with self._open_store(translated_files_path) as store:
+            files_to_repack = store.list_files((".json", ".txt", ".xml", ".rpy"))
+            if self.archive_storage:
+                return self._repack_patch_archive(store, files_to_repack, original_game_path, target_game_path, engine_type)
+
+            target_game_path.mkdir(parents=True, exist_ok=True)
+            self.log(f"Sao chép toàn bộ game gốc từ '{original_game_path}' sang '{target_game_path}'...")
+            try:
+                if sys.platform == "win32":
+                    subprocess.run(['robocopy', str(original_game_path), str(target_game_path), '/E', '/COPYALL', '/DCOPY:T', '/R:1', '/W:1'], check=True, creationflags=subprocess.CREATE_NO_WINDOW) # Thêm cờ để không hiển thị cửa sổ console
+                else:
+                    shutil.copytree(original_game_path, target_game_path, dirs_exist_ok=True)
+                self.log("Sao chép game gốc hoàn tất.")
+            except Exception as e:
+                self.log(f"Lỗi khi sao chép game gốc: {e}", level="error")
+                return False
 
-        self.log(f"Sao chép toàn bộ game gốc từ '{original_game_path}' sang '{target_game_path}'...")
-        try:
-            if sys.platform == "win32":
-                subprocess.run(['robocopy', str(original_game_path), str(target_game_path), '/E', '/COPYALL', '/DCOPY:T', '/R:1', '/W:1'], check=True, creationflags=subprocess.CREATE_NO_WINDOW) # Thêm cờ để không hiển thị cửa sổ console
-            else:
-                shutil.copytree(original_game_path, target_game_path, dirs_exist_ok=True)
-            self.log("Sao chép game gốc hoàn tất.")
-        except Exception as e:
-            self.log(f"Lỗi khi sao chép game gốc: {e}", level="error")
+            self.log(f"Đang ghi đè các file đã dịch từ '{store.location}' vào game đích...")
+            if not files_to_repack:
+                self.log("Không tìm thấy file đã dịch nào để đóng gói lại.", level="warning")
+                return True
+
+            def _write_file(rel, destination_rel):
+                store.export_file(rel, target_game_path / destination_rel)
+
+            def _write_asset(asset_rel, texts):
+                return apply_texts(target_game_path / asset_rel, texts)
+
+            repacked_count = self._repack_files(store, files_to_repack, engine_type, _write_file, _write_asset)
+
+        self._log_repack_notes(engine_type)
+        if repacked_count > 0:
+            self.log(f"Đã đóng gói {repacked_count}/{len(files_to_repack)} file đã dịch vào game đích.")
+            self.log(f"Game đã dịch hoàn chỉnh nằm tại: {target_game_path}")
+            return True
+        else:
+            self.log("Không có file nào được đóng gói lại.", level="warning")
             return False
 
-        self.log(f"Đang ghi đè các file đã dịch từ '{translated_files_path}' vào game đích...")
-        
-        files_to_repack = []
-        for ext in ["*.json", "*.txt", "*.xml", "*.rpy"]:
-            files_to_repack.extend(list(Path(translated_files_path).rglob(ext)))
-        
-        total_files = len(files_to_repack)
-        if total_files == 0:
+    def _repack_patch_archive(self, store, files_to_repack, original_game_path, target_game_path, engine_type):
+        """
+        Đóng gói dạng patch (khi bật archive_storage): chỉ các file đã dịch, đặt đúng vị trí trong thư mục game,
+        được nén vào một file <thư mục game đích>.zip thay vì sao chép toàn bộ game gốc. Asset Unity được ghi
+        bản dịch vào một bản sao tạm của asset gốc rồi thêm vào patch.
+        """
+        patch_path = target_game_path.with_name(target_game_path.name + ".zip")
+        if not files_to_repack:
             self.log("Không tìm thấy file đã dịch nào để đóng gói lại.", level="warning")
             return True
 
-        for i, translated_file_path in enumerate(files_to_repack):
-            relative_path = translated_file_path.relative_to(translated_files_path)
-            destination_path = target_game_path / relative_path
+        self.log(f"Đang ghi các file đã dịch từ '{store.location}' vào file patch '{patch_path}'...")
+        patch_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_patch_path = patch_path.with_name(patch_path.name + ".tmp")
+        with zipfile.ZipFile(temp_patch_path, 'w', compression=zipfile.ZIP_DEFLATED) as patch, \
+                tempfile.TemporaryDirectory(dir=self.output_base_path) as temp_dir:
+
+            def _write_file(rel, destination_rel):
+                patch.writestr(destination_rel, store.read_bytes(rel))
+
+            def _write_asset(asset_rel, texts):
+                asset_copy = Path(temp_dir) / Path(asset_rel).name
+                shutil.copy(original_game_path / asset_rel, asset_copy)
+                rewritten = apply_texts(asset_copy, texts)
+                patch.write(asset_copy, asset_rel)
+                asset_copy.unlink()
+                return rewritten
+
+            repacked_count = self._repack_files(store, files_to_repack, engine_type, _write_file, _write_asset)
+        os.replace(temp_patch_path, patch_path)
+
+        self._log_repack_notes(engine_type)
+        if repacked_count > 0:
+            self.log(f"Đã đóng gói {repacked_count}/{len(files_to_repack)} file đã dịch vào file patch "
+                     f"({patch_path.stat().st_size / (1024 * 1024):.1f} MB).")
+            self.log(f"Bản dịch nằm tại: {patch_path}. Giải nén file này vào thư mục game gốc (ghi đè file cũ) để áp dụng.")
+            return True
+        else:
+            self.log("Không có file nào được đóng gói lại.", level="warning")
+            return False
+
+    def _repack_files(self, store, files_to_repack, engine_type, write_file, write_asset):
+        """
+        Ghi từng file đã dịch trong store qua write_file(rel, đường dẫn đích tương đối với thư mục game) hoặc, với
+        văn bản trích từ asset Unity, write_asset(đường dẫn asset, văn bản). Trả về số file đã đóng gói.
+        """
+        total_files = len(files_to_repack)
+        repacked_count = 0
+        for i, rel in enumerate(files_to_repack):
+            self._checkpoint()
+            destination_rel = rel
+            if engine_type == "RenPy":
+                # Script Ren'Py (và file translate trong tl/) được giải nén từ thư mục game/
+                destination_rel = f"game/{rel}"
+            elif engine_type == "Unity" and rel.endswith(UNITY_TEXT_SUFFIX):
+                # Văn bản trích từ asset: ghi các object đã dịch vào bản sao của file asset thay vì copy file JSON
+                asset_rel = rel[:-len(UNITY_TEXT_SUFFIX)]
+                try:
+                    texts = json.loads(store.read_text(rel))
+                    rewritten = write_asset(asset_rel, texts)
+                    repacked_count += 1
+                    self.log(f"Đã ghi {rewritten} object đã dịch vào asset {asset_rel}.")
+                    self.progress_callback(i + 1, total_files, f"Đóng gói asset: {Path(asset_rel).name}")
+                except Exception as e:
+                    self.log(f"Lỗi khi ghi bản dịch vào asset {asset_rel}: {e}", level="error")
+                continue
 
             try:
-                destination_path.parent.mkdir(parents=True, exist_ok=True) 
-                shutil.copy(translated_file_path, destination_path)
+                write_file(rel, destination_rel)
                 repacked_count += 1
-                self.progress_callback(i + 1, total_files, f"Đóng gói: {relative_path.name}")
+                self.progress_callback(i + 1, total_files, f"Đóng gói: {Path(rel).name}")
             except Exception as e:
-                self.log(f"Lỗi khi ghi đè file {translated_file_path} vào {destination_path}: {e}", level="error")
-        
+                self.log(f"Lỗi khi ghi đè file {rel} vào {destination_rel}: {e}", level="error")
+        return repacked_count
+
+    def _log_repack_notes(self, engine_type):
         if engine_type == "RPGMakerMV":
             self.log("Đối với RPG Maker MV/MZ, việc ghi đè file JSON là đủ. Không cần bước đóng gói đặc biệt.", level="info")
         elif engine_type == "RenPy":
-            self.log("Ren'Py yêu cầu biên dịch lại các file .rpy thành .rpyc. Vui lòng sử dụng Ren'Py SDK.", level="warning")
+            self.log("Ren'Py sẽ tự biên dịch các file .rpy đã dịch (kể cả file translate trong game/tl/) khi chạy game lần đầu.", level="info")
         elif engine_type == "Unity":
-            self.log("Đóng gói cho Unity thường phức tạp và cần công cụ chuyên dụng.", level="warning")
-        
-        if repacked_count > 0:
-            self.log(f"Đã đóng gói {repacked_count}/{total_files} file đã dịch vào game đích.")
-            self.log(f"Game đã dịch hoàn chỉnh nằm tại: {target_game_path}")
-            return True
-        else:
-            self.log("Không có file nào được đóng gói lại.", level="warning")
-            return False
+            self.log("Văn bản trong các file asset Unity (chưa nén) đã được ghi lại; AssetBundle nén (UnityFS) và file DLL cần công cụ chuyên dụng.", level="warning")
+        elif engine_type in ("WolfRPG", "Kirikiri"):
+            self.log("Chỉ các file văn bản rời được ghi đè; script nằm trong file lưu trữ (.wolf/.xp3) cần công cụ chuyên dụng để đóng gói lại.", level="warning")
 
 if __name__ == "__main__":
-    translator = AutoTranslator()
+    startup_time = time.perf_counter()
+    translator = AutoTranslator(backend=os.environ.get("AUTO_TRANSLATOR_BACKEND", "nllb"),
+                                small_models_path=os.environ.get("AUTO_TRANSLATOR_SMALL_MODEL") or None)
     
     try:
-        translator.initialize()
+        # Tải model ở nền trong lúc phát hiện engine / giải nén / fix lỗi trước dịch
+        translator.preload_async()
         
         test_game_path = "path/to/your/test/game" # THAY THẾ BẰNG ĐƯỜNG DẪN GAME THỰC TẾ CỦA BẠN
         if not Path(test_game_path).exists():
@@ -877,12 +1347,17 @@ if __name__ == "__main__":
                     "target_lang": "Vietnamese",
                     "batch_size": 4,
                     "use_dictionary": False,
-                    "auto_detect": True
+                    "auto_detect": True,
+                    "engine_type": engine
                 }
+                translator.wait_until_loaded()
+                print(f"Thời gian tới khi model sẵn sàng: {time.perf_counter() - startup_time:.2f}s")
                 if translator.translate_game(extracted_dir, translation_params):
-                    translated_dir = translator.output_base_path / "translated_game_files" / Path(test_game_path).name
-                    translator.fix_post_translation_issues(translated_dir, engine)
-                    translator.repack_game(translated_dir, test_game_path, engine)
+                    target_langs = [translator.supported_languages.get(code, "vie_Latn") for code in [translation_params["target_lang"]]]
+                    translated_dirs = translator.get_translated_output_dirs(Path(test_game_path).name, target_langs)
+                    for target_lang, translated_dir in zip(target_langs, translated_dirs):
+                        translator.fix_post_translation_issues(translated_dir, engine)
+                        translator.repack_game(translated_dir, test_game_path, engine, target_lang if len(target_langs) > 1 else None)
                 else:
                     print("Quá trình dịch không thành công.")
             else:
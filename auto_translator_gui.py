@@ -1,39 +1,92 @@
+import time
+STARTUP_TIME = time.perf_counter()
+
+import ast
 import os
 import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext, Menu
 import threading
+import queue
 import importlib.util
 import json
+import multiprocessing
 from datetime import datetime
 
-from auto_translate import AutoTranslator
+from auto_translate import AutoTranslator, TranslationCancelled
+from file_store import archive_path_for
+from job_queue import GameJobQueue, UNFINISHED
 
 # Đường dẫn thư mục chứa các module mở rộng
 MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "modules")
-
-def load_modules():
+# Số dòng tối đa giữ trong ô log và chu kỳ (ms) xử lý hàng đợi sự kiện từ các thread làm việc
+MAX_LOG_LINES = 2000
+UI_POLL_INTERVAL_MS = 100
+# Tự động tải model ở nền khi mở ứng dụng (đặt AUTO_TRANSLATOR_PRELOAD=0 để tắt)
+PRELOAD_MODEL = os.environ.get("AUTO_TRANSLATOR_PRELOAD", "1") != "0"
+# Backend dịch: "nllb" (mặc định), "echo" hoặc "pseudo" để thử pipeline mà không cần tải model
+TRANSLATION_BACKEND = os.environ.get("AUTO_TRANSLATOR_BACKEND", "nllb")
+# Thư mục model CTranslate2 nhỏ (vd: NLLB 600M distilled) để dịch chuỗi ngắn, dùng chung SentencePiece với model chính
+SMALL_MODEL_PATH = os.environ.get("AUTO_TRANSLATOR_SMALL_MODEL") or None
+
+def _read_menu_name(module_path, default):
     """
-    Quét thư mục modules/, tự động import các file .py có biến MENU_NAME và hàm run().
-    Trả về danh sách tuple (menu_name, run_func, module_obj).
+    Đọc biến MENU_NAME bằng cách phân tích cú pháp file, không thực thi module.
+    """
+    try:
+        with open(module_path, 'r', encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=module_path)
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+                if any(isinstance(target, ast.Name) and target.id == "MENU_NAME" for target in node.targets):
+                    return str(node.value.value)
+    except (OSError, SyntaxError, UnicodeDecodeError):
+        pass
+    return default
+
+
+def discover_modules():
+    """
+    Quét thư mục modules/ nhưng chưa import: chỉ lấy tên menu của các file .py.
+    Module chỉ được thực thi khi người dùng bấm nút lần đầu (xem load_module()).
+    Trả về danh sách tuple (menu_name, module_path).
     """
     modules = []
     if not os.path.exists(MODULES_DIR):
         os.makedirs(MODULES_DIR)
-    for filename in os.listdir(MODULES_DIR):
+    for filename in sorted(os.listdir(MODULES_DIR)):
         if filename.endswith(".py") and not filename.startswith("_"):
             module_path = os.path.join(MODULES_DIR, filename)
-            module_name = filename[:-3]
-            spec = importlib.util.spec_from_file_location(module_name, module_path)
-            mod = importlib.util.module_from_spec(spec)
-            try:
-                spec.loader.exec_module(mod)
-                menu_name = getattr(mod, "MENU_NAME", module_name)
-                run_func = getattr(mod, "run", None)
-                if callable(run_func):
-                    modules.append((menu_name, run_func, mod))
-            except Exception as e:
-                print(f"[LỖI] Không thể load module {filename}: {e}")
+            modules.append((_read_menu_name(module_path, filename[:-3]), module_path))
+    return modules
+
+
+def load_module(module_path):
+    """
+    Import một module mở rộng, trả về tuple (menu_name, run_func, module_obj).
+    run_func là None nếu module không có hàm run().
+    """
+    module_name = os.path.splitext(os.path.basename(module_path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    run_func = getattr(mod, "run", None)
+    return getattr(mod, "MENU_NAME", module_name), run_func if callable(run_func) else None, mod
+
+
+def load_modules():
+    """
+    Import ngay toàn bộ module trong modules/ có hàm run().
+    Trả về danh sách tuple (menu_name, run_func, module_obj).
+    """
+    modules = []
+    for _, module_path in discover_modules():
+        try:
+            menu_name, run_func, mod = load_module(module_path)
+            if run_func:
+                modules.append((menu_name, run_func, mod))
+        except Exception as e:
+            print(f"[LỖI] Không thể load module {os.path.basename(module_path)}: {e}")
     return modules
 
 class AutoTranslatorGUI:
@@ -42,7 +95,12 @@ class AutoTranslatorGUI:
         self.root.title("Công Cụ Dịch Game Tự Động (Mở Rộng)")
         self.root.geometry("950x750")
         self.root.minsize(900, 650)
-        self.modules = load_modules()
+        # Cầu nối từ thread làm việc sang Tk: log và lời gọi UI được đẩy vào hàng đợi,
+        # tiến trình chỉ giữ giá trị mới nhất; main loop xử lý định kỳ bằng after()
+        self.event_queue = queue.Queue()
+        self.pending_progress = None
+        self.modules = discover_modules()
+        self.loaded_modules = {}
         self.module_buttons = []
         
         # Menu bar
@@ -64,6 +122,7 @@ class AutoTranslatorGUI:
         # Trạng thái
         self.current_game_path = None
         self.translator = None
+        self.job_queue = None
         self.game_info = None
         self.translation_thread = None
         self.is_translating = False
@@ -82,8 +141,17 @@ class AutoTranslatorGUI:
         os.makedirs(self.output_path, exist_ok=True)
 
         self.create_widgets()
+        self.root.after(UI_POLL_INTERVAL_MS, self._drain_ui_events)
         self._initialize_translator_object()
-        self.load_translation_model()
+        # Chỉ bắt đầu tải model sau khi cửa sổ đã hiển thị
+        self.root.after_idle(self._on_window_ready)
+
+    def _on_window_ready(self):
+        self.log(f"Cửa sổ sẵn sàng sau {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms kể từ khi khởi động.")
+        if PRELOAD_MODEL:
+            self.load_translation_model()
+        else:
+            self.log("Chưa tải model (AUTO_TRANSLATOR_PRELOAD=0). Nhấn 'Tải model' khi cần.")
 
     def create_widgets(self):
         main_frame = ttk.Frame(self.root, padding="10")
@@ -175,6 +243,11 @@ class AutoTranslatorGUI:
         self.auto_repack_var = tk.BooleanVar(value=True)
         auto_repack_check = ttk.Checkbutton(workflow_frame, text="Tự động đóng gói", variable=self.auto_repack_var)
         auto_repack_check.grid(row=1, column=1, sticky=tk.W, pady=5)
+        
+        self.archive_storage_var = tk.BooleanVar(value=False)
+        archive_storage_check = ttk.Checkbutton(workflow_frame, text="Lưu file trung gian trong archive (.sqlite), xuất bản dịch dạng patch .zip",
+                                                variable=self.archive_storage_var, command=self._toggle_archive_storage)
+        archive_storage_check.grid(row=2, column=0, columnspan=2, sticky=tk.W, pady=5)
 
     def create_progress_section(self, parent):
         progress_frame = ttk.LabelFrame(parent, text="Tiến trình", padding="10")
@@ -188,8 +261,10 @@ class AutoTranslatorGUI:
     def create_log_section(self, parent):
         log_frame = ttk.LabelFrame(parent, text="Log", padding="10")
         log_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD)
+        self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, state=tk.DISABLED)
         self.log_text.pack(fill=tk.BOTH, expand=True)
+        self.log_text.tag_config("error", foreground="red")
+        self.log_text.tag_config("warning", foreground="orange")
         self.log("Khởi động công cụ dịch game...")
         self.log(f"Thư mục model: {self.models_path}")
         self.log(f"Thư mục đầu ra: {self.output_path}")
@@ -200,45 +275,90 @@ class AutoTranslatorGUI:
         """
         module_frame = ttk.LabelFrame(parent, text="Chức năng mở rộng (Module hóa)", padding="10")
         module_frame.pack(fill=tk.X, pady=5)
-        for menu_name, run_func, mod in self.modules:
-            btn = ttk.Button(module_frame, text=menu_name, command=lambda f=run_func: self.run_module(f))
+        for menu_name, module_path in self.modules:
+            btn = ttk.Button(module_frame, text=menu_name, command=lambda p=module_path: self.run_module(p))
             btn.pack(side=tk.LEFT, padx=5, pady=5)
             self.module_buttons.append(btn)
 
-    def run_module(self, run_func):
+    def run_module(self, module_path):
         """
-        Gọi hàm run() của module, truyền vào self (GUI) để module có thể thao tác với GUI nếu cần.
+        Import module ở lần bấm đầu tiên rồi gọi hàm run() của nó, truyền vào self (GUI)
+        để module có thể thao tác với GUI nếu cần.
         """
         try:
+            if module_path not in self.loaded_modules:
+                load_start = time.perf_counter()
+                self.loaded_modules[module_path] = load_module(module_path)
+                self.log(f"Đã load module {os.path.basename(module_path)} trong {(time.perf_counter() - load_start) * 1000:.0f} ms")
+            menu_name, run_func, mod = self.loaded_modules[module_path]
+            if not run_func:
+                raise AttributeError(f"Module {menu_name} không có hàm run()")
             run_func(self)
         except Exception as e:
             self.log(f"Lỗi khi chạy module: {e}", level="error")
             messagebox.showerror("Lỗi", f"Lỗi khi chạy module: {e}")
 
     def log(self, message, level="info"):
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        prefix = "[INFO]"
-        tag = ""
-        if level == "error":
-            prefix = "[LỖI]"
-            tag = "error"
-        elif level == "warning":
-            prefix = "[CẢNH BÁO]"
-            tag = "warning"
-        log_message = f"{timestamp} {prefix} {message}\n"
-        self.log_text.config(state=tk.NORMAL)
-        if tag:
-            self.log_text.tag_config("error", foreground="red")
-            self.log_text.tag_config("warning", foreground="orange")
-            self.log_text.insert(tk.END, log_message, tag)
-        else:
-            self.log_text.insert(tk.END, log_message)
-        self.log_text.see(tk.END)
-        self.log_text.config(state=tk.DISABLED)
-        self.status_bar.config(text=message)
-        self.root.update_idletasks()
+        """
+        Ghi log. An toàn khi gọi từ bất kỳ thread nào: chỉ đẩy sự kiện vào hàng đợi,
+        việc cập nhật widget do main loop thực hiện trong _drain_ui_events().
+        """
+        self.event_queue.put(("log", datetime.now().strftime("%H:%M:%S"), message, level))
 
     def update_progress(self, current, total, step=""):
+        # Chỉ giữ giá trị mới nhất; các cập nhật liên tiếp được gộp lại ở lần vẽ kế tiếp
+        self.pending_progress = (current, total, step)
+
+    def call_in_ui(self, func):
+        """Yêu cầu main loop gọi func (dùng thay cho root.after từ thread làm việc)."""
+        self.event_queue.put(("call", func))
+
+    def _drain_ui_events(self):
+        log_lines = []
+        calls = []
+        last_message = None
+        try:
+            while True:
+                event = self.event_queue.get_nowait()
+                if event[0] == "log":
+                    _, timestamp, message, level = event
+                    prefix, tag = "[INFO]", ""
+                    if level == "error":
+                        prefix, tag = "[LỖI]", "error"
+                    elif level == "warning":
+                        prefix, tag = "[CẢNH BÁO]", "warning"
+                    log_lines.append((f"{timestamp} {prefix} {message}\n", tag))
+                    last_message = message
+                else:
+                    calls.append(event[1])
+        except queue.Empty:
+            pass
+
+        if log_lines:
+            self.log_text.config(state=tk.NORMAL)
+            for line, tag in log_lines[-MAX_LOG_LINES:]:
+                self.log_text.insert(tk.END, line, tag)
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > MAX_LOG_LINES:
+                self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
+            self.log_text.see(tk.END)
+            self.log_text.config(state=tk.DISABLED)
+            self.status_bar.config(text=last_message)
+
+        progress = self.pending_progress
+        if progress is not None:
+            self.pending_progress = None
+            self._render_progress(*progress)
+
+        for func in calls:
+            try:
+                func()
+            except Exception as e:
+                self.log(f"Lỗi khi cập nhật giao diện: {e}", level="error")
+
+        self.root.after(UI_POLL_INTERVAL_MS, self._drain_ui_events)
+
+    def _render_progress(self, current, total, step=""):
         if not total:
             self.progress_var.set(0)
             self.progress_label.config(text=f"0/0 (0%) - {step}")
@@ -246,7 +366,6 @@ class AutoTranslatorGUI:
         percent = (current / total) * 100
         self.progress_var.set(percent)
         self.progress_label.config(text=f"{current}/{total} ({percent:.1f}%) - {step}")
-        self.root.update_idletasks()
 
     def _initialize_translator_object(self):
         try:
@@ -255,8 +374,11 @@ class AutoTranslatorGUI:
                 models_path=self.models_path,
                 output_base_path=self.output_path,
                 status_callback=self.log,
-                progress_callback=self.update_progress
+                progress_callback=self.update_progress,
+                backend=TRANSLATION_BACKEND,
+                small_models_path=SMALL_MODEL_PATH
             )
+            self._toggle_archive_storage()
             self.log("Đã khởi tạo đối tượng AutoTranslator thành công.")
         except Exception as e:
             self.log(f"Lỗi khi khởi tạo đối tượng AutoTranslator: {str(e)}", level="error")
@@ -264,13 +386,9 @@ class AutoTranslatorGUI:
 
     def is_model_loaded(self):
         """
-        Kiểm tra xem model dịch và SentencePiece model đã được tải hoàn chỉnh chưa.
+        Kiểm tra xem backend dịch (model và tokenizer) đã được tải hoàn chỉnh chưa.
         """
-        return (
-            self.translator is not None and
-            getattr(self.translator, "translator", None) is not None and
-            getattr(self.translator, "sp_model", None) is not None
-        )
+        return self.translator is not None and self.translator.is_loaded()
 
     def browse_game_folder(self):
         folder_path = filedialog.askdirectory(title="Chọn thư mục game")
@@ -307,12 +425,11 @@ class AutoTranslatorGUI:
                 'name': os.path.basename(game_path),
                 'engine': engine_type,
                 'lines': 'N/A', # Số dòng văn bản cần được tính sau khi extract
-                'can_continue': False, # Cần kiểm tra trạng thái dịch cũ
-                'can_repack': False # Cần kiểm tra khả năng đóng gói sau khi extract/dịch
+                # Có thể tiếp tục nếu đã có file giải nén và trạng thái dịch từ lượt trước (kể cả lượt bị dừng)
+                'can_continue': self._stage_data_folder(os.path.join(self.output_path, "extracted_game_files", os.path.basename(game_path))) is not None
+                                and os.path.exists(os.path.join(self.output_path, "translation_status.json")),
+                'can_repack': self._stage_data_folder(os.path.join(self.output_path, "translated_game_files", os.path.basename(game_path))) is not None
             }
-            # Cập nhật thông tin game info dựa trên kết quả phân tích sâu hơn
-            # Ví dụ, nếu có file text đã extract từ trước, có thể tính số dòng
-            # và cập nhật 'can_continue' / 'can_repack'
             
             # Cập nhật hiển thị Game Info
             self.game_info_text.config(state=tk.NORMAL)
@@ -342,17 +459,18 @@ class AutoTranslatorGUI:
 
     def _load_model_thread(self):
         try:
-            self.translator.initialize()
-            self.log("Đã tải model dịch thành công.")
-            self.root.after(0, self._enable_action_buttons_after_model_load)
-            self.root.after(0, self.update_language_list)
+            self.translator.preload_async()
+            self.translator.wait_until_loaded()
+            self.log(f"Đã tải model dịch thành công ({time.perf_counter() - STARTUP_TIME:.1f}s kể từ khi khởi động).")
+            self.call_in_ui(self._enable_action_buttons_after_model_load)
+            self.call_in_ui(self.update_language_list)
         except Exception as e:
             error_message = str(e)
             self.log(f"Lỗi khi tải model dịch: {error_message}", level="error")
-            self.root.after(0, lambda err=error_message: messagebox.showerror("Lỗi", f"Không thể tải model dịch: {err}"))
-            self.root.after(0, self._disable_action_buttons_on_error)
+            self.call_in_ui(lambda err=error_message: messagebox.showerror("Lỗi", f"Không thể tải model dịch: {err}"))
+            self.call_in_ui(self._disable_action_buttons_on_error)
         finally:
-            self.root.after(0, lambda: self.load_model_btn.config(state=tk.NORMAL)) # Re-enable load model button
+            self.call_in_ui(lambda: self.load_model_btn.config(state=tk.NORMAL)) # Re-enable load model button
 
     def open_extracted_texts_folder(self):
         if not self.current_game_path:
@@ -360,9 +478,9 @@ class AutoTranslatorGUI:
             return
         # Thay đổi đường dẫn đến thư mục chứa file đã giải nén
         game_name = os.path.basename(self.current_game_path)
-        extracted_dir = os.path.join(self.output_path, "extracted_game_files", game_name)
+        extracted_dir = self._stage_data_folder(os.path.join(self.output_path, "extracted_game_files", game_name))
         
-        if not os.path.exists(extracted_dir):
+        if extracted_dir is None:
             messagebox.showwarning("Cảnh báo", "Chưa có file đã giải nén. Hãy thực hiện bước giải nén trước.")
             return
         try:
@@ -406,7 +524,7 @@ class AutoTranslatorGUI:
     def update_language_list(self):
         default_languages = ["English", "Japanese", "Chinese", "Korean", "French", "Russian", "Vietnamese"]
         language_names = default_languages.copy()
-        if self.translator and self.translator.sp_model: # Kiểm tra sp_model thay vì tokenizer
+        if self.is_model_loaded():
             try:
                 languages = self.translator.get_supported_languages()
                 if languages and isinstance(languages, dict) and len(languages) > 0:
@@ -452,6 +570,21 @@ class AutoTranslatorGUI:
             self.target_lang_var.set("")
         self.log(f"Đã cập nhật danh sách ngôn ngữ cuối cùng cho UI: {source_languages} (Nguồn) và {sorted_languages} (Đích)")
 
+    def _toggle_archive_storage(self):
+        if self.translator:
+            self.translator.archive_storage = self.archive_storage_var.get()
+
+    def _stage_data_folder(self, files_path):
+        """
+        Thư mục chứa dữ liệu của một bước (file đã giải nén/đã dịch): chính thư mục đó, hoặc thư mục chứa archive
+        <thư mục>.sqlite nếu dữ liệu được lưu dạng archive. None nếu chưa có dữ liệu.
+        """
+        if os.path.exists(files_path):
+            return files_path
+        if archive_path_for(files_path).exists():
+            return os.path.dirname(files_path)
+        return None
+
     def _toggle_auto_detect(self):
         if self.auto_detect_var.get():
             self.source_lang_var.set("Tự động")
@@ -495,6 +628,12 @@ class AutoTranslatorGUI:
         self.edit_translation_btn = ttk.Button(btn_frame1, text="Sửa bản dịch", command=self.edit_translation)
         self.edit_translation_btn.pack(side=tk.LEFT, padx=5)
         self.edit_translation_btn.config(state=tk.DISABLED)
+
+        self.add_to_queue_btn = ttk.Button(btn_frame1, text="Thêm vào hàng đợi", command=self.add_to_job_queue)
+        self.add_to_queue_btn.pack(side=tk.LEFT, padx=5)
+
+        self.run_queue_btn = ttk.Button(btn_frame1, text="Dịch hàng đợi", command=self.start_job_queue)
+        self.run_queue_btn.pack(side=tk.LEFT, padx=5)
         
         # Hàng 2: Các nút bổ sung
         btn_frame2 = ttk.Frame(actions_frame)
@@ -507,6 +646,10 @@ class AutoTranslatorGUI:
         self.cancel_btn = ttk.Button(btn_frame2, text="Hủy", command=self.cancel_translation)
         self.cancel_btn.pack(side=tk.LEFT, padx=5)
         self.cancel_btn.config(state=tk.DISABLED)
+
+        self.pause_btn = ttk.Button(btn_frame2, text="Tạm dừng", command=self.toggle_pause)
+        self.pause_btn.pack(side=tk.LEFT, padx=5)
+        self.pause_btn.config(state=tk.DISABLED)
         
         self.load_model_btn = ttk.Button(btn_frame2, text="Tải model", command=self.load_translation_model)
         self.load_model_btn.pack(side=tk.LEFT, padx=5)
@@ -535,6 +678,9 @@ class AutoTranslatorGUI:
         self.continue_translation_btn.config(state=tk.NORMAL if model_is_loaded and game_selected and can_continue and not self.is_translating else tk.DISABLED)
         self.edit_translation_btn.config(state=tk.NORMAL if model_is_loaded and game_selected and can_repack and not self.is_translating else tk.DISABLED)
         self.repack_game_btn.config(state=tk.NORMAL if model_is_loaded and game_selected and can_repack and not self.is_translating else tk.DISABLED)
+        # Có thể thêm game vào hàng đợi cả khi hàng đợi đang chạy
+        self.add_to_queue_btn.config(state=tk.NORMAL if self.translator and game_selected else tk.DISABLED)
+        self.run_queue_btn.config(state=tk.NORMAL if model_is_loaded and not self.is_translating else tk.DISABLED)
         
         # Các nút/menu liên quan đến thư mục/công cụ ngoài (ít phụ thuộc vào model tải)
         # và không bị vô hiệu hóa khi đang dịch các quy trình tự động khác
@@ -547,8 +693,9 @@ class AutoTranslatorGUI:
         self.tools_menu.entryconfig("Chọn công cụ ngoài", state="normal" if not self.is_translating else "disabled")
         self.tools_menu.entryconfig("Chạy công cụ ngoài", state="normal" if self.external_tool_path and not self.is_translating else "disabled")
         
-        # Nút "Hủy" chỉ bật khi đang dịch
+        # Nút "Hủy" và "Tạm dừng" chỉ bật khi đang dịch
         self.cancel_btn.config(state=tk.NORMAL if self.is_translating else tk.DISABLED)
+        self.pause_btn.config(state=tk.NORMAL if self.is_translating else tk.DISABLED)
 
 
     def _enable_action_buttons_after_model_load(self):
@@ -563,6 +710,7 @@ class AutoTranslatorGUI:
         self.edit_translation_btn.config(state=tk.DISABLED)
         self.repack_game_btn.config(state=tk.DISABLED)
         self.cancel_btn.config(state=tk.DISABLED)
+        self.pause_btn.config(state=tk.DISABLED)
         self.open_extracted_texts_folder_btn.config(state=tk.DISABLED)
         self.browse_external_tool_btn.config(state=tk.DISABLED)
         self.run_external_tool_btn.config(state=tk.DISABLED)
@@ -612,7 +760,10 @@ class AutoTranslatorGUI:
         translated_dir = os.path.join(self.output_path, "translated_game_files", game_name)
 
         if not os.path.exists(translated_dir):
-            messagebox.showwarning("Cảnh báo", "Không tìm thấy bản dịch để sửa. Vui lòng dịch game trước.")
+            if archive_path_for(translated_dir).exists():
+                messagebox.showwarning("Cảnh báo", "Bản dịch đang được lưu trong archive (.sqlite). Tắt tùy chọn lưu dạng archive và dịch lại để sửa file trực tiếp.")
+            else:
+                messagebox.showwarning("Cảnh báo", "Không tìm thấy bản dịch để sửa. Vui lòng dịch game trước.")
             return
 
         try:
@@ -648,7 +799,7 @@ class AutoTranslatorGUI:
         translated_files_path = os.path.join(self.output_path, "translated_game_files", game_name)
         engine_type = self.translator.detect_game_engine(self.current_game_path)
 
-        if not os.path.exists(translated_files_path):
+        if self._stage_data_folder(translated_files_path) is None:
             messagebox.showwarning("Cảnh báo", "Không tìm thấy thư mục chứa file đã dịch. Vui lòng dịch game trước.")
             return
 
@@ -658,11 +809,13 @@ class AutoTranslatorGUI:
         self.is_translating = True # Coi như một hành động "dịch" lớn
         self._update_action_button_states()
 
-        threading.Thread(
+        self.translator.reset_control()
+        self.translation_thread = threading.Thread(
             target=self._repack_game_thread,
             args=(translated_files_path, self.current_game_path, engine_type),
             daemon=True
-        ).start()
+        )
+        self.translation_thread.start()
 
     def _repack_game_thread(self, translated_files_path, original_game_path, engine_type):
         """Luồng đóng gói game."""
@@ -670,32 +823,44 @@ class AutoTranslatorGUI:
             success = self.translator.repack_game(translated_files_path, original_game_path, engine_type)
             if success:
                 self.log("Đóng gói game hoàn tất.", level="info")
-                self.root.after(0, lambda: messagebox.showinfo("Thành công", "Đã đóng gói game thành công!"))
+                self.call_in_ui(lambda: messagebox.showinfo("Thành công", "Đã đóng gói game thành công!"))
             else:
                 self.log("Đóng gói game thất bại.", level="error")
-                self.root.after(0, lambda: messagebox.showerror("Lỗi", "Đóng gói game thất bại. Kiểm tra log để biết chi tiết."))
+                self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Đóng gói game thất bại. Kiểm tra log để biết chi tiết."))
+        except TranslationCancelled:
+            self.log("Đã dừng đóng gói theo yêu cầu.", level="warning")
         except Exception as e:
             self.log(f"Lỗi trong quá trình đóng gói game: {str(e)}", level="error")
-            self.root.after(0, lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quá trình đóng gói game: {err}"))
+            self.call_in_ui(lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quá trình đóng gói game: {err}"))
         finally:
-            self.root.after(0, self._reset_ui_after_translation) # Reset UI sau khi đóng gói
+            self.call_in_ui(self._reset_ui_after_translation) # Reset UI sau khi đóng gói
             self.is_translating = False
 
 
     def cancel_translation(self):
-        """Hủy quá trình dịch đang chạy."""
+        """
+        Hủy quá trình dịch đang chạy. Thread làm việc dừng sau batch/file hiện tại,
+        các file đã dịch xong được lưu vào trạng thái dịch để có thể tiếp tục sau.
+        """
         if self.translation_thread and self.translation_thread.is_alive():
-            # Cách an toàn để dừng thread là đặt một cờ và thread tự kiểm tra
-            # Hiện tại AutoTranslator không có cờ này, nên đây chỉ là một placeholder
-            # hoặc bạn cần thêm cơ chế dừng vào AutoTranslator.
-            messagebox.showwarning("Cảnh báo", "Chức năng hủy hiện tại chưa được triển khai đầy đủ. Vui lòng đợi hoặc đóng ứng dụng.")
-            self.log("Đã yêu cầu hủy, nhưng chức năng hủy thread chưa được hỗ trợ đầy đủ.", level="warning")
-            # Nếu bạn thêm cờ stop vào AutoTranslator:
-            # self.translator.stop_translation = True 
+            self.translator.request_stop()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.pause_btn.config(text="Tạm dừng", state=tk.DISABLED)
         else:
             self.log("Không có quá trình dịch nào đang chạy để hủy.", level="info")
             self._reset_ui_after_translation() # Vẫn reset UI nếu không có gì để hủy
 
+    def toggle_pause(self):
+        """Tạm dừng / tiếp tục quá trình đang chạy giữa các batch và file."""
+        if not self.translator or not (self.translation_thread and self.translation_thread.is_alive()):
+            return
+        if self.translator.is_paused():
+            self.translator.resume()
+            self.pause_btn.config(text="Tạm dừng")
+        else:
+            self.translator.pause()
+            self.pause_btn.config(text="Tiếp tục")
+
     def start_full_workflow(self):
         """
         Thực hiện toàn bộ quy trình tự động trong một thread.
@@ -713,13 +878,15 @@ class AutoTranslatorGUI:
             self.is_translating = True
             self._update_action_button_states()
 
-            threading.Thread(
+            self.translator.reset_control()
+            self.translation_thread = threading.Thread(
                 target=self._full_workflow_thread,
                 args=(self.current_game_path, self.auto_extract_var.get(),
                       self.auto_fix_pre_var.get(), self.auto_fix_post_var.get(),
                       self.auto_repack_var.get()),
                 daemon=True
-            ).start()
+            )
+            self.translation_thread.start()
 
     def _full_workflow_thread(self, game_path, auto_extract, auto_fix_pre, auto_fix_post, auto_repack):
         """Luồng thực hiện toàn bộ quy trình tự động."""
@@ -735,7 +902,7 @@ class AutoTranslatorGUI:
                 self.log("Bắt đầu giải nén game...", level="info")
                 if not self.translator.extract_game_files(game_path, engine_type):
                     self.log("Giải nén thất bại hoặc không có file để giải nén. Dừng quy trình.", level="error")
-                    self.root.after(0, lambda: messagebox.showerror("Lỗi", "Giải nén thất bại. Kiểm tra log."))
+                    self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Giải nén thất bại. Kiểm tra log."))
                     return
                 extracted_files_path = os.path.join(self.output_path, "extracted_game_files", os.path.basename(game_path))
                 self.log(f"Đã giải nén vào: {extracted_files_path}", level="info")
@@ -769,13 +936,14 @@ class AutoTranslatorGUI:
                 "use_dictionary": self.use_dict_var.get(),
                 "auto_detect": self.auto_detect_var.get(),
                 "max_tokens": self.max_tokens_var.get(),
-                "num_beams": self.num_beams_var.get()
+                "num_beams": self.num_beams_var.get(),
+                "engine_type": engine_type
             }
             # Gọi translate_game với đường dẫn file đã giải nén
             success_translate = self.translator.translate_game(extracted_files_path, translation_params, is_continue=False)
             if not success_translate:
                 self.log("Quá trình dịch thất bại. Dừng quy trình.", level="error")
-                self.root.after(0, lambda: messagebox.showerror("Lỗi", "Quá trình dịch thất bại. Kiểm tra log."))
+                self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Quá trình dịch thất bại. Kiểm tra log."))
                 return
             translated_files_path = os.path.join(self.output_path, "translated_game_files", os.path.basename(game_path))
             self.log(f"Đã dịch và lưu vào: {translated_files_path}", level="info")
@@ -793,21 +961,88 @@ class AutoTranslatorGUI:
                 self.log("Bắt đầu đóng gói game...", level="info")
                 if not self.translator.repack_game(translated_files_path, game_path, engine_type):
                     self.log("Đóng gói game thất bại. Kiểm tra log.", level="error")
-                    self.root.after(0, lambda: messagebox.showerror("Lỗi", "Đóng gói game thất bại. Kiểm tra log."))
+                    self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Đóng gói game thất bại. Kiểm tra log."))
                     return
             else:
                 self.log("Bỏ qua bước đóng gói game.", level="info")
             
             self.log("Hoàn tất quy trình tự động!", level="info")
-            self.root.after(0, lambda: messagebox.showinfo("Thành công", "Quy trình tự động đã hoàn tất!"))
+            self.call_in_ui(lambda: messagebox.showinfo("Thành công", "Quy trình tự động đã hoàn tất!"))
 
+        except TranslationCancelled:
+            self.log("Đã dừng quy trình tự động theo yêu cầu. Dùng 'Tiếp tục dịch' để dịch tiếp phần còn lại.", level="warning")
         except Exception as e:
             self.log(f"Lỗi trong quá trình tự động hóa: {str(e)}", level="error")
-            self.root.after(0, lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quy trình tự động hóa: {err}"))
+            self.call_in_ui(lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quy trình tự động hóa: {err}"))
         finally:
-            self.root.after(0, self._reset_ui_after_translation)
+            self.call_in_ui(self._reset_ui_after_translation)
             self.is_translating = False
     
+    def _get_job_queue(self):
+        if self.job_queue is None or self.job_queue.translator is not self.translator:
+            self.job_queue = GameJobQueue(self.translator)
+        return self.job_queue
+
+    def add_to_job_queue(self):
+        """Thêm game đang chọn vào hàng đợi dịch nhiều game."""
+        if not self.current_game_path:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn thư mục game trước.")
+            return
+        if not self.translator:
+            messagebox.showwarning("Cảnh báo", "Chưa khởi tạo AutoTranslator.")
+            return
+        self._get_job_queue().add(self.current_game_path)
+
+    def start_job_queue(self):
+        """
+        Dịch lần lượt các game trong hàng đợi với model đang tải, theo các tùy chọn dịch và quy trình hiện tại.
+        Hàng đợi được lưu ra file nên có thể tiếp tục sau khi dừng hoặc khởi động lại ứng dụng.
+        """
+        if not self.is_model_loaded():
+            messagebox.showwarning("Cảnh báo", "Model dịch chưa được tải. Vui lòng tải model trước.")
+            return
+        job_queue = self._get_job_queue()
+        remaining = sum(1 for job in job_queue.jobs if job["status"] in UNFINISHED)
+        if not remaining:
+            messagebox.showinfo("Hàng đợi", "Hàng đợi trống. Hãy chọn game và nhấn 'Thêm vào hàng đợi'.")
+            return
+        if not messagebox.askyesno("Xác nhận", f"Dịch {remaining} game trong hàng đợi ({job_queue.summary()})?"):
+            return
+
+        params = {
+            "source_lang": "auto" if self.auto_detect_var.get() else self.source_lang_var.get(),
+            "target_lang": self.target_lang_var.get(),
+            "batch_size": self.batch_size_var.get(),
+            "use_dictionary": self.use_dict_var.get(),
+            "auto_detect": self.auto_detect_var.get(),
+            "max_tokens": self.max_tokens_var.get(),
+            "num_beams": self.num_beams_var.get()
+        }
+        self.is_translating = True
+        self._update_action_button_states()
+        self.translator.reset_control()
+        self.translation_thread = threading.Thread(
+            target=self._job_queue_thread,
+            args=(job_queue, params, self.auto_fix_post_var.get(), self.auto_repack_var.get()),
+            daemon=True
+        )
+        self.translation_thread.start()
+
+    def _job_queue_thread(self, job_queue, params, fix_post, repack):
+        try:
+            if job_queue.run(params, fix_post=fix_post, repack=repack):
+                self.call_in_ui(lambda: messagebox.showinfo("Thành công", "Đã dịch xong toàn bộ hàng đợi!"))
+            else:
+                self.call_in_ui(lambda: messagebox.showwarning("Hàng đợi", f"Hàng đợi đã chạy xong nhưng có game lỗi ({job_queue.summary()}). Kiểm tra log."))
+        except TranslationCancelled:
+            self.log("Đã dừng hàng đợi theo yêu cầu. Nhấn 'Dịch hàng đợi' để tiếp tục.", level="warning")
+        except Exception as e:
+            self.log(f"Lỗi khi chạy hàng đợi: {str(e)}", level="error")
+            self.call_in_ui(lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi khi chạy hàng đợi: {err}"))
+        finally:
+            self.is_translating = False
+            self.call_in_ui(self._reset_ui_after_translation)
+
     def _prepare_translation_thread(self, is_full_workflow, is_continue):
         """
         Chuẩn bị và bắt đầu quá trình dịch trong một thread riêng.
@@ -820,6 +1055,7 @@ class AutoTranslatorGUI:
         self.edit_translation_btn.config(state=tk.DISABLED)
         self.repack_game_btn.config(state=tk.DISABLED)
         self.cancel_btn.config(state=tk.NORMAL)
+        self.pause_btn.config(state=tk.NORMAL)
         self.start_full_workflow_btn.config(state=tk.DISABLED) # Vô hiệu hóa nút full workflow
         
         # Vô hiệu hóa các nút/menu liên quan đến thư mục/công cụ ngoài khi đang dịch
@@ -844,6 +1080,7 @@ class AutoTranslatorGUI:
         
         # Bắt đầu dịch trong một thread riêng
         self.is_translating = True
+        self.translator.reset_control()
         self.translation_thread = threading.Thread(
             target=self._run_translation_only, # Sử dụng hàm riêng cho "chỉ dịch"
             args=(self.current_game_path, translation_params, is_continue),
@@ -862,39 +1099,46 @@ class AutoTranslatorGUI:
             # Thực tế cần thông minh hơn để tìm đường dẫn của các file cần dịch.
             # Ví dụ, có thể là thư mục con 'extracted_game_files' nếu đã chạy extract thủ công.
             extracted_files_path = os.path.join(self.output_path, "extracted_game_files", os.path.basename(game_path))
-            if not os.path.exists(extracted_files_path):
+            if self._stage_data_folder(extracted_files_path) is None:
                 self.log(f"Không tìm thấy thư mục chứa file đã giải nén tại '{extracted_files_path}'. Vui lòng giải nén trước hoặc kiểm tra lại đường dẫn.", level="error")
-                self.root.after(0, lambda: messagebox.showerror("Lỗi", "Không tìm thấy file để dịch. Hãy giải nén game trước."))
+                self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Không tìm thấy file để dịch. Hãy giải nén game trước."))
                 return False
 
+            # Engine quyết định gói bản dịch dựng sẵn và quy tắc bỏ qua chuỗi theo engine, như quy trình tự động
+            # (danh mục game được lưu trong cache nên không phải quét lại thư mục game)
+            params = {**params, "engine_type": self.translator.detect_game_engine(game_path)}
             self.log(f"Bắt đầu {'tiếp tục ' if is_continue else ''}dịch các file trong '{extracted_files_path}'...", level="info")
             # `translate_game` trong AutoTranslator cần được điều chỉnh để làm việc với đường dẫn `extracted_files_path`
             success = self.translator.translate_game(extracted_files_path, params, is_continue)
             
             if success:
                 self.log("Quá trình dịch đã hoàn thành.", level="info")
-                self.root.after(0, self._translation_completed)
+                self.call_in_ui(self._translation_completed)
             else:
                 self.log("Quá trình dịch thất bại.", level="error")
-                self.root.after(0, lambda: messagebox.showerror("Lỗi", "Quá trình dịch thất bại. Kiểm tra log."))
+                self.call_in_ui(lambda: messagebox.showerror("Lỗi", "Quá trình dịch thất bại. Kiểm tra log."))
 
+        except TranslationCancelled:
+            self.log("Đã dừng dịch theo yêu cầu. Dùng 'Tiếp tục dịch' để dịch tiếp phần còn lại.", level="warning")
         except Exception as e:
             self.log(f"Lỗi trong quá trình dịch: {str(e)}", level="error")
-            self.root.after(0, lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quá trình dịch: {err}"))
+            self.call_in_ui(lambda err=str(e): messagebox.showerror("Lỗi", f"Lỗi trong quá trình dịch: {err}"))
         finally:
             self.is_translating = False
-            self.root.after(0, self._reset_ui_after_translation) # Luôn reset UI
+            self.call_in_ui(self._reset_ui_after_translation) # Luôn reset UI
 
     def _translation_completed(self):
         """Xử lý khi hoàn thành dịch (áp dụng cho cả dịch mới và tiếp tục dịch)."""
         self.log("Quá trình dịch đã hoàn thành.")
         messagebox.showinfo("Thành công", "Quá trình dịch đã hoàn thành.")
-        self.root.after(0, self._reset_ui_after_translation) # Đảm bảo UI được reset sau khi hoàn thành
+        self.call_in_ui(self._reset_ui_after_translation) # Đảm bảo UI được reset sau khi hoàn thành
         
     def _reset_ui_after_translation(self):
         """Đặt lại trạng thái UI sau khi quá trình dịch/tự động hóa hoàn tất hoặc lỗi."""
         self.is_translating = False
         self._update_action_button_states()
+        self.pending_progress = None
+        self.pause_btn.config(text="Tạm dừng")
         self.progress_var.set(0)
         self.progress_label.config(text="0/0 (0%) - Hoàn tất")
         # Gọi lại analyze_game để cập nhật game_info và trạng thái nút sau khi dịch/đóng gói
@@ -903,6 +1147,8 @@ class AutoTranslatorGUI:
 
 
 if __name__ == "__main__":
+    # Bản đóng gói (exe) trên Windows: tiến trình con của bước fix song song chạy lại file này, cần dừng ở đây
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = AutoTranslatorGUI(root)
     root.mainloop()
\ No newline at end of file
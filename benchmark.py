@@ -0,0 +1,240 @@
+"""
+Benchmark pipeline dịch trên cây game tổng hợp (RPG Maker MV/MZ, Ren'Py, Generic).
+
+Chạy offline trên CPU: mặc định dùng backend giả lập 'echo' (xem translation_backends.py) nên chỉ
+đo phần I/O, parse, lọc và tokenize; thêm --model để đo thêm với một model CTranslate2 nhỏ có sẵn trên máy.
+
+Ví dụ:
+    python benchmark.py --engines RPGMakerMV RenPy --scale 2 --output bench.json
+    python benchmark.py --backends echo pseudo
+    python benchmark.py --model tiny_nllb_ct2 --batch-size 16 --num-beams 2
+"""
+import argparse
+import json
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from auto_translate import AutoTranslator
+from translation_backends import BACKENDS
+
+ENGINES = ["RPGMakerMV", "RenPy", "Generic"]
+
+WORDS = (
+    "the hero sword dark forest king castle magic potion gold village dragon quest you we they "
+    "find open door light fire ice thunder heal attack defend run away now never again power "
+    "ancient temple journey friend enemy monster battle victory defeat treasure map secret key"
+).split()
+
+
+def _sentence(rng, mean_words):
+    # Độ dài câu theo phân phối log-normal: nhiều chuỗi ngắn, một ít câu thoại dài
+    count = max(1, min(60, int(rng.lognormvariate(0, 0.6) * mean_words)))
+    text = " ".join(rng.choice(WORDS) for _ in range(count))
+    return text[0].upper() + text[1:] + rng.choice([".", "!", "?", "..."])
+
+
+def make_rpgmaker_game(root, rng, scale):
+    game = root / "RPGMakerGame"
+    (game / "data").mkdir(parents=True)
+    (game / "js").mkdir()
+    (game / "package.json").write_text(json.dumps({"name": "bench", "main": "index.html"}), encoding="utf-8")
+    (game / "js" / "rmmv.js").write_text("// stub\n", encoding="utf-8")
+    for name, count in [("Actors", 8), ("Items", 60), ("Weapons", 40), ("Armors", 40), ("Skills", 80), ("States", 20), ("Enemies", 30)]:
+        rows = [None]
+        for i in range(1, int(count * scale) + 1):
+            rows.append({
+                "id": i,
+                "name": _sentence(rng, 1.5).rstrip(".!?"),
+                "description": _sentence(rng, 10),
+                "note": "<plugin:param>" if i % 5 == 0 else "",
+                "iconIndex": rng.randint(0, 500),
+                "message1": _sentence(rng, 4) if name in ("Skills", "States") else "",
+                "faceName": f"img/faces/Actor{i % 4 + 1}" if name == "Actors" else "",
+            })
+        (game / "data" / f"{name}.json").write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    system = {
+        "gameTitle": "Benchmark Quest",
+        "currencyUnit": "G",
+        "terms": {
+            "basic": ["Level", "Lv", "HP", "HP", "MP", "MP", "TP", "TP", "EXP", "EXP"],
+            "commands": ["Fight", "Escape", "Attack", "Guard", "Item", "Skill", "Equip", "Status", "Formation", "Save"],
+            "messages": {"actionFailure": "There was no effect on %1!", "escapeStart": "%1 has started to escape!"},
+        },
+    }
+    (game / "data" / "System.json").write_text(json.dumps(system), encoding="utf-8")
+    for map_id in range(1, int(20 * scale) + 1):
+        events = [None]
+        for event_id in range(1, rng.randint(3, 15)):
+            commands = []
+            for _ in range(rng.randint(2, 12)):
+                commands.append({"code": 101, "indent": 0, "parameters": ["Actor1", 0, 0, 2]})
+                for _ in range(rng.randint(1, 4)):
+                    commands.append({"code": 401, "indent": 0, "parameters": [_sentence(rng, 8)]})
+            commands.append({"code": 0, "indent": 0, "parameters": []})
+            events.append({"id": event_id, "name": f"EV{event_id:03d}", "pages": [{"list": commands}]})
+        (game / "data" / f"Map{map_id:03d}.json").write_text(json.dumps({"events": events}), encoding="utf-8")
+    return game
+
+
+def make_renpy_game(root, rng, scale):
+    game = root / "RenPyGame"
+    (game / "renpy").mkdir(parents=True)
+    (game / "game").mkdir()
+    (game / "game" / "script.rpyc").write_bytes(b"RENPY RPC2")
+    for script_id in range(int(8 * scale) + 1):
+        lines = [f"label chapter_{script_id}:", ""]
+        for i in range(rng.randint(50, 400)):
+            speaker = rng.choice(["e", "m", "narrator", ""])
+            text = _sentence(rng, 9).replace('"', "")
+            lines.append(f'    {speaker} "{text}"' if speaker else f'    "{text}"')
+            if i % 40 == 0:
+                lines.append("    menu:")
+                lines.append(f'        "{_sentence(rng, 3)}":')
+                lines.append(f"            jump chapter_{script_id}")
+        (game / "game" / f"chapter_{script_id}.rpy").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return game
+
+
+def make_generic_game(root, rng, scale):
+    game = root / "GenericGame"
+    for dir_id in range(int(10 * scale) + 1):
+        folder = game / "Data" / f"pack_{dir_id}"
+        folder.mkdir(parents=True)
+        for file_id in range(rng.randint(2, 8)):
+            entries = {f"key_{i}": _sentence(rng, 6) for i in range(rng.randint(5, 80))}
+            (folder / f"strings_{file_id}.json").write_text(json.dumps(entries), encoding="utf-8")
+            (folder / f"notes_{file_id}.txt").write_text("\n".join(_sentence(rng, 12) for _ in range(rng.randint(3, 30))), encoding="utf-8")
+            xml_items = "".join(f"<text id='{i}'>{_sentence(rng, 5)}</text>" for i in range(rng.randint(3, 40)))
+            (folder / f"ui_{file_id}.xml").write_text(f"<?xml version='1.0' encoding='utf-8'?><root>{xml_items}</root>", encoding="utf-8")
+    return game
+
+
+FIXTURES = {
+    "RPGMakerMV": make_rpgmaker_game,
+    "RenPy": make_renpy_game,
+    "Generic": make_generic_game,
+}
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0, "p50": None, "p90": None, "p99": None, "max": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99),
+            "max": round(ordered[-1] * 1000, 3), "mean": round(statistics.fmean(ordered) * 1000, 3)}
+
+
+def run_pipeline(game_path, work_dir, backend, model_path, params):
+    batch_latencies = []
+    file_latencies = []
+    last_file_time = [None]
+
+    def on_metrics(event):
+        if event["type"] == "stage" and event["stage"] == "model":
+            batch_latencies.append(event["seconds"])
+
+    def on_progress(current, total, step):
+        if step.startswith("Dịch:"):
+            now = time.perf_counter()
+            if last_file_time[0] is not None:
+                file_latencies.append(now - last_file_time[0])
+            last_file_time[0] = now
+
+    translator = AutoTranslator(models_path=model_path or work_dir / "stub_model", output_base_path=work_dir / "output",
+                                status_callback=lambda message, level="info": None, progress_callback=on_progress,
+                                metrics_callback=on_metrics, backend=backend)
+    translator.initialize()
+
+    stage_seconds = {}
+
+    def timed(name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        stage_seconds[name] = round(time.perf_counter() - start, 4)
+        return result
+
+    engine = timed("detect", translator.detect_game_engine, game_path)
+    timed("extract", translator.extract_game_files, game_path, engine)
+    extracted = translator.output_base_path / "extracted_game_files" / game_path.name
+    translated = translator.output_base_path / "translated_game_files" / game_path.name
+    timed("fix_pre", translator.fix_pre_translation_issues, extracted, engine)
+    last_file_time[0] = time.perf_counter()
+    timed("translate", translator.translate_game, extracted, dict(params, engine_type=engine))
+    timed("fix_post", translator.fix_post_translation_issues, translated, engine)
+    timed("repack", translator.repack_game, translated, game_path, engine)
+
+    summary = translator.metrics.summary()
+    return {
+        "engine": engine,
+        "backend": backend,
+        "stage_seconds": stage_seconds,
+        "total_seconds": round(sum(stage_seconds.values()), 4),
+        "segments_per_second": summary["segments_per_second"],
+        "source_tokens_per_second": summary["source_tokens_per_second"],
+        "target_tokens_per_second": summary["target_tokens_per_second"],
+        "latency_ms": {"batch": percentiles(batch_latencies), "file": percentiles(file_latencies)},
+        "translate_metrics": summary,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline dịch game trên dữ liệu tổng hợp.")
+    parser.add_argument("--engines", nargs="+", default=ENGINES, choices=ENGINES)
+    parser.add_argument("--scale", type=float, default=1.0, help="Hệ số kích thước game tổng hợp")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--backends", nargs="+", default=["echo"], choices=[name for name in BACKENDS if name != "nllb"],
+                        help="Backend giả lập cần đo (backend 'nllb' được thêm khi có --model)")
+    parser.add_argument("--model", help="Thư mục model CTranslate2 nhỏ (kèm SentencePiece) để đo thêm với model thật")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--num-beams", type=int, default=1)
+    parser.add_argument("--work-dir", help="Thư mục làm việc (mặc định: thư mục tạm, tự xóa khi xong)")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file này (mặc định: in ra màn hình)")
+    args = parser.parse_args()
+
+    work_root = Path(args.work_dir) if args.work_dir else Path(tempfile.mkdtemp(prefix="autotranslate_bench_"))
+    params = {
+        "source_lang": "English",
+        "target_lang": "Vietnamese",
+        "batch_size": args.batch_size,
+        "use_dictionary": False,
+        "auto_detect": False,
+        "max_tokens": args.max_tokens,
+        "num_beams": args.num_beams,
+    }
+    backends = args.backends + (["nllb"] if args.model else [])
+    report = {"params": params, "scale": args.scale, "seed": args.seed, "runs": []}
+    try:
+        for engine in args.engines:
+            for backend in backends:
+                run_dir = work_root / f"{engine}_{backend}"
+                if run_dir.exists():
+                    shutil.rmtree(run_dir)
+                run_dir.mkdir(parents=True)
+                # Cùng seed cho mọi backend để kết quả so sánh được
+                game_path = FIXTURES[engine](run_dir / "games", random.Random(args.seed), args.scale)
+                result = run_pipeline(game_path, run_dir, backend, args.model, params)
+                report["runs"].append(result)
+                print(f"[{engine}/{backend}] {result['total_seconds']}s, {result['segments_per_second']} đoạn/s")
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+        print(f"Đã ghi kết quả vào: {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Các bước fix lỗi trước/sau dịch cho từng file. Mỗi hàm fix_*_content nhận tên và nội dung (bytes) của một file,
+trả về nội dung mới; fix_*_file làm việc tương tự trên file trên đĩa. Các hàm chỉ nhận/trả về dữ liệu đơn giản
+(đường dẫn hoặc nội dung, engine, kết quả), nên có thể chạy song song trên nhiều tiến trình theo từng nhóm file
+(xem fix_files, fix_contents và AutoTranslator._run_file_fixes).
+"""
+import io
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path, PurePosixPath
+
+from file_store import decode_text, encode_text
+from json_walker import iter_dict_strings, walk_leaves
+
+
+def _fix_json(data, fix_data):
+    content = json.loads(decode_text(data))
+    fix_data(content)
+    return encode_text(json.dumps(content, ensure_ascii=False, indent=2))
+
+
+def _fix_lines(data, fix_line):
+    lines = io.StringIO(decode_text(data)).readlines()
+    return encode_text("".join(fix_line(line) for line in lines))
+
+
+def _fix_text(data, fix_content):
+    return encode_text(fix_content(decode_text(data)))
+
+
+def _fix_xml(data, fix_text):
+    tree = ET.ElementTree(ET.fromstring(data))
+    for element in tree.getroot().iter():
+        if element.text:
+            element.text = fix_text(element.text)
+    output = io.BytesIO()
+    tree.write(output, encoding='utf-8', xml_declaration=True)
+    return output.getvalue()
+
+
+def _fix_file(fix_content, file_path, engine_type):
+    file_path = Path(file_path)
+    fixed = fix_content(file_path.name, file_path.read_bytes(), engine_type)
+    if fixed is None:
+        return False
+    file_path.write_bytes(fixed)
+    return True
+
+
+# --- Trước dịch ---
+
+def _fix_pre_rpg_json_item(data):
+    for container, key, value in walk_leaves(data):
+        if not isinstance(container, dict):
+            continue
+        if key in ["name", "note", "description"] and isinstance(value, (int, float)):
+            container[key] = str(value)
+        elif isinstance(value, str):
+            container[key] = value.replace('\u0000', '')
+
+
+def _fix_pre_generic_json_strings(data):
+    for container, key, value in iter_dict_strings(data):
+        container[key] = value.replace('\u0000', '').replace('\\n', '\n')
+
+
+def fix_pre_content(name, data, engine_type):
+    """Fix lỗi trước dịch cho nội dung của file name. Trả về nội dung mới, hoặc None nếu không có gì để làm."""
+    suffix = PurePosixPath(name).suffix
+    if engine_type == "RPGMakerMV":
+        return _fix_json(data, _fix_pre_rpg_json_item)
+    if engine_type == "RenPy":
+        return _fix_lines(data, lambda line: re.sub(r"\{.*?\}", lambda m: m.group(0), line))
+    if suffix == ".json":
+        return _fix_json(data, _fix_pre_generic_json_strings)
+    if suffix == ".txt":
+        return _fix_text(data, lambda content: re.sub(r'\s+', ' ', content).strip())
+    if suffix == ".xml":
+        return _fix_xml(data, lambda text: text.replace('\u0000', ''))
+    return None
+
+
+def fix_pre_file(file_path, engine_type):
+    """Fix lỗi trước dịch cho một file. Trả về True nếu file đã được xử lý, False nếu không có gì để làm."""
+    return _fix_file(fix_pre_content, file_path, engine_type)
+
+
+# --- Sau dịch ---
+
+def _fix_post_rpg_json_item(data):
+    for container, key, value in iter_dict_strings(data):
+        container[key] = value.replace('\\\\n', '\\n')
+
+
+def _fix_post_generic_json_strings(data):
+    for container, key, value in iter_dict_strings(data):
+        container[key] = value.replace('\\n', '\n').replace('\\"', '"')
+
+
+def _fix_post_renpy_line(line):
+    line = re.sub(r'\{ (.*?)\}', r'{\1}', line)
+    return re.sub(r'\[ (.*?) \]', r'[\1]', line)
+
+
+def _fix_post_txt(content):
+    content = re.sub(r'\s{2,}', ' ', content)
+    return content.replace(' .', '.').replace(' ,', ',')
+
+
+def fix_post_content(name, data, engine_type):
+    """Fix lỗi sau dịch cho nội dung của file name. Trả về nội dung mới, hoặc None nếu không có gì để làm."""
+    suffix = PurePosixPath(name).suffix
+    if engine_type == "RPGMakerMV":
+        return _fix_json(data, _fix_post_rpg_json_item)
+    if engine_type == "RenPy":
+        return _fix_lines(data, _fix_post_renpy_line)
+    if suffix == ".json":
+        return _fix_json(data, _fix_post_generic_json_strings)
+    if suffix == ".txt":
+        return _fix_text(data, _fix_post_txt)
+    if suffix == ".xml":
+        return _fix_xml(data, lambda text: text.replace('\u0000', '').strip().replace('&amp;', '&'))
+    return None
+
+
+def fix_post_file(file_path, engine_type):
+    """Fix lỗi sau dịch cho một file. Trả về True nếu file đã được xử lý, False nếu không có gì để làm."""
+    return _fix_file(fix_post_content, file_path, engine_type)
+
+
+# Theo từng bước: (hàm fix file trên đĩa, hàm fix nội dung file)
+FIXES = {
+    "pre": (fix_pre_file, fix_pre_content),
+    "post": (fix_post_file, fix_post_content),
+}
+
+
+def fix_files(fix_func, file_paths, engine_type):
+    """Chạy fix_func cho một nhóm file, trả về danh sách (đường dẫn, đã fix, thông báo lỗi hoặc None)."""
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append((file_path, fix_func(file_path, engine_type), None))
+        except Exception as e:
+            results.append((file_path, False, str(e)))
+    return results
+
+
+def fix_contents(fix_content, items, engine_type):
+    """
+    Chạy fix_content cho một nhóm (tên, nội dung), trả về danh sách (tên, nội dung mới hoặc None, thông báo lỗi
+    hoặc None). Dùng khi file nằm trong archive (xem file_store.ArchiveStore) thay vì trên đĩa.
+    """
+    results = []
+    for name, data in items:
+        try:
+            results.append((name, fix_content(name, data, engine_type), None))
+        except Exception as e:
+            results.append((name, None, str(e)))
+    return results
@@ -0,0 +1,196 @@
+"""
+Kho file của các bước trung gian (file đã giải nén, file đã dịch). DirectoryStore là cây thư mục như trước;
+ArchiveStore gom toàn bộ vào một file SQLite duy nhất (<thư mục>.sqlite, mỗi file một dòng, nội dung nén zlib)
+và đọc/ghi ngẫu nhiên theo đường dẫn tương đối, tránh tạo hàng nghìn file nhỏ trên đĩa hoặc ổ mạng.
+Đường dẫn tương đối luôn ở dạng posix ("data/Map001.json"). Chuỗi được đọc/ghi như file mở ở chế độ văn bản
+(xuống dòng chuyển thành "\n" khi đọc, thành os.linesep khi ghi) để hai loại kho cho cùng một nội dung.
+"""
+import io
+import os
+import shutil
+import sqlite3
+import threading
+import zlib
+from pathlib import Path, PurePosixPath
+
+from game_inventory import find_files
+
+ARCHIVE_SUFFIX = ".sqlite"
+COMMIT_EVERY = 256
+
+
+def archive_path_for(files_path):
+    """File archive tương ứng với thư mục files_path: <thư mục>.sqlite nằm cạnh thư mục."""
+    files_path = Path(files_path)
+    return files_path.with_name(files_path.name + ARCHIVE_SUFFIX)
+
+
+def decode_text(data):
+    """Bytes UTF-8 -> chuỗi, đổi "\r\n" và "\r" thành "\n" như khi đọc file ở chế độ văn bản."""
+    return data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+
+def encode_text(text):
+    """Chuỗi -> bytes UTF-8, đổi "\n" thành os.linesep như khi ghi file ở chế độ văn bản."""
+    if os.linesep != "\n":
+        text = text.replace("\n", os.linesep)
+    return text.encode("utf-8")
+
+
+def remove_files(files_path):
+    """Xóa thư mục files_path và archive tương ứng (nếu có). Trả về danh sách đường dẫn đã xóa."""
+    files_path = Path(files_path)
+    archive_path = archive_path_for(files_path)
+    removed = []
+    if files_path.is_dir():
+        shutil.rmtree(files_path)
+        removed.append(files_path)
+    for path in (archive_path, Path(f"{archive_path}-wal"), Path(f"{archive_path}-shm")):
+        if path.exists():
+            path.unlink()
+            if path == archive_path:
+                removed.append(path)
+    return removed
+
+
+class FileStore:
+    """Phần chung của hai loại kho; lớp con cài đặt list_files, exists, read_bytes, write_bytes."""
+
+    def read_text(self, rel):
+        return decode_text(self.read_bytes(rel))
+
+    def write_text(self, rel, text):
+        self.write_bytes(rel, encode_text(text))
+
+    def read_lines(self, rel):
+        """Các dòng của file (giữ "\n" cuối dòng), như f.readlines()."""
+        return io.StringIO(self.read_text(rel)).readlines()
+
+    def write_lines(self, rel, lines):
+        self.write_text(rel, "".join(lines))
+
+    def import_file(self, rel, source_path):
+        self.write_bytes(rel, Path(source_path).read_bytes())
+
+    def export_file(self, rel, destination_path):
+        destination_path = Path(destination_path)
+        destination_path.parent.mkdir(parents=True, exist_ok=True)
+        destination_path.write_bytes(self.read_bytes(rel))
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class DirectoryStore(FileStore):
+    """Kho là một cây thư mục trên đĩa (hành vi mặc định)."""
+
+    is_archive = False
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.location = self.root
+
+    def path(self, rel):
+        return self.root / rel
+
+    def list_files(self, suffixes=None):
+        """Đường dẫn tương đối của các file có phần mở rộng trong suffixes, sắp theo đường dẫn."""
+        return [path.relative_to(self.root).as_posix() for path in find_files(self.root, suffixes)]
+
+    def exists(self, rel):
+        return self.path(rel).is_file()
+
+    def read_bytes(self, rel):
+        return self.path(rel).read_bytes()
+
+    def write_bytes(self, rel, data):
+        path = self.path(rel)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def read_text(self, rel):
+        with open(self.path(rel), 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def write_text(self, rel, text):
+        path = self.path(rel)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def import_file(self, rel, source_path):
+        path = self.path(rel)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(source_path, path)
+
+    def export_file(self, rel, destination_path):
+        destination_path = Path(destination_path)
+        destination_path.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy(self.path(rel), destination_path)
+
+
+class ArchiveStore(FileStore):
+    """
+    Kho là một file SQLite: bảng files(path, size, data) với data là nội dung nén zlib. Các lần ghi được gom
+    lại và commit sau mỗi COMMIT_EVERY file cũng như khi đóng kho; đọc trong cùng kết nối thấy cả phần chưa commit.
+    """
+
+    is_archive = True
+
+    def __init__(self, path, compress_level=6):
+        self.path = Path(path)
+        self.location = self.path
+        self.compress_level = compress_level
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, data BLOB NOT NULL)")
+
+    def list_files(self, suffixes=None):
+        suffixes = tuple(s.lower() for s in suffixes) if suffixes else None
+        with self.lock:
+            paths = [row[0] for row in self.conn.execute("SELECT path FROM files")]
+        return sorted((rel for rel in paths if suffixes is None or rel.lower().endswith(suffixes)), key=PurePosixPath)
+
+    def exists(self, rel):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM files WHERE path = ?", (rel,)).fetchone() is not None
+
+    def read_bytes(self, rel):
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM files WHERE path = ?", (rel,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"{self.path}: không có file {rel}")
+        return zlib.decompress(row[0])
+
+    def write_bytes(self, rel, data):
+        blob = zlib.compress(data, self.compress_level)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO files (path, size, data) VALUES (?, ?, ?)", (rel, len(data), blob))
+            self.pending += 1
+            if self.pending >= COMMIT_EVERY:
+                self.conn.commit()
+                self.pending = 0
+
+    def total_size(self):
+        """(tổng kích thước gốc, tổng kích thước sau nén) của các file trong kho."""
+        with self.lock:
+            size, stored = self.conn.execute("SELECT COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM files").fetchone()
+        return size, stored
+
+    def close(self):
+        with self.lock:
+            if self.conn is None:
+                return
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,303 @@
+"""
+Danh mục file của thư mục game: quét đĩa một lần (os.scandir, không đệ quy), ghi lại đường dẫn tương đối,
+kích thước và mtime của từng file cùng mtime của từng thư mục, rồi nhận diện engine từ danh mục đó
+(file đánh dấu + đọc vài byte đầu của file để kiểm tra nội dung).
+Danh mục được lưu ra JSON và dùng lại cho các bước sau và các lần chạy sau; nó chỉ bị quét lại khi mtime
+của một thư mục thay đổi (thêm/xóa/đổi tên file) hoặc khi một file dùng để nhận diện engine bị ghi đè tại chỗ.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+INVENTORY_FORMAT = 1
+
+# Các engine mà pipeline xử lý như file văn bản chung (JSON/TXT/XML nằm rời trong thư mục game)
+GENERIC_ENGINES = ("Generic", "Unity", "WolfRPG", "Kirikiri")
+
+ENGINE_LABELS = {
+    ("RPGMakerMV", "MV"): "RPG Maker MV",
+    ("RPGMakerMV", "MZ"): "RPG Maker MZ",
+    ("RenPy", None): "Ren'Py",
+    ("Unity", None): "Unity",
+    ("WolfRPG", None): "Wolf RPG Editor",
+    ("Kirikiri", None): "Kirikiri (KAG/TJS)",
+}
+
+RPA_MAGICS = (b"RPA-3.0 ", b"RPA-2.0 ")
+XP3_MAGIC = b"XP3\r\n \n\x1a\x8bg\x01"
+UNITY_DATA_MARKERS = ("globalgamemanagers", "mainData", "data.unity3d", "resources.assets", "Managed")
+
+
+def iter_files(root, suffixes=None):
+    """Yield đường dẫn các file trong cây thư mục (một lần duyệt), lọc theo phần mở rộng nếu có."""
+    suffixes = tuple(s.lower() for s in suffixes) if suffixes else None
+    stack = [os.fspath(root)]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif suffixes is None or entry.name.lower().endswith(suffixes):
+                    yield Path(entry.path)
+
+
+def find_files(root, suffixes):
+    """Danh sách file có phần mở rộng trong suffixes, sắp theo đường dẫn."""
+    return sorted(iter_files(root, suffixes))
+
+
+def _read_head(path, size):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(size)
+    except OSError:
+        return b""
+
+
+class GameInventory:
+    """
+    Danh mục file của một game. files: {đường dẫn tương đối (dạng posix): (kích thước, mtime_ns)},
+    dirs: {đường dẫn tương đối của thư mục ("" là thư mục gốc): mtime_ns}.
+    engine/variant/evidence là kết quả nhận diện engine, được lưu cùng danh mục.
+    """
+
+    def __init__(self, root, files, dirs, engine=None, variant=None, evidence=None):
+        self.root = Path(root)
+        self.files = files
+        self.dirs = dirs
+        self.engine = engine
+        self.variant = variant
+        self.evidence = evidence
+
+    @classmethod
+    def scan(cls, root):
+        root = Path(root)
+        files = {}
+        dirs = {}
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            path = root / rel_dir if rel_dir else root
+            try:
+                dirs[rel_dir] = path.stat().st_mtime_ns
+                entries = os.scandir(path)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(rel)
+                        elif entry.is_file():
+                            stat = entry.stat()
+                            files[rel] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue
+        inventory = cls(root, files, dirs)
+        inventory.engine, inventory.variant, inventory.evidence = detect_engine(inventory)
+        return inventory
+
+    def detection_files(self):
+        """
+        File đánh dấu engine và file được đọc nội dung khi nhận diện (System.json, .rpa, .xp3, file căn cứ).
+        Ghi đè một file tại chỗ không đổi mtime thư mục, nên is_current kiểm tra riêng các file này.
+        """
+        watched = set(self.files_in("game", (".rpa",), recursive=True))
+        watched.update(self.files_in("", (".xp3",)))
+        for rel in ("data/System.json", self.evidence):
+            if rel in self.files:
+                watched.add(rel)
+        return watched
+
+    def is_current(self):
+        """
+        Danh mục còn đúng nếu mọi thư mục vẫn tồn tại với cùng mtime (không có file nào được thêm/xóa/đổi tên)
+        và các file dùng để nhận diện engine giữ nguyên kích thước và mtime.
+        """
+        try:
+            for rel_dir, mtime in self.dirs.items():
+                if (self.root / rel_dir).stat().st_mtime_ns != mtime:
+                    return False
+            for rel in self.detection_files():
+                stat = (self.root / rel).stat()
+                if (stat.st_size, stat.st_mtime_ns) != tuple(self.files[rel]):
+                    return False
+        except OSError:
+            return False
+        return True
+
+    @property
+    def total_size(self):
+        return sum(size for size, _ in self.files.values())
+
+    @property
+    def label(self):
+        return ENGINE_LABELS.get((self.engine, self.variant), self.engine)
+
+    def has_file(self, rel):
+        return rel in self.files
+
+    def has_dir(self, rel):
+        return rel in self.dirs
+
+    def path(self, rel):
+        return self.root / rel
+
+    def files_in(self, rel_dir, suffixes=None, recursive=False):
+        """Đường dẫn tương đối các file nằm trong rel_dir ("" là thư mục gốc), sắp theo đường dẫn."""
+        suffixes = tuple(s.lower() for s in suffixes) if suffixes else None
+        prefix = f"{rel_dir}/" if rel_dir else ""
+        result = []
+        for rel in self.files:
+            if not rel.startswith(prefix) or (suffixes and not rel.lower().endswith(suffixes)):
+                continue
+            if not recursive and "/" in rel[len(prefix):]:
+                continue
+            result.append(rel)
+        return sorted(result)
+
+    def to_dict(self):
+        return {"format": INVENTORY_FORMAT, "root": str(self.root), "engine": self.engine, "variant": self.variant,
+                "evidence": self.evidence, "dirs": self.dirs, "files": {rel: list(info) for rel, info in self.files.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != INVENTORY_FORMAT:
+            raise ValueError(f"định dạng danh mục {data.get('format')} không được hỗ trợ")
+        files = {rel: tuple(info) for rel, info in data["files"].items()}
+        return cls(data["root"], files, data["dirs"], data.get("engine"), data.get("variant"), data.get("evidence"))
+
+
+# --- Nhận diện engine ---
+
+def _detect_rpgmaker(inventory):
+    if inventory.has_file("js/rmmz_core.js"):
+        return "MZ", "js/rmmz_core.js"
+    for marker in ("js/rpg_core.js", "js/rmmv.js"):
+        if inventory.has_file(marker):
+            return "MV", marker
+    if inventory.has_file("data/System.json"):
+        # Không có file js (vd: chỉ còn thư mục data): kiểm tra nội dung System.json
+        head = _read_head(inventory.path("data/System.json"), 1 << 20)
+        if b'"gameTitle"' in head and b'"versionId"' in head:
+            return ("MZ" if b'"advanced"' in head else "MV"), "data/System.json"
+    return None
+
+
+def _detect_renpy(inventory):
+    for rel in inventory.files_in("game", (".rpa",), recursive=True):
+        if _read_head(inventory.path(rel), 8) in RPA_MAGICS:
+            return rel
+    if inventory.has_dir("renpy") or inventory.has_dir("lib"):
+        compiled = inventory.files_in("game", (".rpyc",), recursive=True)
+        if compiled:
+            return compiled[0]
+    if inventory.has_dir("renpy") and inventory.files_in("game", (".rpy",), recursive=True):
+        return "renpy/"
+    return None
+
+
+def _detect_unity(inventory):
+    for marker in ("UnityPlayer.dll", "UnityPlayer.so", "UnityPlayer.dylib"):
+        if inventory.has_file(marker):
+            return marker
+    for rel_dir in inventory.dirs:
+        if "/" in rel_dir or not rel_dir.endswith("_Data"):
+            continue
+        for marker in UNITY_DATA_MARKERS:
+            rel = f"{rel_dir}/{marker}"
+            if inventory.has_file(rel) or inventory.has_dir(rel):
+                return rel
+    return None
+
+
+def _detect_wolf(inventory):
+    if inventory.has_file("Data.wolf"):
+        return "Data.wolf"
+    if inventory.has_dir("Data/BasicData"):
+        return "Data/BasicData/"
+    wolf_archives = inventory.files_in("Data", (".wolf",))
+    return wolf_archives[0] if wolf_archives else None
+
+
+def _detect_kirikiri(inventory):
+    archives = inventory.files_in("", (".xp3",))
+    for rel in archives:
+        if _read_head(inventory.path(rel), len(XP3_MAGIC)) == XP3_MAGIC:
+            return rel
+    if inventory.has_file("startup.tjs"):
+        return "startup.tjs"
+    return None
+
+
+def detect_engine(inventory):
+    """Trả về (engine, biến thể hoặc None, file/thư mục làm căn cứ hoặc None)."""
+    rpgmaker = _detect_rpgmaker(inventory)
+    if rpgmaker:
+        return "RPGMakerMV", rpgmaker[0], rpgmaker[1]
+    for engine, detect in (("RenPy", _detect_renpy), ("Unity", _detect_unity),
+                           ("WolfRPG", _detect_wolf), ("Kirikiri", _detect_kirikiri)):
+        evidence = detect(inventory)
+        if evidence:
+            return engine, None, evidence
+    return "Generic", None, None
+
+
+class InventoryCache:
+    """
+    Bộ nhớ đệm danh mục game: trong RAM theo đường dẫn game và trên đĩa (cache_dir/<tên game>-<hash đường dẫn>.json).
+    get() chỉ quét lại thư mục game khi danh mục đã lưu không còn đúng.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+        self.inventories = {}
+        self.lock = threading.Lock()
+
+    def _cache_file(self, root):
+        digest = hashlib.sha1(str(root).encode("utf-8")).hexdigest()[:12]
+        return self.cache_dir / f"{root.name}-{digest}.json"
+
+    def get(self, game_path, log=None):
+        """Trả về (danh mục, nguồn) với nguồn là "memory", "disk" hoặc "scan"."""
+        root = Path(game_path).resolve()
+        with self.lock:
+            inventory = self.inventories.get(root)
+            if inventory is not None and inventory.is_current():
+                return inventory, "memory"
+
+            cache_file = self._cache_file(root)
+            source = "scan"
+            inventory = None
+            try:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    inventory = GameInventory.from_dict(json.load(f))
+                if inventory.is_current():
+                    source = "disk"
+                else:
+                    inventory = None
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                inventory = None
+                if log:
+                    log(f"Bỏ qua danh mục game đã lưu {cache_file}: {e}", level="warning")
+
+            if inventory is None:
+                inventory = GameInventory.scan(root)
+                try:
+                    self.cache_dir.mkdir(parents=True, exist_ok=True)
+                    with open(cache_file, 'w', encoding='utf-8') as f:
+                        json.dump(inventory.to_dict(), f, ensure_ascii=False)
+                except OSError as e:
+                    if log:
+                        log(f"Không thể lưu danh mục game {cache_file}: {e}", level="warning")
+            self.inventories[root] = inventory
+            return inventory, source
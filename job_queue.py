@@ -0,0 +1,321 @@
+"""
+Hàng đợi dịch nhiều game với một model đã tải.
+
+Ví dụ (dòng lệnh):
+    python job_queue.py "D:/Games/Game1" "D:/Games/Game2" --target Vietnamese English
+    python job_queue.py --list
+    python job_queue.py            # tiếp tục hàng đợi đã lưu
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from auto_translate import AutoTranslator, TranslationCancelled
+
+# Trạng thái của một game trong hàng đợi
+PENDING = "pending"
+PREPARING = "preparing"
+PREPARED = "prepared"
+TRANSLATING = "translating"
+TRANSLATED = "translated"
+POSTPROCESSING = "postprocessing"
+DONE = "done"
+FAILED = "failed"
+
+UNFINISHED = (PENDING, PREPARING, PREPARED, TRANSLATING, TRANSLATED)
+
+
+class GameJobQueue:
+    """
+    Hàng đợi dịch nhiều game bằng cùng một AutoTranslator: model chỉ tải một lần và cache
+    (token, bộ nhớ dịch) dùng chung cho mọi game. Trong khi model dịch game hiện tại, game kế tiếp
+    được giải nén và fix lỗi trước dịch ở thread nền; fix lỗi sau dịch và đóng gói của game vừa dịch
+    cũng chạy ở nền. Trạng thái được lưu ra file JSON sau mỗi bước để có thể tiếp tục sau khi khởi động lại.
+    Các bước nền chạy trên bản fork của translator (metrics và tiến độ riêng, báo qua background_progress_callback),
+    và mỗi game có thư mục làm việc riêng theo tên + hash đường dẫn đầy đủ để hai game trùng tên không đè nhau.
+    """
+
+    def __init__(self, translator, state_file=None, background_progress_callback=None):
+        self.translator = translator
+        self.background_progress_callback = background_progress_callback
+        self.state_file = Path(state_file) if state_file else translator.output_base_path / "job_queue.json"
+        self.jobs = []
+        self.lock = threading.RLock()
+        self.load()
+
+    def log(self, message, level="info"):
+        self.translator.log(message, level)
+
+    def load(self):
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                self.jobs = json.load(f)
+        except FileNotFoundError:
+            self.jobs = []
+        except (json.JSONDecodeError, OSError) as e:
+            self.log(f"Không thể đọc trạng thái hàng đợi {self.state_file}: {e}. Bắt đầu hàng đợi mới.", level="warning")
+            self.jobs = []
+        # Bước đang chạy dở khi ứng dụng bị tắt sẽ được làm lại; bước dịch tiếp tục từ file trạng thái dịch
+        for job in self.jobs:
+            if job["status"] == PREPARING:
+                job["status"] = PENDING
+            elif job["status"] == POSTPROCESSING:
+                job["status"] = TRANSLATED
+
+    def save(self):
+        with self.lock:
+            try:
+                self.state_file.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = self.state_file.with_suffix(".tmp")
+                with open(temp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.jobs, f, ensure_ascii=False, indent=4)
+                os.replace(temp_file, self.state_file)
+            except OSError as e:
+                self.log(f"Lỗi khi lưu trạng thái hàng đợi: {e}", level="error")
+
+    def add(self, game_path, params=None):
+        """Thêm game vào cuối hàng đợi. params (tùy chọn) ghi đè tham số dịch chung cho riêng game này."""
+        game_path = str(Path(game_path).resolve())
+        with self.lock:
+            for job in self.jobs:
+                if job["game_path"] == game_path:
+                    if job["status"] in (DONE, FAILED):
+                        job.update(status=PENDING, error=None)
+                        self.save()
+                    return job
+            job = {"game_path": game_path, "params": params or {}, "status": PENDING,
+                   "engine": None, "error": None, "metrics": None, "updated": time.time()}
+            self.jobs.append(job)
+            self.save()
+        self.log(f"Đã thêm vào hàng đợi: {game_path} ({self.summary()})")
+        return job
+
+    def remove(self, game_path):
+        game_path = str(Path(game_path).resolve())
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job["game_path"] != game_path or job["status"] not in (PENDING, DONE, FAILED)]
+            self.save()
+
+    def clear_finished(self):
+        with self.lock:
+            self.jobs = [job for job in self.jobs if job["status"] not in (DONE, FAILED)]
+            self.save()
+
+    def summary(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs:
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return ", ".join(f"{status}={count}" for status, count in counts.items()) or "trống"
+
+    def _next_job(self, statuses=UNFINISHED, exclude=None):
+        with self.lock:
+            for job in self.jobs:
+                if job["status"] in statuses and job is not exclude:
+                    return job
+        return None
+
+    def _set_status(self, job, status, error=None):
+        with self.lock:
+            job.update(status=status, error=error, updated=time.time())
+            self.save()
+
+    def _work_name(self, job):
+        game_path = job["game_path"]
+        return f"{Path(game_path).name}-{hashlib.sha1(game_path.encode('utf-8')).hexdigest()[:8]}"
+
+    def _extracted_dir(self, job):
+        return self.translator.output_base_path / "extracted_game_files" / self._work_name(job)
+
+    def _forked_translator(self, job, progress_callback=None):
+        return self.translator.fork(progress_callback or self.background_progress_callback, work_name=self._work_name(job))
+
+    def _prepare(self, job, progress_callback=None):
+        """
+        Làm sạch, phát hiện engine, giải nén và fix lỗi trước dịch (thường chạy ở thread nền).
+        progress_callback: tiến độ khi chạy ở thread chính (game đầu tiên), mặc định là background_progress_callback.
+        """
+        translator = self._forked_translator(job, progress_callback)
+        game_path = job["game_path"]
+        try:
+            translator.clean_previous_data(game_path)
+            engine = translator.detect_game_engine(game_path)
+            if not translator.extract_game_files(game_path, engine):
+                self._set_status(job, FAILED, "Giải nén thất bại hoặc không có file để giải nén.")
+                return
+            translator.fix_pre_translation_issues(self._extracted_dir(job), engine)
+            job["engine"] = engine
+            self._set_status(job, PREPARED)
+        except TranslationCancelled:
+            self._set_status(job, PENDING)
+            raise
+        except Exception as e:
+            self.log(f"Lỗi khi chuẩn bị game {game_path}: {e}", level="error")
+            self._set_status(job, FAILED, str(e))
+        finally:
+            job["prepare_metrics"] = translator.metrics.summary()
+
+    def _translate(self, job, params):
+        translator = self.translator
+        is_continue = job["status"] == TRANSLATING
+        job_params = {**params, **job["params"], "engine_type": job["engine"]}
+        self._set_status(job, TRANSLATING)
+        try:
+            success = translator.translate_game(self._extracted_dir(job), job_params, is_continue=is_continue)
+        finally:
+            job["metrics"] = translator.metrics.summary()
+        if success:
+            self._set_status(job, TRANSLATED)
+        else:
+            self._set_status(job, FAILED, "Quá trình dịch thất bại.")
+
+    def _target_langs(self, job, params):
+        job_params = {**params, **job["params"]}
+        target_lang_codes = job_params.get('target_langs') or [job_params['target_lang']]
+        return [self.translator.supported_languages.get(code, "vie_Latn") for code in target_lang_codes]
+
+    def _postprocess(self, job, params, fix_post, repack):
+        """Fix lỗi sau dịch và đóng gói cho từng ngôn ngữ đích (chạy ở thread nền)."""
+        translator = self._forked_translator(job)
+        game_path = job["game_path"]
+        try:
+            target_langs = self._target_langs(job, params)
+            translated_dirs = translator.get_translated_output_dirs(self._work_name(job), target_langs)
+            for target_lang, translated_dir in zip(target_langs, translated_dirs):
+                if fix_post:
+                    translator.fix_post_translation_issues(translated_dir, job["engine"])
+                if repack and not translator.repack_game(translated_dir, game_path, job["engine"], target_lang if len(target_langs) > 1 else None):
+                    self._set_status(job, FAILED, "Đóng gói game thất bại.")
+                    return
+            self._set_status(job, DONE)
+            self.log(f"Đã hoàn tất game trong hàng đợi: {game_path}")
+        except TranslationCancelled:
+            self._set_status(job, TRANSLATED)
+            raise
+        except Exception as e:
+            self.log(f"Lỗi khi fix lỗi sau dịch/đóng gói game {game_path}: {e}", level="error")
+            self._set_status(job, FAILED, str(e))
+        finally:
+            job["postprocess_metrics"] = translator.metrics.summary()
+
+    def run(self, params, fix_post=True, repack=True):
+        """
+        Xử lý tuần tự mọi game chưa xong trong hàng đợi (kể cả game được thêm khi đang chạy).
+        params: tham số dịch chung như của AutoTranslator.translate_game (không cần engine_type).
+        Raise TranslationCancelled nếu người dùng yêu cầu dừng; trạng thái đã được lưu để chạy tiếp.
+        """
+        self.log(f"Bắt đầu xử lý hàng đợi: {self.summary()}")
+        background_futures = []
+        preparing = {}
+        cancelled = False
+        with ThreadPoolExecutor(max_workers=1) as background:
+            try:
+                while True:
+                    job = self._next_job()
+                    if job is None:
+                        break
+                    if job["status"] == TRANSLATED:
+                        self._set_status(job, POSTPROCESSING)
+                        background_futures.append(background.submit(self._postprocess, job, params, fix_post, repack))
+                        continue
+
+                    future = preparing.pop(job["game_path"], None)
+                    if future:
+                        future.result()
+                    elif job["status"] in (PENDING, PREPARING):
+                        self._set_status(job, PREPARING)
+                        self._prepare(job, self.translator.progress_callback)
+                    if job["status"] == FAILED:
+                        continue
+
+                    # Giải nén + fix lỗi game kế tiếp trong lúc model dịch game hiện tại
+                    upcoming = self._next_job(statuses=(PENDING,), exclude=job)
+                    if upcoming:
+                        self._set_status(upcoming, PREPARING)
+                        preparing[upcoming["game_path"]] = background.submit(self._prepare, upcoming)
+
+                    if not self.translator.wait_until_loaded():
+                        raise RuntimeError("Model dịch chưa được tải.")
+                    self.log(f"Đang dịch game trong hàng đợi: {job['game_path']}")
+                    self._translate(job, params)
+                    if job["status"] == TRANSLATED:
+                        self._set_status(job, POSTPROCESSING)
+                        background_futures.append(background.submit(self._postprocess, job, params, fix_post, repack))
+            except TranslationCancelled:
+                cancelled = True
+            finally:
+                for future in background_futures + list(preparing.values()):
+                    try:
+                        future.result()
+                    except TranslationCancelled:
+                        cancelled = True
+                self.save()
+
+        if cancelled:
+            self.log(f"Đã dừng hàng đợi theo yêu cầu ({self.summary()}). Chạy lại để tiếp tục.", level="warning")
+            raise TranslationCancelled("Đã dừng hàng đợi theo yêu cầu của người dùng.")
+        self.log(f"Hoàn tất hàng đợi: {self.summary()}")
+        return all(job["status"] == DONE for job in self.jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dịch nhiều game liên tiếp với một model đã tải.")
+    parser.add_argument("games", nargs="*", help="Thư mục game cần thêm vào hàng đợi")
+    parser.add_argument("--models", default="models_nllb_3_3B_ct2_fp16", help="Thư mục model CTranslate2")
+    parser.add_argument("--output", default="output", help="Thư mục đầu ra (chứa cả file trạng thái hàng đợi)")
+    parser.add_argument("--source", default="auto", help="Ngôn ngữ nguồn (mặc định: tự nhận diện)")
+    parser.add_argument("--target", nargs="+", default=["Vietnamese"], help="Một hoặc nhiều ngôn ngữ đích")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-tokens", type=int, default=512)
+    parser.add_argument("--num-beams", type=int, default=1)
+    parser.add_argument("--no-fix-post", action="store_true", help="Bỏ qua bước fix lỗi sau dịch")
+    parser.add_argument("--no-repack", action="store_true", help="Bỏ qua bước đóng gói")
+    parser.add_argument("--archive-storage", action="store_true",
+                        help="Lưu file trung gian trong archive .sqlite và xuất bản dịch dạng patch .zip")
+    parser.add_argument("--list", action="store_true", help="Chỉ in trạng thái hàng đợi rồi thoát")
+    parser.add_argument("--clear-finished", action="store_true", help="Xóa các game đã xong/thất bại khỏi hàng đợi")
+    args = parser.parse_args()
+
+    translator = AutoTranslator(models_path=args.models, output_base_path=args.output,
+                                backend=os.environ.get("AUTO_TRANSLATOR_BACKEND", "nllb"),
+                                small_models_path=os.environ.get("AUTO_TRANSLATOR_SMALL_MODEL") or None)
+    translator.archive_storage = args.archive_storage
+    job_queue = GameJobQueue(translator)
+    if args.clear_finished:
+        job_queue.clear_finished()
+    if args.list:
+        for job in job_queue.jobs:
+            print(f"[{job['status']}] {job['game_path']}" + (f" - {job['error']}" if job.get('error') else ""))
+        return
+
+    # Tải model ở nền trong lúc thêm game và chuẩn bị game đầu tiên
+    translator.preload_async()
+    for game_path in args.games:
+        if not Path(game_path).is_dir():
+            print(f"Bỏ qua, không phải thư mục game: {game_path}")
+            continue
+        job_queue.add(game_path)
+
+    params = {
+        "source_lang": args.source,
+        "target_lang": args.target[0],
+        "target_langs": args.target,
+        "batch_size": args.batch_size,
+        "use_dictionary": False,
+        "auto_detect": args.source == "auto",
+        "max_tokens": args.max_tokens,
+        "num_beams": args.num_beams,
+    }
+    try:
+        job_queue.run(params, fix_post=not args.no_fix_post, repack=not args.no_repack)
+    except TranslationCancelled:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Duyệt cây JSON (dict/list lồng nhau) không đệ quy. Mỗi giá trị lá được trả về dưới dạng (container, key, value):
+container[key] = ... ghi trực tiếp vào đúng vị trí, không cần duyệt lại cây theo thứ tự để ghi kết quả.
+"""
+
+
+def _items(container):
+    return iter(container.items()) if isinstance(container, dict) else enumerate(container)
+
+
+def walk_leaves(data):
+    """Yield (container, key, value) cho mọi giá trị không phải dict/list, theo thứ tự trong tài liệu."""
+    if not isinstance(data, (dict, list)):
+        return
+    stack = [(data, _items(data))]
+    while stack:
+        container, items = stack[-1]
+        for key, value in items:
+            if isinstance(value, (dict, list)):
+                stack.append((value, _items(value)))
+                break
+            yield container, key, value
+        else:
+            stack.pop()
+
+
+def iter_strings(data):
+    """Yield (container, key, value) cho mọi chuỗi trong cây JSON."""
+    for container, key, value in walk_leaves(data):
+        if isinstance(value, str):
+            yield container, key, value
+
+
+def iter_dict_strings(data):
+    """Như iter_strings nhưng chỉ lấy chuỗi là giá trị của dict (bỏ qua chuỗi nằm trực tiếp trong list)."""
+    for container, key, value in walk_leaves(data):
+        if isinstance(value, str) and isinstance(container, dict):
+            yield container, key, value
@@ -0,0 +1,119 @@
+import re
+from collections import Counter
+
+# Khoảng Unicode của các hệ chữ cần phân biệt.
+SCRIPT_RANGES = [
+    ("Hiragana", 0x3040, 0x309F),
+    ("Katakana", 0x30A0, 0x30FF),
+    ("Katakana", 0x31F0, 0x31FF),
+    ("Katakana", 0xFF66, 0xFF9F),
+    ("Han", 0x3400, 0x4DBF),
+    ("Han", 0x4E00, 0x9FFF),
+    ("Han", 0xF900, 0xFAFF),
+    ("Hangul", 0x1100, 0x11FF),
+    ("Hangul", 0x3130, 0x318F),
+    ("Hangul", 0xAC00, 0xD7AF),
+    ("Cyrillic", 0x0400, 0x04FF),
+    ("Latin", 0x0041, 0x005A),
+    ("Latin", 0x0061, 0x007A),
+    ("Latin", 0x00C0, 0x024F),
+    ("Latin", 0x1E00, 0x1EFF),
+]
+
+# Chữ cái chỉ xuất hiện trong tiếng Việt. Không gồm â, ê, ô vì tiếng Pháp cũng dùng (forêt, prêt, hôtel);
+# câu tiếng Việt chỉ có các chữ đó vẫn được nhận qua trigram bên dưới.
+VIETNAMESE_CHARS = set(
+    "ăđơưĂĐƠƯ"
+    "ạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ"
+    "ẠẢẤẦẨẪẬẮẰẲẴẶẸẺẼẾỀỂỄỆỈỊỌỎỐỒỔỖỘỚỜỞỠỢỤỦỨỪỬỮỰỲỴỶỸ"
+)
+FRENCH_CHARS = set("çœæëïîûÿÇŒÆËÏÎÛŸ")
+# Chữ có dấu mà cả tiếng Pháp lẫn tiếng Việt đều dùng: chỉ cho biết không phải tiếng Anh, trigram quyết định phần còn lại.
+SHARED_ACCENT_CHARS = set("àâèéêôùÀÂÈÉÊÔÙ")
+
+# Mô hình n-gram nhỏ: các trigram ký tự (có khoảng trắng biên) phổ biến nhất của từng ngôn ngữ Latin.
+TRIGRAM_PROFILES = {
+    "eng_Latn": (
+        " th|the|he | to|ing|and|nd | an|ed | of|of |ng | in|to |er | yo|you|ou |is | is"
+        "| it|it |re |hat|at |es | wh| ha|on |for| fo|or | be|you| no|ll |in |at | we"
+    ),
+    "fra_Latn": (
+        " de|de |es | le|le |ent| la|la | et|et |les| pa|re |nt | qu|que|ue | vo|vou|ous"
+        "|us | un| ne|ne | pa|pas| je|je | ce|ur |est| es| en| du|du | au|aux|eau"
+    ),
+    "vie_Latn": (
+        " kh|kho|ng |nh |ông|ch | ng| tr| ch|hôn|ông| có|có | là|là | cá|các|ác |i n|anh"
+        "| và|và | đư|được| củ|của|ủa | ng|ngư|ười| mộ|một|ột| tô|tôi|ôi | bạ|bạn|ạn "
+    ),
+}
+TRIGRAM_PROFILES = {lang: set(profile.split("|")) for lang, profile in TRIGRAM_PROFILES.items()}
+
+WORD_RE = re.compile(r"[^\W\d_]+")
+
+# Chỉ chọn một ngôn ngữ khi điểm trigram cao nhất hơn điểm kế tiếp ít nhất MIN_TRIGRAM_MARGIN và chiếm ít nhất
+# MIN_TRIGRAM_SHARE số trigram của chuỗi; nếu không, chuỗi có thể là ngôn ngữ Latin khác (Đức, Ý, Indonesia...)
+MIN_TRIGRAM_MARGIN = 2
+MIN_TRIGRAM_SHARE = 0.25
+
+
+def script_counts(text):
+    counts = Counter()
+    for ch in text:
+        cp = ord(ch)
+        if cp < 0x41:
+            continue
+        for name, start, end in SCRIPT_RANGES:
+            if start <= cp <= end:
+                counts[name] += 1
+                break
+        else:
+            # Chữ của hệ chữ không phân biệt được (Thái, Ả Rập...): vẫn tính vào tổng để không bị coi là Latin
+            if ch.isalpha():
+                counts["Other"] += 1
+    return counts
+
+
+def _guess_latin(text):
+    if any(ch in VIETNAMESE_CHARS for ch in text):
+        return "vie_Latn"
+    lowered = " " + " ".join(WORD_RE.findall(text.lower())) + " "
+    trigrams = {lowered[i:i + 3] for i in range(len(lowered) - 2)}
+    scores = {lang: len(trigrams & profile) for lang, profile in TRIGRAM_PROFILES.items()}
+    if any(ch in FRENCH_CHARS for ch in text):
+        scores["fra_Latn"] += 2
+    if any(ch in SHARED_ACCENT_CHARS for ch in text):
+        scores["fra_Latn"] += 1
+        scores["vie_Latn"] += 1
+    best = max(scores, key=scores.get)
+    runner_up = max(score for lang, score in scores.items() if lang != best)
+    if scores[best] - runner_up < MIN_TRIGRAM_MARGIN or scores[best] < MIN_TRIGRAM_SHARE * len(trigrams):
+        return None
+    return best
+
+
+def detect_language(text, min_letters=2, han_lang="zho_Hans"):
+    """
+    Nhận diện ngôn ngữ của một đoạn văn bản, trả về mã NLLB (vd: 'jpn_Jpan')
+    hoặc None nếu không đủ dữ liệu hoặc không đủ tin cậy để quyết định (kể cả hệ chữ/ngôn ngữ không hỗ trợ).
+    han_lang: ngôn ngữ gán cho chuỗi chỉ có chữ Hán (game Nhật thường có tên vật phẩm toàn Kanji).
+    """
+    counts = script_counts(text)
+    total = sum(counts.values())
+    if total < min_letters:
+        return None
+    if counts["Hiragana"] or counts["Katakana"]:
+        return "jpn_Jpan"
+    if counts["Hangul"] / total > 0.3:
+        return "kor_Hang"
+    if counts["Han"] / total > 0.3:
+        return han_lang
+    if counts["Cyrillic"] / total > 0.3:
+        return "rus_Cyrl"
+    if counts["Latin"] / total > 0.5:
+        return _guess_latin(text)
+    return None
+
+
+def has_kana(texts):
+    """Kiểm tra nhanh một tập chuỗi có chứa Hiragana/Katakana hay không."""
+    return any(0x3040 <= ord(ch) <= 0x30FF for text in texts for ch in text)
@@ -0,0 +1,51 @@
+# Ngưỡng phát hiện đầu ra bất thường của model (lặp vô hạn, sinh dài bất thường, bỏ trống).
+MAX_NGRAM = 4
+MAX_REPEAT = 4
+LENGTH_RATIO_LIMIT = 3.0
+LENGTH_SLACK = 10
+MIN_DIVERSITY_LENGTH = 16
+# Số token khác nhau của bản dịch so với của chuỗi nguồn
+MIN_UNIQUE_RATIO = 0.4
+
+# Tham số giải mã khi dịch lại các chuỗi bất thường (hỗ trợ bởi CTranslate2).
+RETRY_OPTIONS = {"repetition_penalty": 1.3, "no_repeat_ngram_size": 3}
+RETRY_LENGTH_RATIO = 2.0
+
+
+def repeated_ngram(token_ids, max_ngram=MAX_NGRAM, max_repeat=MAX_REPEAT):
+    """Trả về n nếu có một n-gram lặp liên tiếp >= max_repeat lần (vd: "the the the the"), ngược lại 0."""
+    for n in range(1, max_ngram + 1):
+        run = 0
+        for i in range(len(token_ids) - n):
+            if token_ids[i] == token_ids[i + n]:
+                run += 1
+                if run >= n * (max_repeat - 1):
+                    return n
+            else:
+                run = 0
+    return 0
+
+
+def find_anomaly(source_ids, output_ids, max_length):
+    """
+    Kiểm tra một bản dịch (dạng token id) so với chuỗi nguồn, trả về tên lỗi hoặc None nếu bình thường.
+    Các mẫu lặp đã có sẵn trong chuỗi nguồn (vd: "Ha ha ha ha") không bị tính là lỗi.
+    """
+    if source_ids and not output_ids:
+        return "empty"
+    # Chạm giới hạn độ dài chỉ đáng ngờ khi chuỗi nguồn ngắn hơn nhiều so với giới hạn
+    if len(output_ids) >= max_length - 1 and len(source_ids) * 2 < max_length:
+        return "max_length"
+    if len(output_ids) > len(source_ids) * LENGTH_RATIO_LIMIT + LENGTH_SLACK:
+        return "length_ratio"
+    n = repeated_ngram(output_ids)
+    if n and not repeated_ngram(source_ids):
+        return f"repeat_{n}gram"
+    if len(output_ids) >= MIN_DIVERSITY_LENGTH and len(set(output_ids)) < len(set(source_ids)) * MIN_UNIQUE_RATIO:
+        return "low_diversity"
+    return None
+
+
+def retry_max_length(source_ids, max_length):
+    """Giới hạn độ dài chặt hơn cho lần dịch lại."""
+    return min(max_length, int(len(source_ids) * RETRY_LENGTH_RATIO) + LENGTH_SLACK)
@@ -0,0 +1,100 @@
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    """Bộ nhớ RSS cao nhất của tiến trình (MB), hoặc None nếu không đo được trên hệ điều hành này."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux trả về KB, macOS trả về byte
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        memory_info = psutil.Process().memory_info()
+        return getattr(memory_info, "peak_wset", memory_info.rss) / (1024 * 1024)
+    except Exception:
+        return None
+
+
+class PipelineMetrics:
+    """
+    Ghi nhận thời gian theo từng stage và các bộ đếm của pipeline dịch.
+    Mỗi lần đo được gửi qua event_callback (nếu có) dưới dạng dict, summary() tổng hợp lại
+    để ghi ra file JSON.
+    """
+
+    def __init__(self, event_callback=None):
+        self.event_callback = event_callback
+        self.reset()
+
+    def reset(self):
+        self.start_time = time.perf_counter()
+        self.stage_seconds = defaultdict(float)
+        self.counters = Counter()
+
+    def emit(self, event_type, **data):
+        if self.event_callback:
+            self.event_callback({"type": event_type, **data})
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stage_seconds[name] += elapsed
+            self.emit("stage", stage=name, seconds=elapsed)
+
+    def add(self, name, value=1):
+        self.counters[name] += value
+
+    def record_batch(self, batch_capacity, source_lengths, target_lengths):
+        """Ghi nhận một batch đã qua model: độ lấp đầy batch và tỉ lệ padding phía nguồn."""
+        size = len(source_lengths)
+        padded = size * max(source_lengths, default=0)
+        self.counters["batches"] += 1
+        self.counters["batch_slots"] += batch_capacity
+        self.counters["batch_segments"] += size
+        self.counters["source_tokens"] += sum(source_lengths)
+        self.counters["target_tokens"] += sum(target_lengths)
+        self.counters["padded_source_tokens"] += padded
+        self.emit("batch", size=size, capacity=batch_capacity,
+                  source_tokens=sum(source_lengths), target_tokens=sum(target_lengths), padded_tokens=padded)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start_time
+        model_seconds = self.stage_seconds.get("model", 0.0)
+        counters = self.counters
+        cache_lookups = counters["cache_hits"] + counters["cache_misses"]
+
+        def ratio(numerator, denominator, digits=4):
+            return round(numerator / denominator, digits) if denominator else None
+
+        return {
+            "elapsed_seconds": round(elapsed, 3),
+            "stage_seconds": {name: round(seconds, 3) for name, seconds in sorted(self.stage_seconds.items())},
+            "counters": dict(counters),
+            "segments_per_second": ratio(counters["segments_translated"], elapsed, 2),
+            "source_tokens_per_second": ratio(counters["source_tokens"], model_seconds, 2),
+            "target_tokens_per_second": ratio(counters["target_tokens"], model_seconds, 2),
+            "batch_fill_ratio": ratio(counters["batch_segments"], counters["batch_slots"]),
+            "padding_waste": ratio(counters["padded_source_tokens"] - counters["source_tokens"], counters["padded_source_tokens"]),
+            "cache_hit_rate": ratio(counters["cache_hits"], cache_lookups),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+    def write_summary(self, path):
+        summary = self.summary()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=4)
+        self.emit("summary", **summary)
+        return summary
@@ -0,0 +1,323 @@
+"""
+Đọc script Ren'Py đã đóng gói mà không cần công cụ ngoài (unrpa/unrpyc):
+- Archive .rpa (RPA-2.0/RPA-3.0): chỉ đọc phần chỉ mục ở cuối file, từng file bên trong được đọc bằng seek tới đúng vị trí
+  (không giải nén toàn bộ archive, nên archive nhiều GB vẫn chỉ tốn vài lần đọc nhỏ).
+- Script đã biên dịch .rpyc: AST được unpickle bằng Unpickler giới hạn, các lớp của Ren'Py được thay bằng lớp rỗng
+  chỉ giữ thuộc tính, mọi global khác bị chặn (không chạy mã nào trong file của game).
+Lời thoại (kèm identifier dịch của Ren'Py) và lựa chọn menu được xuất thành file .rpy gồm các khối `translate`,
+Ren'Py sẽ tự biên dịch các file này khi chạy game.
+"""
+import io
+import pickle
+import re
+import zlib
+
+RPA2_MAGIC = b"RPA-2.0 "
+RPA3_MAGIC = b"RPA-3.0 "
+RPYC2_MAGIC = b"RENPY RPC2"
+
+# Dòng đầu của file translate do module này tạo; translate_game dựa vào đó để chỉ dịch phần chuỗi trong dấu nháy
+TL_HEADER = "# Bản dịch Ren'Py tạo tự động"
+# Tên ngôn ngữ tạm trong file translate, được thay bằng tên ngôn ngữ Ren'Py của từng ngôn ngữ đích khi ghi bản dịch
+TL_LANGUAGE = "__autotranslate_language__"
+# Dòng trong file translate không chứa văn bản cần dịch (dù có chuỗi trong dấu nháy)
+TL_SKIP_PREFIXES = ("#", "old ", "translate ", "init ", "config.")
+
+# Chuỗi trong dấu nháy hoặc một dấu ngoặc: dùng để bỏ qua chuỗi nằm trong tham số "(what_color=...)" của lời thoại
+SAY_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|[()\[\]{}]')
+
+# Mã NLLB -> tên ngôn ngữ theo quy ước của Ren'Py (thư mục game/tl/<tên>)
+RENPY_LANGUAGES = {
+    "vie_Latn": "vietnamese", "eng_Latn": "english", "fra_Latn": "french", "deu_Latn": "german",
+    "spa_Latn": "spanish", "por_Latn": "portuguese", "ita_Latn": "italian", "rus_Cyrl": "russian",
+    "jpn_Jpan": "japanese", "kor_Hang": "korean", "zho_Hans": "schinese", "zho_Hant": "tchinese",
+    "ind_Latn": "indonesian", "tha_Thai": "thai", "pol_Latn": "polish", "tur_Latn": "turkish",
+}
+
+
+def renpy_language(nllb_code):
+    return RENPY_LANGUAGES.get(nllb_code, nllb_code.split("_")[0].lower())
+
+
+# --- Unpickler giới hạn ---
+
+def _latin1_encode(text, encoding="latin1"):
+    # Python 3 pickle (protocol 2) lưu bytes dưới dạng _codecs.encode(str, "latin1")
+    if encoding not in ("latin1", "latin-1"):
+        raise pickle.UnpicklingError(f"Không hỗ trợ mã hóa {encoding} trong pickle.")
+    return text.encode("latin1")
+
+
+class RenpyObject:
+    """Thay cho một lớp của Ren'Py khi unpickle: chỉ giữ thuộc tính, không có hành vi nào."""
+    _module = ""
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        if isinstance(state, tuple) and len(state) == 2 and all(part is None or isinstance(part, dict) for part in state):
+            for part in state:
+                self.__dict__.update(part or {})
+        elif isinstance(state, dict):
+            self.__dict__.update(state)
+        else:
+            self.__dict__["state"] = state
+
+    def __repr__(self):
+        return f"<{self._module}.{type(self).__name__}>"
+
+
+class RenpyExpr(str):
+    """Thay cho renpy.ast.PyExpr (chuỗi biểu thức Python kèm vị trí trong file)."""
+
+    def __new__(cls, text="", *args):
+        return str.__new__(cls, text)
+
+    def __setstate__(self, state):
+        pass
+
+
+class _RestrictedUnpickler(pickle.Unpickler):
+    SAFE_GLOBALS = {
+        ("_codecs", "encode"): _latin1_encode,
+        ("builtins", "bytes"): bytes,
+        ("__builtin__", "bytes"): bytes,
+        ("builtins", "set"): set,
+        ("builtins", "frozenset"): frozenset,
+        ("__builtin__", "set"): set,
+        ("__builtin__", "frozenset"): frozenset,
+        ("collections", "OrderedDict"): dict,
+    }
+
+    def __init__(self, file, allow_renpy=False, **kwargs):
+        super().__init__(file, **kwargs)
+        self.allow_renpy = allow_renpy
+        self.classes = {}
+
+    def find_class(self, module, name):
+        if (module, name) in self.SAFE_GLOBALS:
+            return self.SAFE_GLOBALS[(module, name)]
+        if self.allow_renpy and (module == "renpy" or module.startswith(("renpy.", "store"))):
+            key = (module, name)
+            if key not in self.classes:
+                base = RenpyExpr if name in ("PyExpr", "PyCode") and module == "renpy.ast" else RenpyObject
+                self.classes[key] = type(name, (base,), {"_module": module})
+            return self.classes[key]
+        raise pickle.UnpicklingError(f"Global {module}.{name} bị chặn khi đọc dữ liệu Ren'Py.")
+
+
+def _restricted_loads(data, allow_renpy=False, encoding="utf-8"):
+    return _RestrictedUnpickler(io.BytesIO(data), allow_renpy=allow_renpy, encoding=encoding, errors="surrogateescape").load()
+
+
+def _as_text(value):
+    return value.decode("utf-8", "surrogateescape") if isinstance(value, bytes) else value
+
+
+# --- Archive .rpa ---
+
+class RpaArchive:
+    """Chỉ mục của một archive .rpa; read(name) đọc một file bên trong bằng seek, không giải nén cả archive."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.index = self._read_index()
+        except Exception:
+            self.file.close()
+            raise
+
+    def _read_index(self):
+        header = self.file.readline()
+        if header.startswith(RPA3_MAGIC):
+            parts = header.split()
+            offset, key = int(parts[1], 16), int(parts[2], 16)
+        elif header.startswith(RPA2_MAGIC):
+            offset, key = int(header.split()[1], 16), 0
+        else:
+            raise ValueError(f"{self.path} không phải archive RPA-2.0/RPA-3.0")
+        self.file.seek(offset)
+        raw_index = _restricted_loads(zlib.decompress(self.file.read()), encoding="bytes")
+        index = {}
+        for name, chunks in raw_index.items():
+            # Mỗi file là một danh sách đoạn (offset, độ dài[, phần đầu lưu sẵn trong chỉ mục]); thực tế chỉ có một đoạn
+            chunk = chunks[0]
+            prefix = chunk[2] if len(chunk) > 2 else b""
+            if isinstance(prefix, str):
+                prefix = prefix.encode("latin1")
+            index[_as_text(name)] = (chunk[0] ^ key, chunk[1] ^ key, prefix)
+        return index
+
+    def names(self, suffixes=None):
+        """Tên các file trong archive theo thứ tự vị trí trong archive (đọc lần lượt là đọc tuần tự trên đĩa)."""
+        names = sorted(self.index, key=lambda name: self.index[name][0])
+        if suffixes:
+            names = [name for name in names if name.lower().endswith(tuple(suffixes))]
+        return names
+
+    def read(self, name):
+        offset, length, prefix = self.index[name]
+        self.file.seek(offset)
+        return prefix + self.file.read(length - len(prefix))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- Script .rpyc ---
+
+def load_rpyc(data):
+    """Trả về danh sách câu lệnh gốc (AST) của một file .rpyc."""
+    if data.startswith(RPYC2_MAGIC):
+        position = len(RPYC2_MAGIC)
+        while position + 12 <= len(data):
+            slot, start, length = (int.from_bytes(data[position + i:position + i + 4], "little") for i in (0, 4, 8))
+            if slot == 0:
+                break
+            if slot == 1:
+                payload = data[start:start + length]
+                break
+            position += 12
+        else:
+            raise ValueError("file .rpyc không có dữ liệu script")
+        if slot != 1:
+            raise ValueError("file .rpyc không có dữ liệu script")
+    else:
+        payload = data  # Định dạng cũ (RPC1): toàn bộ file là pickle nén
+    _, statements = _restricted_loads(zlib.decompress(payload), allow_renpy=True)
+    return statements
+
+
+def _children(node):
+    """Các node con (theo thứ tự) của một node AST, không theo con trỏ next để tránh vòng lặp."""
+    for attr, value in vars(node).items():
+        if attr == "next" or attr.startswith("_"):
+            continue
+        if isinstance(value, RenpyObject):
+            yield value
+        elif isinstance(value, (list, tuple)):
+            stack = [iter(value)]
+            while stack:
+                for item in stack[-1]:
+                    if isinstance(item, RenpyObject):
+                        yield item
+                    elif isinstance(item, (list, tuple)):
+                        stack.append(iter(item))
+                        break
+                else:
+                    stack.pop()
+
+
+def _say_code(say):
+    parts = []
+    if getattr(say, "who", None):
+        parts.append(str(say.who))
+    parts.extend(str(attribute) for attribute in getattr(say, "attributes", None) or ())
+    temporary = getattr(say, "temporary_attributes", None)
+    if temporary:
+        parts.append("@")
+        parts.extend(str(attribute) for attribute in temporary)
+    parts.append(quote(say.what))
+    if not getattr(say, "interact", True):
+        parts.append("nointeract")
+    arguments = getattr(getattr(say, "arguments", None), "arguments", None)
+    if arguments:
+        parts.append("(" + ", ".join(f"{name}={value}" if name else str(value) for name, value in arguments) + ")")
+    if getattr(say, "with_", None):
+        parts.extend(("with", str(say.with_)))
+    return " ".join(parts)
+
+
+def collect_translatables(statements):
+    """
+    Trả về (lời thoại, chuỗi): lời thoại là danh sách dict (identifier, code, what, filename, linenumber) theo thứ tự
+    trong script, chuỗi là các lựa chọn menu (không trùng lặp).
+    """
+    dialogue = []
+    strings = {}
+    seen = set()
+    stack = list(reversed(statements))
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        kind = type(node).__name__
+        say = None
+        if kind == "Translate" and getattr(node, "language", None) is None:
+            say = next((child for child in node.block if type(child).__name__ in ("Say", "TranslateSay")), None)
+        elif kind == "TranslateSay" and getattr(node, "language", None) is None:
+            say = node
+        if say is not None and getattr(say, "what", None) and getattr(node, "identifier", None):
+            dialogue.append({"identifier": str(node.identifier), "code": _say_code(say), "what": say.what,
+                             "filename": getattr(node, "filename", None), "linenumber": getattr(node, "linenumber", None)})
+        elif kind == "Menu":
+            for item in getattr(node, "items", None) or ():
+                if item and isinstance(item[0], str) and item[0].strip():
+                    strings.setdefault(item[0], None)
+        if kind != "TranslateSay":
+            stack.extend(reversed(list(_children(node))))
+    return dialogue, list(strings)
+
+
+def quote(text):
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def unquote(text):
+    return re.sub(r'\\(.)', lambda match: {"n": "\n"}.get(match.group(1), match.group(1)), text)
+
+
+def render_translation_file(source_name, dialogue, strings):
+    """Nội dung file .rpy gồm các khối translate (ngôn ngữ là TL_LANGUAGE) cho lời thoại và chuỗi của một script."""
+    lines = [f"{TL_HEADER} từ {source_name}", "", "init python:", f'    config.language = "{TL_LANGUAGE}"', ""]
+    for entry in dialogue:
+        if entry["filename"]:
+            lines.append(f"# {entry['filename']}:{entry['linenumber']}")
+        lines.extend((f"translate {TL_LANGUAGE} {entry['identifier']}:", "", f"    # {entry['code']}", f"    {entry['code']}", ""))
+    if strings:
+        lines.extend((f"translate {TL_LANGUAGE} strings:", ""))
+        for text in strings:
+            lines.extend((f"    old {quote(text)}", f"    new {quote(text)}", ""))
+    return "\n".join(lines) + "\n"
+
+
+def is_translation_file(lines):
+    return bool(lines) and lines[0].startswith(TL_HEADER)
+
+
+def split_translatable_line(line):
+    """(phần trước, văn bản, phần sau) của một dòng cần dịch trong file translate, hoặc None nếu dòng không cần dịch."""
+    stripped = line.strip()
+    if not stripped or stripped.startswith(TL_SKIP_PREFIXES):
+        return None
+    # Dòng do _say_code tạo: [nhân vật] [thuộc tính] "what" [nointeract] [(tham số)] [with ...]. Văn bản là chuỗi
+    # cuối cùng nằm ngoài dấu ngoặc (trước đó có thể là tên nhân vật dạng chuỗi, sau đó là tham số trong ngoặc)
+    match = None
+    depth = 0
+    for token in SAY_TOKEN_RE.finditer(line):
+        if token.group(1) is not None:
+            if depth == 0:
+                match = token
+        elif token.group(0) in "([{":
+            depth += 1
+        else:
+            depth = max(0, depth - 1)
+    if match is None:
+        return None
+    return line[:match.start()], unquote(match.group(1)), line[match.end():]
+
+
+def join_translatable_line(before, text, after):
+    return before + quote(text) + after
@@ -0,0 +1,177 @@
+import tempfile
+import threading
+from array import array
+
+# Bộ nhớ tối đa cho vùng chứa văn bản (arena) trước khi phần cũ được ghi ra file tạm
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+_INITIAL_SLOTS = 1024
+
+
+class SegmentStore:
+    """
+    Kho chuỗi gọn cho toàn bộ một game: văn bản được intern (mỗi chuỗi khác nhau lưu một lần, dạng UTF-8)
+    nối tiếp nhau trong một arena bytearray với bảng offset (độ dài suy ra từ offset kế tiếp); mỗi đoạn (segment) chỉ là hai số trong các mảng kiểu
+    (địa chỉ trong file, text id), đoạn của một file nằm liền nhau nên file id suy ra từ vị trí bắt đầu của file;
+    trạng thái đã dịch của từng chuỗi theo từng ngôn ngữ đích là một bitmap.
+    Khi arena vượt memory_limit, phần đã có được ghi nối vào một file tạm và chỉ đọc lại khi cần.
+    """
+
+    def __init__(self, target_count=1, memory_limit=DEFAULT_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        # Văn bản (nguồn và bản dịch dùng chung một kho)
+        self.arena = bytearray()
+        self.spilled_bytes = 0
+        self.spill_file = None
+        self.text_offsets = array('Q', [0])  # text_offsets[i + 1] - text_offsets[i] là độ dài chuỗi i
+        self.text_hashes = array('I')  # 32 bit thấp của hash, dùng để loại nhanh khi so sánh
+        self.slots = array('I', bytes(4 * _INITIAL_SLOTS))  # text id + 1, 0 là ô trống
+        # Đoạn văn bản theo thứ tự xuất hiện
+        self.segment_addresses = array('I')
+        self.segment_texts = array('I')
+        self.file_starts = array('Q')
+        # Bản dịch: text id nguồn -> text id bản dịch, kèm bitmap "đã dịch" cho từng ngôn ngữ đích
+        self.translations = [array('I') for _ in range(target_count)]
+        self.translated_bits = [bytearray() for _ in range(target_count)]
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.segment_texts)
+
+    @property
+    def text_count(self):
+        return len(self.text_offsets) - 1
+
+    def memory_usage(self):
+        """Số byte ước tính đang giữ trong RAM (arena + các mảng + bảng băm)."""
+        arrays = [self.text_offsets, self.text_hashes, self.slots,
+                  self.segment_addresses, self.segment_texts, self.file_starts] + self.translations
+        return len(self.arena) + sum(a.itemsize * len(a) for a in arrays) + sum(len(bits) for bits in self.translated_bits)
+
+    # --- Văn bản ---
+
+    def intern(self, text):
+        """Trả về text id của chuỗi, thêm vào arena nếu chưa có."""
+        data = text.encode('utf-8')
+        text_hash = hash(data) & 0xFFFFFFFF
+        mask = len(self.slots) - 1
+        slot = text_hash & mask
+        while True:
+            entry = self.slots[slot]
+            if not entry:
+                break
+            text_id = entry - 1
+            if self.text_hashes[text_id] == text_hash and self._length(text_id) == len(data) and self._read(text_id) == data:
+                return text_id
+            slot = (slot + 1) & mask
+
+        text_id = self.text_count
+        self.arena += data
+        self.text_offsets.append(self.spilled_bytes + len(self.arena))
+        self.text_hashes.append(text_hash)
+        self.slots[slot] = text_id + 1
+        for translations, bits in zip(self.translations, self.translated_bits):
+            translations.append(0)
+            if text_id % 8 == 0:
+                bits.append(0)
+        if (text_id + 1) * 3 > len(self.slots) * 2:
+            self._grow_slots()
+        if len(self.arena) > self.memory_limit:
+            self._spill()
+        return text_id
+
+    def text(self, text_id):
+        return self._read(text_id).decode('utf-8')
+
+    def _length(self, text_id):
+        return self.text_offsets[text_id + 1] - self.text_offsets[text_id]
+
+    def _read(self, text_id):
+        offset = self.text_offsets[text_id]
+        length = self._length(text_id)
+        if offset >= self.spilled_bytes:
+            start = offset - self.spilled_bytes
+            return bytes(self.arena[start:start + length])
+        with self.lock:
+            self.spill_file.seek(offset)
+            return self.spill_file.read(length)
+
+    def _grow_slots(self):
+        slots = array('I', bytes(4 * len(self.slots) * 2))
+        mask = len(slots) - 1
+        for text_id, text_hash in enumerate(self.text_hashes):
+            slot = text_hash & mask
+            while slots[slot]:
+                slot = (slot + 1) & mask
+            slots[slot] = text_id + 1
+        self.slots = slots
+
+    def _spill(self):
+        with self.lock:
+            if self.spill_file is None:
+                self.spill_file = tempfile.TemporaryFile(prefix="segments_")
+            self.spill_file.seek(0, 2)
+            self.spill_file.write(self.arena)
+            self.spilled_bytes += len(self.arena)
+            self.arena = bytearray()
+
+    # --- Đoạn văn bản ---
+
+    def add_file(self):
+        """Bắt đầu một file mới, trả về file id; các add() sau đó thuộc về file này."""
+        self.file_starts.append(len(self.segment_texts))
+        return len(self.file_starts) - 1
+
+    def add(self, file_id, text, address=None):
+        """
+        Thêm một đoạn vào file, trả về text id. address: vị trí trong file (vd: số dòng),
+        mặc định là thứ tự của đoạn trong file.
+        """
+        text_id = self.intern(text)
+        if address is None:
+            address = len(self.segment_texts) - self.file_starts[file_id]
+        self.segment_addresses.append(address)
+        self.segment_texts.append(text_id)
+        return text_id
+
+    def _file_range(self, file_id):
+        start = self.file_starts[file_id]
+        end = self.file_starts[file_id + 1] if file_id + 1 < len(self.file_starts) else len(self.segment_texts)
+        return start, end
+
+    def file_segment_count(self, file_id):
+        start, end = self._file_range(file_id)
+        return end - start
+
+    def file_segments(self, file_id):
+        """Các cặp (địa chỉ, text id) của một file theo thứ tự đã thêm."""
+        start, end = self._file_range(file_id)
+        return zip(self.segment_addresses[start:end], self.segment_texts[start:end])
+
+    def pending_texts(self, file_id):
+        """Text id (không trùng lặp) của file còn thiếu bản dịch cho ít nhất một ngôn ngữ đích."""
+        pending = {}
+        for _, text_id in self.file_segments(file_id):
+            if not all(self.is_translated(text_id, target) for target in range(len(self.translations))):
+                pending[text_id] = None
+        return list(pending)
+
+    # --- Bản dịch ---
+
+    def is_translated(self, text_id, target=0):
+        return bool(self.translated_bits[target][text_id >> 3] & (1 << (text_id & 7)))
+
+    def set_translation(self, text_id, translated_text, target=0):
+        self.translations[target][text_id] = self.intern(translated_text)
+        self.translated_bits[target][text_id >> 3] |= 1 << (text_id & 7)
+
+    def translation(self, text_id, target=0):
+        """Bản dịch của chuỗi, hoặc chính chuỗi gốc nếu chưa dịch."""
+        if self.is_translated(text_id, target):
+            return self.text(self.translations[target][text_id])
+        return self.text(text_id)
+
+    def close(self):
+        with self.lock:
+            if self.spill_file is not None:
+                self.spill_file.close()
+                self.spill_file = None
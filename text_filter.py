@@ -0,0 +1,160 @@
+import re
+from collections import Counter
+
+# Các quy tắc mặc định: (tên, regex). Chuỗi khớp một quy tắc sẽ được giữ nguyên, không đưa vào model.
+DEFAULT_RULES = [
+    ("number", r"[+-]?(\d+([.,:]\d+)*|\d*\.\d+)([eE][+-]?\d+)?%?"),
+    # Mã màu phải có chữ số hoặc lặp một ký tự (#fff), để từ như "#bad", "#cafe" vẫn được dịch
+    ("hex_color", r"0x[0-9a-fA-F]{1,8}|#(?=[0-9a-fA-F]*\d)([0-9a-fA-F]{3,4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})|#(?P<hex>[0-9a-fA-F])(?P=hex){2,7}"),
+    ("url", r"(https?|ftp|file)://\S+|www\.\S+"),
+    # Đường dẫn phải kết thúc bằng tên file có phần mở rộng hoặc bắt đầu bằng thư mục asset quen thuộc,
+    # để nhãn như "Yes/No", "Save/Load/Quit" vẫn được dịch
+    ("asset_path", r"([A-Za-z]:[/\\])?[\w.\-]+([/\\][\w.\-]+)*[/\\][\w\-]+\.\w{2,4}"
+                   r"|(img|audio|fonts|movies|data|js|css|effects|icons?|images|gui|sounds?|music|bgm)([/\\][\w.\-]+)*[/\\]?"),
+    ("file_name", r"[\w.\-]+\.(png|jpe?g|gif|bmp|webp|ogg|m4a|mp3|wav|mp4|webm|json|js|txt|xml|rpy|rpyc|ttf|otf|woff2?|css|csv)"),
+    ("snake_case", r"[A-Za-z][A-Za-z0-9]*(_[A-Za-z0-9]+)+"),
+    ("camel_case", r"[a-z]+[A-Z][A-Za-z0-9]*"),
+    ("literal", r"true|false|null|undefined|NaN"),
+    # Từ khóa chỉ tính là mã khi đi kèm cú pháp thật ("let x =", "return x;", "if (a) {"...), không phải
+    # câu thoại như "let me go!", "return to town" hay "if (you dare)"
+    ("code", r"\s*(function\s*[\w$]*\s*\(|(var|let|const)\s+[A-Za-z_$][\w$]*\s*[=;]|return(\s+[^;]*)?;\s*$|this\.[A-Za-z_$]"
+             r"|\$game|\$data|(\([^()]*\)|[A-Za-z_$][\w$]*)\s*=>|if\s*\(.*\)\s*(\{|return\b|[\w$.]+\s*[=(;])).*"),
+    ("json_blob", r"\s*(\{\s*\".*\}|\[\s*[\[{\"\d].*\])\s*"),
+]
+
+# Quy tắc bổ sung theo engine.
+ENGINE_RULES = {
+    "RPGMakerMV": [
+        # Chuỗi chỉ gồm mã điều khiển như \C[2], \V[1], \. hoặc \|
+        ("control_code", r"(\\[A-Za-z]+(\[\d+\])?|\\[.|!><^{}$])+"),
+        # Tham số plugin dạng cờ/biểu thức
+        ("plugin_expr", r"[\w.$]+\s*(==|!=|>=|<=|&&|\|\|)\s*[\w.$'\"]+"),
+    ],
+    "RenPy": [
+        ("renpy_tag", r"(\{[^{}]*\})+|(\[[\w.]+\])+"),
+    ],
+}
+
+# Vị trí trong dữ liệu RPG Maker chứa tên file asset không có phần mở rộng ("Actor1", "!Door1", "$BigMonster",
+# "Theme6"): dịch các giá trị này làm hỏng tham chiếu tới ảnh/âm thanh nên chúng được bỏ qua theo key.
+RPGMAKER_ASSET_KEYS = {"faceName", "characterName", "battlerName", "battleback1Name", "battleback2Name", "parallaxName",
+                       "title1Name", "title2Name", "animation1Name", "animation2Name", "effectName"}
+# List dưới các key này chỉ gồm tên asset
+RPGMAKER_ASSET_LIST_KEYS = {"tilesetNames"}
+# Dict âm thanh {"name", "volume", "pitch", "pan"}: "name" là tên file
+RPGMAKER_AUDIO_KEYS = ("volume", "pitch")
+# Vị trí tham số chứa tên asset theo mã lệnh: Show Text (mặt nhân vật), Show Picture, Play Movie, Change Battle Back,
+# Change Parallax, Change Actor Images, Change Vehicle Image và lệnh Change Image (41) của move route
+RPGMAKER_ASSET_PARAMS = {41: (0,), 101: (0,), 231: (1,), 261: (0,), 283: (0, 1), 284: (0,), 322: (1, 3, 5), 323: (1,)}
+
+# Ký tự đặc trưng của mã nguồn dùng cho heuristic mật độ ký hiệu.
+CODE_CHARS = set("{}()[];=<>&|$\\")
+
+# Mã điều khiển của engine trong văn bản (RPG Maker: \C[2], \I[64], \n<Tên>, \.; Ren'Py: {b}, {color=#f00}),
+# được bỏ đi trước khi tính mật độ ký hiệu để tên/thoại có mã màu, icon không bị coi là mã nguồn
+CONTROL_CODE_RE = re.compile(r"\\[nN]<[^<>]*>|\\[A-Za-z]+(\[[^\]]*\]|<[^<>]*>)?|\\[.|!><^{}$]|\{[^{}]*\}")
+
+# Kana, Hán, Hangul: văn bản các ngôn ngữ này không tách từ bằng khoảng trắng nên không áp dụng heuristic mật độ ký hiệu
+CJK_RE = re.compile(r"[\u3040-\u30ff\u31f0-\u31ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]")
+
+
+class SkipClassifier:
+    """
+    Phân loại nhanh các chuỗi không cần dịch (đường dẫn, định danh, số, mã nguồn...)
+    bằng tập regex biên dịch sẵn cộng heuristic về lớp ký tự. Với chuỗi trong JSON, classify_field
+    còn bỏ qua theo vị trí (key) các trường chứa tên asset của engine.
+    """
+
+    def __init__(self, engine_type=None, extra_rules=None):
+        self.rules = []
+        for name, pattern in DEFAULT_RULES + ENGINE_RULES.get(engine_type, []) + list(extra_rules or []):
+            self.register_rule(name, pattern)
+        self.stats = Counter()
+        self.asset_fields = engine_type == "RPGMakerMV"
+        # id(list) -> vị trí chứa tên asset (None = mọi phần tử) của tài liệu JSON hiện tại, xem begin_document
+        self.asset_slots = {}
+
+    def register_rule(self, name, pattern):
+        self.rules.append((name, re.compile(pattern, re.DOTALL)))
+
+    def classify(self, text, record=True):
+        """Trả về tên lý do bỏ qua, hoặc None nếu chuỗi cần được dịch."""
+        reason = self._classify(text)
+        if reason and reason != "empty" and record:
+            self.stats[reason] += 1
+        return reason
+
+    def _classify(self, text):
+        if not text or text.isspace():
+            return "empty"
+        stripped = text.strip()
+        if not any(ch.isalpha() for ch in stripped):
+            return "no_letters"
+        for name, regex in self.rules:
+            if regex.fullmatch(stripped):
+                return name
+        plain = CONTROL_CODE_RE.sub("", stripped)
+        if plain != stripped and not any(ch.isalpha() for ch in plain):
+            return "control_code"
+        if len(plain) >= 8 and " " not in plain.strip(";") and not CJK_RE.search(plain):
+            # Chuỗi dài không có khoảng trắng, nhiều ký hiệu lập trình: gần như chắc chắn là mã
+            code_chars = sum(1 for ch in plain if ch in CODE_CHARS)
+            if code_chars / len(plain) > 0.15:
+                return "code"
+        return None
+
+    def is_translatable(self, text, record=True):
+        return self.classify(text, record=record) is None
+
+    def begin_document(self, data):
+        """
+        Ghi nhận các list của tài liệu JSON có vị trí chứa tên asset (tham số lệnh sự kiện, tilesetNames).
+        Gọi trước classify_field cho các chuỗi của tài liệu đó.
+        """
+        self.asset_slots = {}
+        if not self.asset_fields:
+            return
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                parameters = node.get("parameters")
+                if isinstance(parameters, list) and node.get("code") in RPGMAKER_ASSET_PARAMS:
+                    self.asset_slots[id(parameters)] = RPGMAKER_ASSET_PARAMS[node["code"]]
+                for key, value in node.items():
+                    if isinstance(value, (dict, list)):
+                        if key in RPGMAKER_ASSET_LIST_KEYS and isinstance(value, list):
+                            self.asset_slots[id(value)] = None
+                        stack.append(value)
+            elif isinstance(node, list):
+                stack.extend(value for value in node if isinstance(value, (dict, list)))
+
+    def _field_reason(self, container, key):
+        if not self.asset_fields:
+            return None
+        if isinstance(container, dict):
+            if key in RPGMAKER_ASSET_KEYS or (key == "name" and all(k in container for k in RPGMAKER_AUDIO_KEYS)):
+                return "asset_name"
+        elif id(container) in self.asset_slots:
+            positions = self.asset_slots[id(container)]
+            if positions is None or key in positions:
+                return "asset_name"
+        return None
+
+    def classify_field(self, container, key, value, record=True):
+        """Như classify cho chuỗi container[key] của tài liệu JSON, xét thêm vị trí của chuỗi."""
+        reason = self._classify(value)
+        if reason is None:
+            reason = self._field_reason(container, key)
+        if reason and reason != "empty" and record:
+            self.stats[reason] += 1
+        return reason
+
+    def is_translatable_field(self, container, key, value, record=True):
+        return self.classify_field(container, key, value, record=record) is None
+
+    def reset_stats(self):
+        self.stats.clear()
+
+    def summary(self):
+        return ", ".join(f"{name}={count}" for name, count in self.stats.most_common())
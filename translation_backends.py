@@ -0,0 +1,221 @@
+import re
+import time
+from pathlib import Path
+
+
+class TranslationBackend:
+    """
+    Giao diện backend dịch theo batch, AutoTranslator chỉ làm việc qua ba thao tác:
+    encode_batch (chuỗi -> token id), translate_batch (token id nguồn -> token id đích)
+    và decode_batch (token id -> chuỗi).
+    """
+
+    name = "base"
+    # False: kết quả không phải bản dịch thật (backend giả lập), không được lưu vào hay đọc từ bộ nhớ dịch dùng chung
+    real_translations = True
+    # Các tầng model có thể nhận batch: "small" (model nhỏ cho chuỗi ngắn) và/hoặc "large"
+    tiers = ("large",)
+
+    def load(self, log):
+        """Tải tài nguyên của backend (model, tokenizer...). log(message, level) dùng để ghi log."""
+
+    def is_loaded(self):
+        return True
+
+    def encode_batch(self, texts, num_threads=1):
+        raise NotImplementedError
+
+    def translate_batch(self, source_ids, source_lang, target_lang, max_length=512, num_beams=1, tier="large", **options):
+        """
+        Dịch một batch chuỗi token id (cùng ngôn ngữ nguồn), trả về danh sách token id đích.
+        tier: tầng model xử lý batch, phải thuộc self.tiers.
+        """
+        raise NotImplementedError
+
+    def decode_batch(self, ids_batch, num_threads=1):
+        raise NotImplementedError
+
+
+class NllbCt2Backend(TranslationBackend):
+    """
+    Backend mặc định: model NLLB đã convert sang CTranslate2 cùng tokenizer SentencePiece.
+    Có thể tải thêm một model nhỏ (vd: NLLB 600M distilled) dùng chung vocab SentencePiece
+    để dịch các chuỗi ngắn (tầng "small").
+    """
+
+    name = "nllb"
+
+    SP_MODEL_NAMES = ["sentencepiece.bpe.model", "nllb_3_3B_tokenizer.model", "tokenizer.model", "spm.model"]
+
+    def __init__(self, models_path, small_models_path=None):
+        self.models_path = Path(models_path)
+        self.small_models_path = Path(small_models_path) if small_models_path else None
+        self.translator = None
+        self.small_translator = None
+        self.sp_model = None
+        self.vocab_pieces = []
+        self.piece_to_id = {}
+        self.lang_tokens = {}
+
+    def load(self, log):
+        log(f"Đang tải model từ: {self.models_path}")
+        # Import trì hoãn các thư viện native nặng tới khi thực sự tải model
+        import_start = time.perf_counter()
+        import ctranslate2 as ct2
+        import sentencepiece as spm
+        log(f"Đã import ctranslate2/sentencepiece trong {time.perf_counter() - import_start:.2f}s")
+
+        has_cuda = False
+        try:
+            if hasattr(ct2, 'cuda') and ct2.cuda.is_cuda_available():
+                has_cuda = True
+        except Exception as e:
+            log(f"Cảnh báo: Không thể kiểm tra CUDA qua ctranslate2.cuda.is_cuda_available(): {e}. Sẽ sử dụng CPU.", level="warning")
+            has_cuda = False
+
+        device = "cuda" if has_cuda else "cpu"
+        log(f"Sử dụng thiết bị: {device}")
+
+        self.translator = self._load_translator(ct2, self.models_path, device, log)
+        if self.small_models_path:
+            # Model nhỏ là tùy chọn: lỗi khi tải chỉ làm mất tầng "small", mọi chuỗi vẫn đi qua model lớn
+            try:
+                self.small_translator = self._load_translator(ct2, self.small_models_path, device, log)
+            except Exception as e:
+                self.small_translator = None
+                log(f"Không thể tải model nhỏ từ {self.small_models_path}: {e}. Mọi chuỗi sẽ được dịch bằng model chính.", level="warning")
+
+        sp_model_candidates = [self.models_path / name for name in self.SP_MODEL_NAMES]
+        sp_model_path = next((candidate for candidate in sp_model_candidates if candidate.exists()), None)
+        if not sp_model_path:
+            raise FileNotFoundError(f"SentencePiece model không tìm thấy trong thư mục: {self.models_path}. Đã thử các tên: {self.SP_MODEL_NAMES}")
+        log(f"Đã tìm thấy SentencePiece model tại: {sp_model_path}")
+
+        self.sp_model = spm.SentencePieceProcessor(model_file=str(sp_model_path))
+        self._build_vocab_mapping()
+
+    def _load_translator(self, ct2, models_path, device, log):
+        load_start = time.perf_counter()
+        translator = ct2.Translator(str(models_path), device=device)
+        log(f"Đã tải model CTranslate2 {models_path.name} trong {time.perf_counter() - load_start:.2f}s")
+        return translator
+
+    def _build_vocab_mapping(self):
+        """
+        Tính một lần bảng ánh xạ id <-> token của SentencePiece. Các token truyền cho CTranslate2
+        được lấy trực tiếp từ bảng này (dùng lại cùng đối tượng chuỗi) thay vì tạo chuỗi mới mỗi lần.
+        """
+        self.vocab_pieces = [self.sp_model.id_to_piece(i) for i in range(self.sp_model.get_piece_size())]
+        self.piece_to_id = {piece: i for i, piece in enumerate(self.vocab_pieces)}
+        self.lang_tokens = {}
+
+    def is_loaded(self):
+        return self.translator is not None and self.sp_model is not None
+
+    @property
+    def tiers(self):
+        return ("small", "large") if self.small_translator is not None else ("large",)
+
+    def _lang_token(self, lang_code):
+        token = self.lang_tokens.get(lang_code)
+        if token is None:
+            token = self.lang_tokens[lang_code] = f"__{lang_code}__"
+        return token
+
+    def _source_tokens(self, lang_code, token_ids):
+        vocab = self.vocab_pieces
+        return [self._lang_token(lang_code)] + [vocab[i] for i in token_ids] + ["</s>"]
+
+    def _hypothesis_ids(self, tokens):
+        """Chuyển token đầu ra về id, bỏ qua tag ngôn ngữ và token đặc biệt không thuộc SentencePiece."""
+        piece_to_id = self.piece_to_id
+        return [piece_to_id[token] for token in tokens if token in piece_to_id and token != "</s>"]
+
+    def encode_batch(self, texts, num_threads=1):
+        return self.sp_model.encode(texts, out_type=int, num_threads=num_threads)
+
+    def translate_batch(self, source_ids, source_lang, target_lang, max_length=512, num_beams=1, tier="large", **options):
+        translator = self.small_translator if tier == "small" and self.small_translator is not None else self.translator
+        tokens_batch = [self._source_tokens(source_lang, ids) for ids in source_ids]
+        target_prefix = [self._lang_token(target_lang)]
+        results = translator.translate_batch(
+            tokens_batch,
+            target_prefix=[target_prefix] * len(tokens_batch),
+            max_length=max_length,
+            num_beams=num_beams,
+            **options
+        )
+        return [self._hypothesis_ids(res.hypotheses[0]) for res in results]
+
+    def decode_batch(self, ids_batch, num_threads=1):
+        return self.sp_model.decode(ids_batch, num_threads=num_threads)
+
+
+class EchoBackend(TranslationBackend):
+    """
+    Backend giả lập gần như không tốn chi phí: tokenizer cấp byte UTF-8 và "dịch" bằng cách
+    trả lại nguyên chuỗi nguồn. Dùng để đo và tối ưu phần I/O, parse, lọc của pipeline.
+    """
+
+    name = "echo"
+    real_translations = False
+
+    OFFSET = 3  # <unk>, <s>, </s>
+
+    def encode_batch(self, texts, num_threads=1):
+        offset = self.OFFSET
+        return [[b + offset for b in text.encode("utf-8")] for text in texts]
+
+    def translate_batch(self, source_ids, source_lang, target_lang, max_length=512, num_beams=1, tier="large", **options):
+        return [list(ids[:max_length]) for ids in source_ids]
+
+    def decode_batch(self, ids_batch, num_threads=1):
+        offset = self.OFFSET
+        return [bytes(i - offset for i in ids if i >= offset).decode("utf-8", errors="ignore") for ids in ids_batch]
+
+
+class PseudoTranslationBackend(EchoBackend):
+    """
+    Backend "dịch giả" (pseudo-localization) có tính tất định: thay chữ Latin bằng chữ có dấu,
+    kéo dài chuỗi khoảng 30% và bọc trong ⟦ ⟧. Mã điều khiển, placeholder và biến được giữ nguyên,
+    giúp kiểm tra nhanh chuỗi nào chưa được dịch, bị cắt hoặc hỏng placeholder sau khi repack.
+    """
+
+    name = "pseudo"
+
+    ACCENTS = str.maketrans(
+        "AaCcEeIiNnOoUuYy",
+        "ÅåÇçÉéÎîÑñÖöÛûÝý",
+    )
+    PROTECTED_RE = re.compile(r"(\\[A-Za-z]+(?:\[[^\]]*\])?|\\[.|!><^{}$]|%\d+|\{[^{}]*\}|\[[^\[\]]*\]|<[^<>]*>)")
+    EXPANSION = 0.3
+    # Chuỗi đệm không lặp n-gram ngắn để không bị output_guard coi là đầu ra lặp vô hạn
+    PADDING = " ŀōřęm ïpšūm ďōłōř šīţ ąmęţ, ćōńšęćţęţūř ąďïpïšćïńğ ęłïţ"
+
+    def pseudo_translate(self, text):
+        parts = self.PROTECTED_RE.split(text)
+        # Phần tử lẻ của split là các đoạn cần giữ nguyên
+        body = "".join(part if i % 2 else part.translate(self.ACCENTS) for i, part in enumerate(parts))
+        padding_length = int(len(text) * self.EXPANSION)
+        padding = (self.PADDING * (padding_length // len(self.PADDING) + 1))[:padding_length]
+        return f"⟦{body}{padding}⟧"
+
+    def translate_batch(self, source_ids, source_lang, target_lang, max_length=512, num_beams=1, tier="large", **options):
+        texts = self.decode_batch(source_ids)
+        return [ids[:max_length] for ids in self.encode_batch([self.pseudo_translate(text) for text in texts])]
+
+
+BACKENDS = {
+    NllbCt2Backend.name: NllbCt2Backend,
+    EchoBackend.name: EchoBackend,
+    PseudoTranslationBackend.name: PseudoTranslationBackend,
+}
+
+
+def create_backend(name, models_path, small_models_path=None):
+    """Tạo backend theo tên ('nllb', 'echo', 'pseudo'). small_models_path chỉ dùng cho 'nllb'."""
+    if name not in BACKENDS:
+        raise ValueError(f"Backend dịch không hợp lệ: {name}. Các backend hỗ trợ: {', '.join(BACKENDS)}")
+    if name == NllbCt2Backend.name:
+        return NllbCt2Backend(models_path, small_models_path=small_models_path)
+    return BACKENDS[name]()
@@ -0,0 +1,215 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+# Số, biến và mã điều khiển được che khi so khớp theo mẫu: "Nhận 50 G" và "Nhận 120 G" dùng chung một bản dịch.
+PLACEHOLDER_RE = re.compile(r"\\[A-Za-z]+\[\d+\]|%\d+|\d+(?:[.,]\d+)*")
+MARKER_RE = re.compile("\x1f(\\d+)\x1f")
+WHITESPACE_RE = re.compile(r"\s+")
+
+# MinHash một hoán vị (one-permutation hashing) trên trigram ký tự (dùng được cho cả tiếng Nhật/Trung
+# không có khoảng trắng): mỗi trigram chỉ băm một lần, giá trị băm chia vào NUM_PERM ngăn, lấy min từng ngăn.
+SHINGLE_SIZE = 3
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+# Chỉ so Jaccard thật với vài ứng viên trùng nhiều band nhất; mỗi bucket chỉ đọc tối đa BUCKET_LIMIT mục
+# để các trigram phổ biến (bucket rất lớn) không làm chậm tra cứu
+MAX_CANDIDATES = 8
+BUCKET_LIMIT = 32
+_CANDIDATES_SQL = (
+    "SELECT entry_id FROM ("
+    + " UNION ALL ".join(f"SELECT * FROM (SELECT entry_id FROM lsh WHERE band_key = ? LIMIT {BUCKET_LIMIT})" for _ in range(BANDS))
+    + f") GROUP BY entry_id ORDER BY COUNT(*) DESC LIMIT {MAX_CANDIDATES}"
+)
+_EMPTY_BIN = 1 << 32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    source_lang TEXT NOT NULL,
+    target_lang TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    template TEXT,
+    target TEXT NOT NULL,
+    updated REAL NOT NULL,
+    UNIQUE (source_lang, target_lang, source_key)
+);
+CREATE INDEX IF NOT EXISTS entries_template ON entries (source_lang, target_lang, template) WHERE template IS NOT NULL;
+CREATE TABLE IF NOT EXISTS lsh (
+    band_key INTEGER NOT NULL,
+    entry_id INTEGER NOT NULL,
+    PRIMARY KEY (band_key, entry_id)
+) WITHOUT ROWID;
+"""
+
+
+def normalize(text):
+    return WHITESPACE_RE.sub(" ", text.strip())
+
+
+def make_template(text):
+    """Che số/biến trong chuỗi, trả về (mẫu, danh sách giá trị đã che theo thứ tự)."""
+    values = []
+
+    def _mask(match):
+        values.append(match.group(0))
+        return f"\x1f{len(values) - 1}\x1f"
+
+    return PLACEHOLDER_RE.sub(_mask, text), values
+
+
+def target_template(target, values):
+    """
+    Thay các giá trị của chuỗi nguồn xuất hiện trong bản dịch bằng chỉ số tương ứng.
+    Trả về None nếu bản dịch có số/biến không có trong nguồn (không thể dùng làm mẫu).
+    """
+    unused = list(enumerate(values))
+    failed = False
+
+    def _mask(match):
+        nonlocal failed
+        for position, (index, value) in enumerate(unused):
+            if value == match.group(0):
+                del unused[position]
+                return f"\x1f{index}\x1f"
+        failed = True
+        return match.group(0)
+
+    template = PLACEHOLDER_RE.sub(_mask, target)
+    return None if failed or unused else template
+
+
+def fill_template(template, values):
+    return MARKER_RE.sub(lambda match: values[int(match.group(1))], template)
+
+
+@lru_cache(maxsize=65536)
+def shingles(text):
+    padded = f" {text.lower()} "
+    return frozenset(padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1)))
+
+
+@lru_cache(maxsize=65536)
+def _signature(text):
+    signature = [_EMPTY_BIN] * NUM_PERM
+    for shingle in shingles(text):
+        value = zlib.crc32(shingle.encode("utf-8"))
+        bin_index = value % NUM_PERM
+        if value < signature[bin_index]:
+            signature[bin_index] = value
+    return tuple(signature)
+
+
+def band_keys(text, source_lang, target_lang):
+    signature = _signature(text)
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(f"{source_lang}|{target_lang}|{band}|{signature[band * ROWS:(band + 1) * ROWS]}".encode("utf-8"), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, "big", signed=True))
+    return keys
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class TranslationMemory:
+    """
+    Bộ nhớ dịch lưu bằng SQLite, dùng chung giữa các game (và các lần chạy).
+    Tra cứu theo thứ tự: khớp chính xác (sau khi chuẩn hóa khoảng trắng), khớp theo mẫu (số/biến được che),
+    rồi khớp gần đúng qua chỉ mục MinHash-LSH với độ tương đồng Jaccard >= fuzzy_threshold.
+    Khớp gần đúng chỉ là gợi ý: hai câu gần giống có thể ngược nghĩa ("I was happy." / "I was not happy."),
+    nên người gọi không được dùng lại nguyên văn bản dịch của nó.
+    """
+
+    def __init__(self, path, fuzzy_threshold=0.95):
+        self.path = Path(path)
+        self.fuzzy_threshold = fuzzy_threshold
+        self.stats = Counter()
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def lookup(self, text, source_lang, target_lang):
+        """Trả về (bản dịch, loại khớp, độ tương đồng, chuỗi nguồn đã lưu) hoặc None."""
+        key = normalize(text)
+        if not key:
+            return None
+        with self.lock:
+            match = self._lookup(key, source_lang, target_lang)
+        self.stats[match[1] if match else "miss"] += 1
+        return match
+
+    def _lookup(self, key, source_lang, target_lang):
+        row = self.conn.execute(
+            "SELECT target, id FROM entries WHERE source_lang = ? AND target_lang = ? AND source_key = ?",
+            (source_lang, target_lang, key)).fetchone()
+        if row:
+            return row[0], "exact", 1.0, key
+
+        template, values = make_template(key)
+        if values:
+            row = self.conn.execute(
+                "SELECT target, source_key FROM entries WHERE source_lang = ? AND target_lang = ? AND template = ? LIMIT 1",
+                (source_lang, target_lang, template)).fetchone()
+            if row:
+                stored_target_template = target_template(row[0], make_template(row[1])[1])
+                if stored_target_template is not None:
+                    return fill_template(stored_target_template, values), "template", 1.0, row[1]
+
+        if self.fuzzy_threshold >= 1.0:
+            return None
+        candidate_ids = [row[0] for row in self.conn.execute(_CANDIDATES_SQL, band_keys(key, source_lang, target_lang))]
+        if not candidate_ids:
+            return None
+        key_shingles = shingles(key)
+        best = None
+        for source_key, target in self.conn.execute(
+                f"SELECT source_key, target FROM entries WHERE id IN ({','.join('?' * len(candidate_ids))})", candidate_ids):
+            score = jaccard(key_shingles, shingles(source_key))
+            if score >= self.fuzzy_threshold and (best is None or score > best[2]):
+                best = (target, "fuzzy", round(score, 4), source_key)
+        return best
+
+    def add_many(self, items):
+        """Lưu các cặp (source_lang, target_lang, nguồn, bản dịch) trong một transaction."""
+        now = time.time()
+        with self.lock, self.conn:
+            for source_lang, target_lang, source, target in items:
+                key = normalize(source)
+                if not key or not target:
+                    continue
+                template, values = make_template(key)
+                cursor = self.conn.execute(
+                    "INSERT INTO entries (source_lang, target_lang, source_key, template, target, updated) VALUES (?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (source_lang, target_lang, source_key) DO NOTHING",
+                    (source_lang, target_lang, key, template if values else None, target, now))
+                if cursor.rowcount:
+                    self.conn.executemany("INSERT OR IGNORE INTO lsh (band_key, entry_id) VALUES (?, ?)",
+                                          [(band_key, cursor.lastrowid) for band_key in band_keys(key, source_lang, target_lang)])
+                else:
+                    # Chuỗi đã có: chỉ cập nhật bản dịch mới nhất, chỉ mục LSH giữ nguyên vì nguồn không đổi
+                    self.conn.execute(
+                        "UPDATE entries SET target = ?, updated = ? WHERE source_lang = ? AND target_lang = ? AND source_key = ?",
+                        (target, now, source_lang, target_lang, key))
+
+    def summary(self):
+        return ", ".join(f"{kind}={count}" for kind, count in self.stats.most_common())
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
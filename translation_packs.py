@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+from types import MappingProxyType
+
+PACKS_DIR = Path(__file__).resolve().parent / "packs"
+PACK_FORMAT = 1
+
+
+class TranslationPacks:
+    """
+    Gói bản dịch dựng sẵn cho các chuỗi mặc định của engine (thuật ngữ System.json, thông báo mặc định
+    của RPG Maker, màn hình mặc định của Ren'Py...). Mỗi gói là một file JSON trong thư mục packs/:
+        {"format": 1, "name": ..., "version": ..., "engines": [...], "source_lang": "eng_Latn",
+         "target_lang": "vie_Latn", "entries": {"chuỗi gốc": "bản dịch", ...}}
+    Các gói được gộp thành một bảng tra cứu chỉ đọc theo (engine, ngôn ngữ nguồn, ngôn ngữ đích).
+    """
+
+    def __init__(self, packs_dir=PACKS_DIR):
+        self.packs_dir = Path(packs_dir)
+        self.packs = []
+        self.index = {}
+
+    def load(self, log):
+        index = {}
+        packs = []
+        for pack_file in sorted(self.packs_dir.glob("*.json")):
+            try:
+                with open(pack_file, 'r', encoding='utf-8') as f:
+                    pack = json.load(f)
+                if pack.get("format") != PACK_FORMAT:
+                    log(f"Bỏ qua gói bản dịch {pack_file.name}: định dạng {pack.get('format')} không được hỗ trợ.", level="warning")
+                    continue
+                for engine in pack["engines"]:
+                    table = index.setdefault((engine, pack["source_lang"], pack["target_lang"]), {})
+                    table.update((source.strip(), target.strip()) for source, target in pack["entries"].items())
+                packs.append({"name": pack["name"], "version": pack["version"], "file": pack_file.name, "entries": len(pack["entries"])})
+            except (OSError, ValueError, KeyError, AttributeError) as e:
+                log(f"Lỗi khi đọc gói bản dịch {pack_file}: {e}", level="warning")
+        self.index = {key: MappingProxyType(table) for key, table in index.items()}
+        self.packs = packs
+        if packs:
+            log(f"Đã tải {len(packs)} gói bản dịch dựng sẵn: " + ", ".join(f"{pack['name']} v{pack['version']}" for pack in packs))
+
+    def lookup(self, text, engine, source_lang, target_lang):
+        """Trả về bản dịch dựng sẵn (giữ nguyên khoảng trắng đầu/cuối của chuỗi gốc) hoặc None."""
+        table = self.index.get((engine, source_lang, target_lang))
+        if not table:
+            return None
+        stripped = text.strip()
+        translated = table.get(stripped)
+        if translated is None:
+            return None
+        start = text.find(stripped)
+        return text[:start] + translated + text[start + len(stripped):]
@@ -0,0 +1,550 @@
+"""
+Đọc/ghi văn bản trong file asset Unity dạng SerializedFile chưa nén (*.assets, level*, sharedassets*...).
+File được mở bằng mmap: chỉ phần metadata (bảng kiểu + bảng object) và dữ liệu của các object chứa văn bản được đọc,
+phần còn lại của file (texture, âm thanh...) không bị chạm tới.
+- TextAsset: nội dung m_Script. Văn bản thường được chia theo dòng; JSON được giữ nguyên cấu trúc để dịch các giá trị
+  chuỗi như file JSON rời; dữ liệu có cấu trúc khác (XML, bảng CSV/TSV, script) bị bỏ qua vì dịch theo dòng sẽ làm hỏng.
+- MonoBehaviour: chỉ các ô văn bản của bảng bản địa hóa có bố cục đã biết (I2 Localization, Unity Localization), khi
+  file có type tree (Unity lưu kèm khi build với type tree; bản build player thường bỏ type tree, khi đó không thể biết
+  cấu trúc của MonoBehaviour). Các trường chuỗi khác (tên state, scene, tag...) là dữ liệu của game, không được dịch.
+Khi ghi lại, dữ liệu mới của object được ghi nối vào cuối file và chỉ vị trí/kích thước của object trong bảng object
+(cùng kích thước file trong header) được sửa; các object khác giữ nguyên vị trí, không phải ghi lại cả file nhiều GB.
+AssetBundle nén (UnityFS, data.unity3d) chưa được hỗ trợ.
+"""
+import json
+import mmap
+import re
+import struct
+
+TEXT_ASSET = 49
+MONO_BEHAVIOUR = 114
+
+# File văn bản trích từ một asset: <đường dẫn asset trong game>.unity_text.json
+UNITY_TEXT_SUFFIX = ".unity_text.json"
+
+MIN_VERSION = 9
+MAX_VERSION = 30
+ALIGN_FLAG = 0x4000
+OBJECT_ALIGNMENT = 16
+
+# Trường chứa bản dịch trong các bảng bản địa hóa (đường dẫn trường trong MonoBehaviour):
+# I2 Localization (LanguageSourceAsset: mSource.mTerms[i].Languages[j]), Unity Localization (StringTable).
+LOCALIZATION_FIELD_RES = (
+    re.compile(r"(?:^|\.)mTerms\[\d+\]\.Languages\[\d+\]$"),
+    re.compile(r"(?:^|\.)m_TableData\[\d+\]\.m_Localized$"),
+)
+
+# Nhận diện nội dung TextAsset (xem text_asset_format)
+CODE_LINE_RE = re.compile(
+    r"^\s*(?:(?:local|function|var|let|const|def|class|import|using|public|private|#include|#define)\s|end\s*$|//|--|/\*)"
+    r"|[;{}]\s*$"
+    r"|^\s*[A-Za-z_][\w.\[\]]*\s*[-+*/]?=\s*\S")
+TABLE_DELIMITERS = ("\t", "|", ",", ";")
+NUMBER_FIELD_RE = re.compile(r"^\s*-?\d+(?:\.\d+)?\s*$")
+
+SERIALIZED_FILE_RE = re.compile(r"(.*\.assets|level\d+|globalgamemanagers)$", re.IGNORECASE)
+
+# Bảng chuỗi dùng chung của type tree (offset có bit cao = vị trí trong bảng này), theo đúng thứ tự của Unity
+COMMON_STRINGS = [
+    "AABB", "AnimationClip", "AnimationCurve", "AnimationState", "Array", "Base", "BitField", "bitset", "bool", "char",
+    "ColorRGBA", "Component", "data", "deque", "double", "dynamic_array", "FastPropertyName", "first", "float", "Font",
+    "GameObject", "Generic Mono", "GradientNEW", "GUID", "GUIStyle", "int", "list", "long long", "map", "Matrix4x4f",
+    "MdFour", "MonoBehaviour", "MonoScript", "m_ByteSize", "m_Curve", "m_EditorClassIdentifier", "m_EditorHideFlags",
+    "m_Enabled", "m_ExtensionPtr", "m_GameObject", "m_Index", "m_IsArray", "m_IsStatic", "m_MetaFlag", "m_Name",
+    "m_ObjectHideFlags", "m_PrefabInternal", "m_PrefabParentObject", "m_Script", "m_StaticEditorFlags", "m_Type",
+    "m_Version", "Object", "pair", "PPtr<Component>", "PPtr<GameObject>", "PPtr<Material>", "PPtr<MonoBehaviour>",
+    "PPtr<MonoScript>", "PPtr<Object>", "PPtr<Prefab>", "PPtr<Sprite>", "PPtr<TextAsset>", "PPtr<Texture>",
+    "PPtr<Texture2D>", "PPtr<Transform>", "Prefab", "Quaternionf", "Rectf", "RectInt", "RectOffset", "second", "set",
+    "short", "size", "SInt16", "SInt32", "SInt64", "SInt8", "staticvector", "string", "TextAsset", "TextMesh", "Texture",
+    "Texture2D", "Transform", "TypelessData", "UInt16", "UInt32", "UInt64", "UInt8", "unsigned int",
+    "unsigned long long", "unsigned short", "vector", "Vector2f", "Vector3f", "Vector4f", "m_ScriptingClassIdentifier",
+    "Gradient", "Type*", "int2_storage", "int3_storage", "BoundsInt", "m_CorrespondingSourceObject",
+    "m_PrefabInstance", "m_PrefabAsset", "FileSize", "Hash128",
+]
+_COMMON_OFFSETS = {}
+_offset = 0
+for _name in COMMON_STRINGS:
+    _COMMON_OFFSETS[_offset] = _name
+    _offset += len(_name) + 1
+
+PRIMITIVE_SIZES = {
+    "bool": 1, "char": 1, "SInt8": 1, "UInt8": 1,
+    "SInt16": 2, "UInt16": 2, "short": 2, "unsigned short": 2,
+    "SInt32": 4, "UInt32": 4, "int": 4, "unsigned int": 4, "float": 4, "Type*": 4,
+    "SInt64": 8, "UInt64": 8, "long long": 8, "unsigned long long": 8, "double": 8, "FileSize": 8,
+}
+
+
+def _align(position, alignment=4):
+    return (position + alignment - 1) & ~(alignment - 1)
+
+
+class TypeNode:
+    __slots__ = ("type", "name", "byte_size", "meta_flag", "level", "children")
+
+    def __init__(self, type_name, name, byte_size, meta_flag, level):
+        self.type = type_name
+        self.name = name
+        self.byte_size = byte_size
+        self.meta_flag = meta_flag
+        self.level = level
+        self.children = []
+
+    @property
+    def aligned(self):
+        return bool(self.meta_flag & ALIGN_FLAG)
+
+
+class ObjectInfo:
+    __slots__ = ("path_id", "class_id", "type_index", "start", "size", "entry_offset")
+
+    def __init__(self, path_id, class_id, type_index, start, size, entry_offset):
+        self.path_id = path_id
+        self.class_id = class_id
+        self.type_index = type_index
+        self.start = start  # vị trí tuyệt đối trong file
+        self.size = size
+        self.entry_offset = entry_offset  # vị trí trường byte_start của object trong bảng object
+
+
+class _Reader:
+    """Đọc tuần tự trên mmap với thứ tự byte của file."""
+
+    def __init__(self, buffer, position=0, endian=">"):
+        self.buffer = buffer
+        self.position = position
+        self.endian = endian
+
+    def unpack(self, fmt):
+        fmt = self.endian + fmt
+        values = struct.unpack_from(fmt, self.buffer, self.position)
+        self.position += struct.calcsize(fmt)
+        return values if len(values) > 1 else values[0]
+
+    def read(self, size):
+        data = bytes(self.buffer[self.position:self.position + size])
+        self.position += size
+        return data
+
+    def cstring(self):
+        end = self.buffer.find(b"\x00", self.position)
+        text = bytes(self.buffer[self.position:end]).decode("utf-8", "replace")
+        self.position = end + 1
+        return text
+
+    def align(self):
+        self.position = _align(self.position)
+
+
+class SerializedFile:
+    """Header, bảng kiểu (kèm type tree nếu có) và bảng object của một SerializedFile, đọc qua mmap."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.file.close()
+            raise ValueError(f"{path} là file rỗng")
+        try:
+            self._parse()
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            self.close()
+            raise ValueError(f"{path} không phải SerializedFile hợp lệ: {e}")
+        except ValueError:
+            self.close()
+            raise
+
+    def _parse(self):
+        reader = _Reader(self.buffer)
+        metadata_size, file_size, version, data_offset = reader.unpack("IIII")
+        if not MIN_VERSION <= version <= MAX_VERSION:
+            raise ValueError(f"{self.path}: phiên bản SerializedFile {version} không được hỗ trợ")
+        endian_flag = reader.unpack("B")
+        reader.read(3)
+        if version >= 22:
+            metadata_size, file_size, data_offset = reader.unpack("IqQ")
+            reader.read(8)
+        if file_size != len(self.buffer) or data_offset > file_size or metadata_size > file_size:
+            raise ValueError(f"{self.path}: header không khớp với kích thước file")
+        self.version = version
+        self.data_offset = data_offset
+        reader.endian = "<" if endian_flag == 0 else ">"
+        self.endian = reader.endian
+
+        self.unity_version = reader.cstring()
+        reader.unpack("i")  # target platform
+        enable_type_tree = reader.unpack("?") if version >= 13 else True
+        self.types = [self._read_type(reader, enable_type_tree) for _ in range(reader.unpack("i"))]
+        big_id_enabled = reader.unpack("i") if 7 <= version < 14 else 0
+
+        self.objects = []
+        for _ in range(reader.unpack("i")):
+            if big_id_enabled:
+                path_id = reader.unpack("q")
+            elif version < 14:
+                path_id = reader.unpack("i")
+            else:
+                reader.align()
+                path_id = reader.unpack("q")
+            entry_offset = reader.position
+            start = reader.unpack("q" if version >= 22 else "I")
+            size = reader.unpack("I")
+            type_id = reader.unpack("i")
+            if version < 16:
+                class_id = reader.unpack("H")
+                type_index = next((i for i, t in enumerate(self.types) if t[0] == type_id), -1)
+            else:
+                type_index = type_id
+                class_id = self.types[type_id][0]
+            if version < 11:
+                reader.unpack("H")
+            if 11 <= version < 17:
+                reader.unpack("h")
+            if version in (15, 16):
+                reader.unpack("B")
+            self.objects.append(ObjectInfo(path_id, class_id, type_index, data_offset + start, size, entry_offset))
+
+    def _read_type(self, reader, enable_type_tree):
+        """(class id, gốc type tree hoặc None)."""
+        version = self.version
+        class_id = reader.unpack("i")
+        if version >= 16:
+            reader.unpack("?")  # stripped
+        if version >= 17:
+            reader.unpack("h")  # script type index
+        if version >= 13:
+            if (version < 16 and class_id < 0) or (version >= 16 and class_id == MONO_BEHAVIOUR):
+                reader.read(16)  # script id
+            reader.read(16)  # hash kiểu
+        root = None
+        if enable_type_tree:
+            root = self._read_type_tree_blob(reader) if version >= 12 or version == 10 else self._read_type_tree_legacy(reader, 0)
+            if version >= 21:
+                reader.read(4 * reader.unpack("i"))  # type dependencies
+        return class_id, root
+
+    def _read_type_tree_blob(self, reader):
+        node_count, string_size = reader.unpack("ii")
+        node_size = 32 if self.version >= 19 else 24
+        raw_nodes = [reader.read(node_size) for _ in range(node_count)]
+        strings = reader.read(string_size)
+
+        def _string(offset):
+            if offset & 0x80000000:
+                return _COMMON_OFFSETS.get(offset & 0x7FFFFFFF, "")
+            return strings[offset:strings.index(b"\x00", offset)].decode("utf-8", "replace")
+
+        nodes = []
+        for raw in raw_nodes:
+            _, level, _, type_offset, name_offset, byte_size, _, meta_flag = struct.unpack_from(self.endian + "HBBIIiii", raw)
+            nodes.append(TypeNode(_string(type_offset), _string(name_offset), byte_size, meta_flag, level))
+        return _link_nodes(nodes)
+
+    def _read_type_tree_legacy(self, reader, level):
+        # Định dạng type tree cũ (SerializedFile phiên bản 9, 11): đệ quy theo node
+        type_name = reader.cstring()
+        name = reader.cstring()
+        byte_size, _, _, _, meta_flag = reader.unpack("iiiii")
+        node = TypeNode(type_name, name, byte_size, meta_flag, level)
+        node.children = [self._read_type_tree_legacy(reader, level + 1) for _ in range(reader.unpack("i"))]
+        return node
+
+    def type_tree(self, obj):
+        if 0 <= obj.type_index < len(self.types):
+            return self.types[obj.type_index][1]
+        return None
+
+    def object_data(self, obj):
+        return bytes(self.buffer[obj.start:obj.start + obj.size])
+
+    def close(self):
+        if getattr(self, "buffer", None) is not None:
+            self.buffer.close()
+            self.buffer = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _link_nodes(nodes):
+    if not nodes:
+        return None
+    stack = [nodes[0]]
+    for node in nodes[1:]:
+        while stack[-1].level >= node.level:
+            stack.pop()
+        stack[-1].children.append(node)
+        stack.append(node)
+    return nodes[0]
+
+
+# --- Đọc chuỗi trong dữ liệu object ---
+
+def _fixed_size(node):
+    """Kích thước cố định của một node (không chứa mảng/chuỗi, không căn lề), hoặc None."""
+    if not node.children:
+        return PRIMITIVE_SIZES.get(node.type, node.byte_size if node.byte_size > 0 else None)
+    if node.aligned or node.type in ("string", "TypelessData") or node.children[0].type == "Array":
+        return None
+    total = 0
+    for child in node.children:
+        size = _fixed_size(child)
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+class _StringCollector:
+    """Duyệt dữ liệu object theo type tree, ghi lại vị trí của từng chuỗi: (đường dẫn trường, đầu, cuối gồm căn lề, văn bản)."""
+
+    def __init__(self, data, endian):
+        self.data = data
+        self.endian = endian
+        self.strings = []
+
+    def _int(self, position):
+        return struct.unpack_from(self.endian + "i", self.data, position)[0]
+
+    def read(self, node, position, path):
+        if node.type == "ManagedReferencesRegistry":
+            raise ValueError("không hỗ trợ SerializeReference")
+        if node.type == "string":
+            length = self._int(position)
+            end = position + 4 + length
+            text = self.data[position + 4:end]
+            aligned = node.aligned or (node.children and node.children[0].aligned)
+            if aligned:
+                end = _align(end)
+            self.strings.append((path, position, end, text, bool(aligned)))
+            position = end
+        elif not node.children:
+            size = _fixed_size(node)
+            if size is None:
+                raise ValueError(f"không rõ kích thước kiểu {node.type}")
+            position += size
+        elif node.type == "TypelessData":
+            position += 4 + self._int(position)
+        elif node.children[0].type == "Array":
+            array = node.children[0]
+            count = self._int(position)
+            position += 4
+            element = array.children[1]
+            size = _fixed_size(element)
+            if size is not None:
+                position += size * count
+            else:
+                for i in range(count):
+                    position = self.read(element, position, f"{path}[{i}]")
+            if array.aligned:
+                position = _align(position)
+        else:
+            for child in node.children:
+                position = self.read(child, position, f"{path}.{child.name}" if path else child.name)
+        if node.aligned:
+            position = _align(position)
+        if position > len(self.data):
+            raise ValueError("dữ liệu object ngắn hơn type tree")
+        return position
+
+
+def _object_strings(serialized, obj, data):
+    """Các chuỗi của object (theo type tree, hoặc theo bố cục cố định của TextAsset khi không có type tree)."""
+    root = serialized.type_tree(obj)
+    if root is None:
+        if obj.class_id != TEXT_ASSET:
+            return None
+        # TextAsset: m_Name rồi m_Script, đều là chuỗi căn lề 4 byte
+        strings = []
+        position = 0
+        for name in ("m_Name", "m_Script"):
+            length = struct.unpack_from(serialized.endian + "i", data, position)[0]
+            end = _align(position + 4 + length)
+            strings.append((name, position, end, data[position + 4:position + 4 + length], True))
+            position = end
+        if position > len(data):
+            raise ValueError("dữ liệu TextAsset không hợp lệ")
+        return strings
+    collector = _StringCollector(data, serialized.endian)
+    end = collector.read(root, 0, "")
+    if end != len(data):
+        raise ValueError(f"type tree đọc {end}/{len(data)} byte")
+    return collector.strings
+
+
+def _decode(raw):
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    return None if "\x00" in text else text
+
+
+def _looks_like_table(lines):
+    """
+    Bảng CSV/TSV: các dòng có cùng số dấu phân cách (với "," ";": ít nhất 3 cột và phần lớn dấu phân cách không có
+    khoảng trắng theo sau như dấu câu trong văn bản).
+    """
+    for delimiter in TABLE_DELIMITERS:
+        counts = [line.count(delimiter) for line in lines]
+        if min(counts) == 0:
+            continue
+        if delimiter in ",;" and sum(line.count(delimiter + " ") for line in lines) > 0.5 * sum(counts):
+            continue
+        common = max(set(counts), key=counts.count)
+        if counts.count(common) < 0.8 * len(lines):
+            continue
+        has_number = any(NUMBER_FIELD_RE.match(field) for line in lines for field in line.split(delimiter))
+        if delimiter in "\t|" or common >= 2 and (len(lines) > 1 or has_number):
+            return True
+    return False
+
+
+def text_asset_format(text):
+    """
+    Loại nội dung của TextAsset: "json", "markup" (XML/HTML), "table" (CSV/TSV), "code" (script Lua/JS/C#...),
+    "text" (văn bản thường, dịch theo dòng) hoặc None nếu rỗng.
+    """
+    stripped = text.lstrip("\ufeff").strip()
+    if not stripped:
+        return None
+    if stripped[0] in "{[":
+        try:
+            json.loads(stripped)
+            return "json"
+        except ValueError:
+            pass
+    if stripped[0] == "<":
+        return "markup"
+    lines = [line for line in stripped.splitlines() if line.strip()]
+    if _looks_like_table(lines):
+        return "table"
+    code_lines = sum(1 for line in lines if CODE_LINE_RE.search(line) or line.lstrip()[:1] in "{}[]<")
+    if code_lines >= 0.5 * len(lines):
+        return "code"
+    return "text"
+
+
+def is_localization_field(field):
+    return any(pattern.search(field) for pattern in LOCALIZATION_FIELD_RES)
+
+
+def extract_texts(path, log=None, skipped=None):
+    """
+    Văn bản cần dịch trong một SerializedFile, dạng dict để ghi ra JSON:
+        "<path id>:TextAsset:<tên>": [các dòng của m_Script]          (văn bản thường)
+        "<path id>:TextAssetJson:<tên>": <nội dung JSON của m_Script>  (chuỗi trong đó được dịch như file JSON rời)
+        "<path id>:MonoBehaviour:<tên>": {"đường dẫn trường": chuỗi, ...}  (chỉ ô văn bản của bảng bản địa hóa)
+    Object không đọc được (thiếu type tree, dữ liệu nhị phân...) bị bỏ qua. skipped (Counter, tùy chọn) đếm số
+    TextAsset bị bỏ qua theo loại nội dung.
+    """
+    result = {}
+    with SerializedFile(path) as serialized:
+        for obj in serialized.objects:
+            if obj.class_id not in (TEXT_ASSET, MONO_BEHAVIOUR):
+                continue
+            data = serialized.object_data(obj)
+            try:
+                strings = _object_strings(serialized, obj, data)
+            except (ValueError, struct.error, IndexError) as e:
+                if log:
+                    log(f"Bỏ qua object {obj.path_id} trong {path}: {e}", level="warning")
+                continue
+            if not strings:
+                continue
+            fields = {field: _decode(raw) for field, _, _, raw, aligned in strings if aligned}
+            name = fields.get("m_Name") or ""
+            if obj.class_id == TEXT_ASSET:
+                script = fields.get("m_Script")
+                kind = text_asset_format(script) if script else None
+                if kind == "text":
+                    result[f"{obj.path_id}:TextAsset:{name}"] = [line.rstrip("\r") for line in script.lstrip("\ufeff").split("\n")]
+                elif kind == "json":
+                    result[f"{obj.path_id}:TextAssetJson:{name}"] = json.loads(script.lstrip("\ufeff"))
+                elif kind is not None and skipped is not None:
+                    skipped[kind] += 1
+            else:
+                texts = {field: text for field, text in fields.items() if text and text.strip() and is_localization_field(field)}
+                if texts:
+                    result[f"{obj.path_id}:MonoBehaviour:{name}"] = texts
+    return result
+
+
+def _encode_string(text, endian):
+    raw = text.encode("utf-8")
+    block = struct.pack(endian + "i", len(raw)) + raw
+    return block + b"\x00" * (_align(len(block)) - len(block))
+
+
+def apply_texts(path, texts):
+    """
+    Ghi bản dịch (cùng cấu trúc với extract_texts) vào SerializedFile. Object đã đổi được ghi nối vào cuối file,
+    chỉ bảng object và header được sửa tại chỗ. Trả về số object đã ghi lại.
+    """
+    updates = []
+    with SerializedFile(path) as serialized:
+        objects = {obj.path_id: obj for obj in serialized.objects}
+        for key, value in texts.items():
+            path_id, kind, _ = key.split(":", 2)
+            obj = objects.get(int(path_id))
+            if obj is None or obj.class_id != (MONO_BEHAVIOUR if kind == "MonoBehaviour" else TEXT_ASSET):
+                continue
+            data = serialized.object_data(obj)
+            strings = _object_strings(serialized, obj, data)
+            if kind in ("TextAsset", "TextAssetJson"):
+                original = {field: raw for field, _, _, raw, _ in strings}["m_Script"].decode("utf-8")
+                newline = "\r\n" if "\r\n" in original else "\n"
+                if kind == "TextAssetJson":
+                    # Giữ kiểu định dạng của file gốc: nhiều dòng thì thụt lề, một dòng thì viết liền
+                    indent = 2 if "\n" in original.strip() else None
+                    value = json.dumps(value, ensure_ascii=False, indent=indent).split("\n")
+                replacement = {"m_Script": ("\ufeff" if original.startswith("\ufeff") else "") + newline.join(value)}
+            else:
+                replacement = value
+            pieces = []
+            position = 0
+            for field, start, end, _, aligned in strings:
+                if aligned and field in replacement:
+                    pieces.append(data[position:start])
+                    pieces.append(_encode_string(replacement[field], serialized.endian))
+                    position = end
+            pieces.append(data[position:])
+            new_data = b"".join(pieces)
+            if new_data != data:
+                updates.append((obj, new_data))
+        version = serialized.version
+        data_offset = serialized.data_offset
+        endian = serialized.endian
+
+    if not updates:
+        return 0
+    with open(path, 'r+b') as f:
+        f.seek(0, 2)
+        for obj, new_data in updates:
+            start = _align(f.tell(), OBJECT_ALIGNMENT)
+            if version < 22 and start - data_offset + len(new_data) > 0xFFFFFFFF:
+                raise ValueError(f"{path}: file vượt quá 4 GB, không thể ghi thêm object với phiên bản {version}")
+            f.write(b"\x00" * (start - f.tell()))
+            f.write(new_data)
+            f.seek(obj.entry_offset)
+            f.write(struct.pack(endian + ("qI" if version >= 22 else "II"), start - data_offset, len(new_data)))
+            f.seek(0, 2)
+        file_size = f.tell()
+        # Header luôn là big-endian; từ phiên bản 22 kích thước file là số 64 bit sau metadata_size
+        if version >= 22:
+            f.seek(24)
+            f.write(struct.pack(">q", file_size))
+        else:
+            f.seek(4)
+            f.write(struct.pack(">I", file_size))
+    return len(updates)
+
+
+def is_serialized_file_name(name):
+    return bool(SERIALIZED_FILE_RE.match(name))